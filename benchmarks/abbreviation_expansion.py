@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Profile abbreviation expansion against a per-word reference loop.
+
+Times expand_abbreviations() on dense QSO text and each step it is made
+of, and splitting and re-joining the words without any lookup, which
+bounds what any expander that splits the text in Python can reach.
+
+Usage: python benchmarks/abbreviation_expansion.py [words]
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from morse_chat.abbreviations import (CW_ABBREVIATIONS, AbbreviationExpander, decode_rst,
+                                      expand_abbreviations)
+
+OTHER_WORDS = ["599", "579", "W1ABC", "K2XYZ", "hello", "name", "is", "john", "rig", "the", "and"]
+
+
+def word_loop(text: str) -> str:
+    """Expansion as a per-word loop with the RST checks inline, for reference."""
+    expanded = []
+    for word in text.upper().split():
+        if (len(word) == 3 and word[0] in '12345' and word[1] in '123456789'
+                and word[2] in '123456789'):
+            expanded.append(f"{word} [{decode_rst(word)}]")
+        elif word in CW_ABBREVIATIONS:
+            expanded.append(f"{word} [{CW_ABBREVIATIONS[word]}]")
+        else:
+            expanded.append(word)
+    return ' '.join(expanded)
+
+
+def median_ms(func) -> float:
+    return sorted(timeit.repeat(func, number=1, repeat=9))[4] * 1000
+
+
+if __name__ == '__main__':
+    n_words = int(sys.argv[1]) if len(sys.argv) > 1 else 150000
+    rng = random.Random(1)
+    vocabulary = list(CW_ABBREVIATIONS) + OTHER_WORDS
+    text = ' '.join(rng.choice(vocabulary) for _ in range(n_words))
+    assert word_loop(text) == expand_abbreviations(text)
+
+    table = AbbreviationExpander().table
+    upper = text.upper()
+    words = upper.split()
+    expanded = list(map(table.get, words, words))
+
+    reference = median_ms(lambda: word_loop(text))
+    steps = [
+        ("per-word loop", reference),
+        ("expand_abbreviations", median_ms(lambda: expand_abbreviations(text))),
+        ("  upper()", median_ms(lambda: text.upper())),
+        ("  split()", median_ms(lambda: upper.split())),
+        ("  dict lookups", median_ms(lambda: list(map(table.get, words, words)))),
+        ("  join()", median_ms(lambda: ' '.join(expanded))),
+        ("split + join, no lookup", median_ms(lambda: ' '.join(text.split()))),
+    ]
+    print(f"{n_words} words, {len(text) / 1e6:.2f} MB, median of 9")
+    for name, ms in steps:
+        print(f"  {name:24s} {ms:7.2f} ms  {reference / ms:6.1f}x")
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Benchmark decoding a long Morse transcript against splitting it word by
+word.
+
+Besides a clean transcript, times one with a doubled word separator in
+the middle and one ending in a word separator (text ending in a space),
+which the split decoder treats specially.
+
+Usage: python benchmarks/bulk_decoding.py [megabytes]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from morse_chat import morse
+from morse_chat.morse import morse_to_text, text_to_morse
+
+MESSAGE = "CQ CQ DE W1ABC/P K UR 599 5NN TNX FER QSO 73 GL "
+
+
+def median_s(func) -> float:
+    return sorted(timeit.repeat(func, number=1, repeat=9))[4]
+
+
+if __name__ == '__main__':
+    megabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    line = text_to_morse(MESSAGE.strip()) + " / "
+    clean = (line * int(megabytes * 1e6 / len(line)))[:-3]
+    middle = len(clean) // 2 - len(clean) // 2 % len(line)
+    cases = [
+        ("clean", clean),
+        ("' / / ' in the middle", clean[:middle] + "/ " + clean[middle:]),
+        ("trailing '/'", clean + " /"),
+    ]
+    print(f"{len(clean) / 1e6:.1f} MB of Morse, median of 9")
+    for name, data in cases:
+        assert morse_to_text(data) == morse._split_morse_to_text(data)
+        split = median_s(lambda: morse._split_morse_to_text(data))
+        bulk = median_s(lambda: morse_to_text(data))
+        print(f"  {name:22s} split {split:6.3f} s  morse_to_text {bulk:6.3f} s  {split / bulk:5.1f}x")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark the Morse preview's encoder on one-character edits in the
+middle of texts of growing length.
+
+Each edit is timed as a full text_to_morse, as IncrementalEncoder.update
+finding the change itself, and as update after the edit is reported
+with edited(), as the input box does.
+
+Usage: python benchmarks/incremental_encoding.py [sizes...]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from morse_chat.morse import IncrementalEncoder, text_to_morse
+
+SIZES = [1000, 10000, 100000, 1000000]
+MESSAGE = "CQ CQ DE W1ABC K UR 599 5NN TNX FER QSO 73 GL "
+
+
+def edits(text: str):
+    """Alternately type an 'E' in the middle of the text and delete it."""
+    middle = len(text) // 2
+    edited = text[:middle] + 'E' + text[middle:]
+    while True:
+        yield edited, (middle, 0, 1)
+        yield text, (middle, 1, 0)
+
+
+def per_edit_us(text: str, report: bool) -> float:
+    """Best of 5 runs, in microseconds per edit."""
+    encoder = IncrementalEncoder()
+    encoder.update(text)
+    stream = edits(text)
+
+    def step():
+        new_text, change = next(stream)
+        if report:
+            encoder.edited(*change)
+        encoder.update(new_text)
+
+    number = 200
+    return min(timeit.repeat(step, number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'chars':>8} {'text_to_morse':>14} {'update':>10} {'reported':>10}")
+    for size in sizes:
+        text = (MESSAGE * (size // len(MESSAGE) + 1))[:size]
+        full = min(timeit.repeat(lambda: text_to_morse(text), number=20, repeat=5)) / 20 * 1e6
+        print(f"{size:8d} {full:12.1f}us {per_edit_us(text, False):8.1f}us {per_edit_us(text, True):8.1f}us")
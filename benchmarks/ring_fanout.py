@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark fanning audio out to several readers: the ring buffer against
+one queue.Queue of bytes blocks per reader.
+
+Usage: python benchmarks/ring_fanout.py [readers] [seconds]
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from morse_chat.ring import RingBuffer
+
+SAMPLE_RATE = 44100
+BLOCK = 256
+
+
+def make_blocks(seconds: int) -> list:
+    """Blocks of int16 noise, as a capture callback would deliver them."""
+    pcm = np.random.default_rng(1).integers(-3000, 3000, SAMPLE_RATE * seconds, dtype=np.int16)
+    return [pcm[i:i + BLOCK] for i in range(0, len(pcm), BLOCK)]
+
+
+def run_queues(blocks: list, n_readers: int) -> float:
+    """Every block is converted to bytes and put on each reader's queue."""
+    queues = [queue.Queue() for _ in range(n_readers)]
+    sums = [0] * n_readers
+
+    def consume(index):
+        q = queues[index]
+        while True:
+            data = q.get()
+            if data is None:
+                return
+            sums[index] += int(np.frombuffer(data, dtype=np.int16).sum(dtype=np.int64))
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(n_readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for block in blocks:
+        data = block.tobytes()
+        for q in queues:
+            q.put(data)
+    for q in queues:
+        q.put(None)
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def run_ring(blocks: list, n_readers: int) -> float:
+    """Blocks are written once; every reader takes views of the ring."""
+    ring = RingBuffer(SAMPLE_RATE * 4)
+    readers = [ring.reader() for _ in range(n_readers)]
+    sums = [0] * n_readers
+    done = threading.Event()
+    total = sum(len(block) for block in blocks)
+
+    def consume(index):
+        reader = readers[index]
+        while reader.cursor < total:
+            views = reader.views()
+            if not views:
+                if done.is_set() and reader.cursor >= ring.written:
+                    return
+                time.sleep(0.0005)
+                continue
+            for view in views:
+                sums[index] += int(view.sum(dtype=np.int64))
+            reader.consume(sum(len(view) for view in views))
+
+    threads = [threading.Thread(target=consume, args=(i,)) for i in range(n_readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for block in blocks:
+        # A real device cannot run ahead of the readers like this loop
+        # can, so wait rather than measure lapped readers
+        while ring.written + len(block) - min(reader.cursor for reader in readers) > ring.capacity:
+            time.sleep(0.0005)
+        ring.write(block)
+    done.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    lost = sum(reader.lost for reader in readers)
+    if lost:
+        print(f"  (ring readers lost {lost} samples)")
+    return elapsed
+
+
+if __name__ == '__main__':
+    n_readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 600
+    blocks = make_blocks(seconds)
+    mb = seconds * SAMPLE_RATE * 2 / 1e6
+
+    print(f"{seconds} s of audio in {BLOCK}-sample blocks to {n_readers} readers")
+    for name, run in [("queue.Queue", run_queues), ("ring buffer", run_ring)]:
+        elapsed = run(blocks, n_readers)
+        print(f"  {name}: {elapsed:6.2f} s, {seconds / elapsed:7.0f}x realtime, "
+              f"{mb * n_readers / elapsed:7.1f} MB/s delivered")
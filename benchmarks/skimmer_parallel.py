@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark the skimmer on one core against the multi-process skimmer.
+
+Usage: python benchmarks/skimmer_parallel.py [signals] [seconds]
+"""
+
+import multiprocessing as mp
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from morse_chat.morse import MorseEncoder
+from morse_chat.skimmer import Skimmer
+from morse_chat.parallel import ParallelSkimmer
+
+SAMPLE_RATE = 44100
+CHUNK = 4096
+
+
+def make_band(n_signals: int, seconds: int) -> np.ndarray:
+    """Mix n_signals CW stations at random speeds and start times across the band."""
+    rng = random.Random(1)
+    mix = np.zeros(SAMPLE_RATE * seconds, dtype=np.float32)
+    spacing = 2900 / n_signals
+    for i in range(n_signals):
+        text = f"CQ TEST W{i % 10}X{chr(65 + i % 26) * 2} " * 20
+        encoder = MorseEncoder(wpm=rng.randint(15, 35), tone_freq=int(320 + i * spacing),
+                               sample_rate=SAMPLE_RATE)
+        start = rng.randrange(SAMPLE_RATE)
+        pcm = encoder.render_pcm(text)[:len(mix) - start]
+        mix[start:start + len(pcm)] += pcm.astype(np.float32) / 32768 * rng.uniform(0.02, 0.05)
+    mix += np.random.default_rng(1).normal(0, 0.01, len(mix)).astype(np.float32)
+    return mix
+
+
+def run_single(mix: np.ndarray) -> tuple:
+    """Decode with one Skimmer; returns (seconds, channels)."""
+    skimmer = Skimmer(sample_rate=SAMPLE_RATE)
+    start = time.perf_counter()
+    for i in range(0, len(mix), CHUNK):
+        skimmer.process(mix[i:i + CHUNK])
+    return time.perf_counter() - start, len(skimmer.decoded())
+
+
+def run_parallel(mix: np.ndarray, workers: int) -> tuple:
+    """Decode with a ParallelSkimmer; returns (seconds, channels)."""
+    with ParallelSkimmer(workers=workers, sample_rate=SAMPLE_RATE) as skimmer:
+        start = time.perf_counter()
+        for i in range(0, len(mix), CHUNK):
+            skimmer.feed(mix[i:i + CHUNK])
+            skimmer.poll()
+        skimmer.flush()
+        return time.perf_counter() - start, len(skimmer.decoded())
+
+
+if __name__ == '__main__':
+    n_signals = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    mix = make_band(n_signals, seconds)
+
+    print(f"{n_signals} signals, {seconds} s of audio, {mp.cpu_count()} CPUs")
+    elapsed, channels = run_single(mix)
+    print(f"  single process: {seconds / elapsed:7.1f}x realtime ({channels} channels)")
+
+    workers = 1
+    while workers <= mp.cpu_count():
+        elapsed_parallel, channels = run_parallel(mix, workers)
+        print(f"  {workers:2d} workers:     {seconds / elapsed_parallel:7.1f}x realtime "
+              f"({channels} channels, {elapsed / elapsed_parallel:.2f}x single)")
+        workers *= 2
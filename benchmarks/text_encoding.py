@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Benchmark text_to_morse from keystroke-sized input to long messages.
+
+The preview re-encodes the typed text on every keystroke, so short
+inputs matter as much as long ones. Each size is timed through
+text_to_morse and through both of its code paths.
+
+Usage: python benchmarks/text_encoding.py [sizes...]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from morse_chat import morse
+from morse_chat.morse import text_to_morse, MORSE_CODE
+
+SIZES = [5, 11, 30, 39, 40, 100, 200, 1000]
+MESSAGE = "CQ CQ DE W1ABC K UR 599 5NN TNX FER QSO 73 GL "
+
+
+def dict_loop(text: str) -> str:
+    """Encoding as a per-character dict loop, for reference."""
+    codes = []
+    for char in text.upper():
+        if char == ' ':
+            codes.append('/')
+        elif char in MORSE_CODE:
+            codes.append(MORSE_CODE[char])
+    return ' '.join(codes)
+
+
+def translate_path(text: str) -> str:
+    return text.upper().translate(morse._ENCODE_MAP)[:-1]
+
+
+def slot_path(text: str) -> str:
+    return morse._encode_slots(text, morse._ENCODE_TABLE)[:-1]
+
+
+def per_call_us(func, text: str) -> float:
+    """Best of 5 runs, in microseconds per call."""
+    number = max(200, 200000 // max(len(text), 1))
+    return min(timeit.repeat(lambda: func(text), number=number, repeat=5)) / number * 1e6
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"text_to_morse, slot path from {morse._SLOT_ENCODE_MIN} characters")
+    print(f"{'chars':>6} {'dict loop':>10} {'translate':>10} {'slots':>10} {'text_to_morse':>14}")
+    for size in sizes:
+        text = (MESSAGE * (size // len(MESSAGE) + 1))[:size]
+        assert text_to_morse(text) == dict_loop(text)
+        times = [per_call_us(func, text)
+                 for func in (dict_loop, translate_path, slot_path, text_to_morse)]
+        print(f"{size:6d} " + " ".join(f"{t:8.2f}us" for t in times[:3]) + f" {times[3]:12.2f}us")
@@ -3,6 +3,13 @@ Ham radio CW abbreviations and Q-codes translator.
 Expands shorthand into contextual English.
 """
 
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+
 # Common CW abbreviations
 CW_ABBREVIATIONS = {
     # Basic Q-codes
@@ -80,7 +87,6 @@ CW_ABBREVIATIONS = {
     'TU': 'thank you',
     'TNX': 'thanks',
     'TRX': 'transceiver',
-    'TU': 'thank you',
     'TX': 'transmit',
     'U': 'you',
     'UR': 'your/you are',
@@ -94,6 +100,61 @@ CW_ABBREVIATIONS = {
     '599': 'perfect signal (RST)',
 }
 
+# RST signal report descriptions by digit
+RST_READABILITY = {
+    '1': 'unreadable',
+    '2': 'barely readable',
+    '3': 'readable with difficulty',
+    '4': 'readable with no difficulty',
+    '5': 'perfectly readable',
+}
+
+RST_STRENGTH = {
+    '1': 'faint',
+    '2': 'very weak',
+    '3': 'weak',
+    '4': 'fair',
+    '5': 'fairly good',
+    '6': 'good',
+    '7': 'moderately strong',
+    '8': 'strong',
+    '9': 'extremely strong',
+}
+
+RST_TONE = {
+    '1': 'very rough',
+    '2': 'rough AC',
+    '3': 'rough DC',
+    '4': 'fair',
+    '5': 'fair DC',
+    '6': 'good DC',
+    '7': 'near DC',
+    '8': 'good DC',
+    '9': 'perfect DC tone',
+}
+
+
+def _build_rst_reports() -> dict:
+    """Description of every three-digit report with at least one known digit."""
+    reports = {}
+    for number in range(1000):
+        rst = f"{number:03d}"
+        r, s, t = rst
+        parts = []
+        if r in RST_READABILITY:
+            parts.append(f"R{r}={RST_READABILITY[r]}")
+        if s in RST_STRENGTH:
+            parts.append(f"S{s}={RST_STRENGTH[s]}")
+        if t in RST_TONE:
+            parts.append(f"T{t}={RST_TONE[t]}")
+        if parts:
+            reports[rst] = f"{rst} ({', '.join(parts)})"
+    return reports
+
+
+_RST_REPORTS = _build_rst_reports()
+
+
 # RST signal report decoder
 def decode_rst(rst: str) -> str:
     """
@@ -105,54 +166,393 @@ def decode_rst(rst: str) -> str:
     Returns:
         Human-readable description
     """
-    if len(rst) != 3 or not rst.isdigit():
-        return rst
-    
-    r, s, t = rst[0], rst[1], rst[2]
-    
-    readability = {
-        '1': 'unreadable',
-        '2': 'barely readable',
-        '3': 'readable with difficulty',
-        '4': 'readable with no difficulty',
-        '5': 'perfectly readable',
-    }
-    
-    strength = {
-        '1': 'faint',
-        '2': 'very weak',
-        '3': 'weak',
-        '4': 'fair',
-        '5': 'fairly good',
-        '6': 'good',
-        '7': 'moderately strong',
-        '8': 'strong',
-        '9': 'extremely strong',
-    }
-    
-    tone = {
-        '1': 'very rough',
-        '2': 'rough AC',
-        '3': 'rough DC',
-        '4': 'fair',
-        '5': 'fair DC',
-        '6': 'good DC',
-        '7': 'near DC',
-        '8': 'good DC',
-        '9': 'perfect DC tone',
-    }
-    
-    parts = []
-    if r in readability:
-        parts.append(f"R{r}={readability[r]}")
-    if s in strength:
-        parts.append(f"S{s}={strength[s]}")
-    if t in tone:
-        parts.append(f"T{t}={tone[t]}")
-    
-    if parts:
-        return f"{rst} ({', '.join(parts)})"
-    return rst
+    return _RST_REPORTS.get(rst, rst)
+
+
+def load_dictionary(path: str) -> dict:
+    """
+    Load a user abbreviation dictionary.
+    
+    JSON files hold one object of abbreviation → meaning. CSV files
+    have an abbreviation and a meaning per row; blank rows, rows
+    starting with # and an "abbreviation,meaning" header are skipped.
+    
+    Args:
+        path: .json or .csv file
+        
+    Returns:
+        Dictionary of uppercase abbreviation → meaning
+        
+    Raises:
+        ValueError: If the file is not a valid dictionary
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not all(isinstance(v, str) for v in data.values()):
+            raise ValueError(f"{path}: expected an object of abbreviation → meaning")
+        rows = data.items()
+    else:
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = []
+            for number, row in enumerate(csv.reader(f), 1):
+                if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                    continue
+                if len(row) < 2:
+                    raise ValueError(f"{path}:{number}: expected abbreviation,meaning")
+                if number == 1 and [cell.strip().lower() for cell in row[:2]] == ['abbreviation', 'meaning']:
+                    continue
+                rows.append((row[0], ','.join(row[1:])))
+    return {word.strip().upper(): meaning.strip() for word, meaning in rows}
+
+
+# Index file: magic, source signature, entry count, then the key and
+# meaning offset tables (count + 1 absolute file offsets each) and the
+# sorted UTF-8 keys and meanings
+_INDEX_MAGIC = b'MCABIDX1'
+_INDEX_HEADER = struct.Struct('<8s32sQ')
+
+
+class AbbreviationIndex:
+    """
+    Read-only abbreviation table in a memory-mapped file.
+    
+    Keys are stored sorted and looked up by binary search in the
+    mapping, so opening the index costs the same however many entries
+    it has, and only the pages a lookup touches are read. Use open()
+    to get an index that is rebuilt when its sources change.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Map an index file.
+        
+        Args:
+            path: File written by AbbreviationIndex.build()
+            
+        Raises:
+            ValueError: If the file is not an abbreviation index
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _INDEX_HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: not an abbreviation index")
+        magic, self.signature, count = _INDEX_HEADER.unpack_from(self._mmap)
+        if magic != _INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not an abbreviation index")
+        
+        # A truncated or damaged file must not be cast or indexed past
+        # its end; only the ends of the offset tables are checked, so
+        # opening stays independent of the number of entries
+        size = len(self._mmap)
+        table = _INDEX_HEADER.size
+        data = table + 16 * (count + 1)
+        if data > size:
+            self.close()
+            raise ValueError(f"{path}: truncated abbreviation index")
+        first_key, = struct.unpack_from('<Q', self._mmap, table)
+        last_key, first_meaning = struct.unpack_from('<QQ', self._mmap, table + 8 * count)
+        last_meaning, = struct.unpack_from('<Q', self._mmap, data - 8)
+        if (first_key, last_key, last_meaning) != (data, first_meaning, size):
+            self.close()
+            raise ValueError(f"{path}: damaged abbreviation index")
+        
+        self._count = count
+        view = memoryview(self._mmap)
+        self._keys = view[table:table + 8 * (count + 1)].cast('Q')
+        table += 8 * (count + 1)
+        self._meanings = view[table:table + 8 * (count + 1)].cast('Q')
+    
+    @classmethod
+    def build(cls, entries: dict, path: str, signature: bytes = b'') -> 'AbbreviationIndex':
+        """
+        Write an index of entries and open it.
+        
+        The file is written next to path and renamed into place, so
+        processes that have the old index open keep a consistent one.
+        
+        Args:
+            entries: Abbreviation → meaning
+            path: Index file to write
+            signature: Up to 32 bytes identifying the sources
+        """
+        items = sorted((word.encode('utf-8'), meaning.encode('utf-8'))
+                       for word, meaning in entries.items())
+        count = len(items)
+        position = _INDEX_HEADER.size + 16 * (count + 1)
+        key_offsets = []
+        for key, _ in items:
+            key_offsets.append(position)
+            position += len(key)
+        key_offsets.append(position)
+        meaning_offsets = []
+        for _, meaning in items:
+            meaning_offsets.append(position)
+            position += len(meaning)
+        meaning_offsets.append(position)
+        
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, 'wb') as f:
+            f.write(_INDEX_HEADER.pack(_INDEX_MAGIC, signature, count))
+            f.write(struct.pack(f'<{count + 1}Q', *key_offsets))
+            f.write(struct.pack(f'<{count + 1}Q', *meaning_offsets))
+            f.write(b''.join(key for key, _ in items))
+            f.write(b''.join(meaning for _, meaning in items))
+        os.replace(temp, path)
+        return cls(path)
+    
+    @classmethod
+    def open(cls, sources: list = (), path: str = None, builtins: bool = True) -> 'AbbreviationIndex':
+        """
+        Open the index of the built-in abbreviations and user dictionaries.
+        
+        The index is rebuilt only when a source file has changed (by
+        path, size or modification time) or the built-ins have; later
+        sources override earlier ones and the built-ins.
+        
+        Args:
+            sources: Dictionary files for load_dictionary()
+            path: Index file (default: one per set of sources under
+                ~/.cache/morse_chat)
+            builtins: Include CW_ABBREVIATIONS (False for e.g. a
+                callsign table)
+        """
+        sources = [os.path.abspath(source) for source in sources]
+        builtin_entries = CW_ABBREVIATIONS if builtins else {}
+        digest = hashlib.sha256(_INDEX_MAGIC)
+        digest.update(json.dumps(sorted(builtin_entries.items())).encode('utf-8'))
+        for source in sources:
+            stat = os.stat(source)
+            digest.update(f"\0{source}\0{stat.st_size}\0{stat.st_mtime_ns}".encode('utf-8'))
+        signature = digest.digest()
+        
+        if path is None:
+            name = hashlib.sha256('\0'.join(sources + [str(builtins)]).encode('utf-8')).hexdigest()[:16]
+            path = os.path.join(os.path.expanduser('~'), '.cache', 'morse_chat', f'abbreviations-{name}.idx')
+        try:
+            index = cls(path)
+            if index.signature == signature:
+                return index
+            index.close()
+        except (OSError, ValueError):
+            pass
+        
+        entries = dict(builtin_entries)
+        for source in sources:
+            entries.update(load_dictionary(source))
+        return cls.build(entries, path, signature)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    def __contains__(self, word: str) -> bool:
+        return self.get(word) is not None
+    
+    def __getitem__(self, word: str) -> str:
+        meaning = self.get(word)
+        if meaning is None:
+            raise KeyError(word)
+        return meaning
+    
+    def _key(self, i: int) -> bytes:
+        return self._mmap[self._keys[i]:self._keys[i + 1]]
+    
+    def _find(self, key: bytes) -> int:
+        """Position of the first key not less than key."""
+        data, offsets = self._mmap, self._keys
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if data[offsets[mid]:offsets[mid + 1]] < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+    
+    def get(self, word: str, default=None):
+        """Meaning of an (uppercase) abbreviation, or default."""
+        key = word.encode('utf-8')
+        i = self._find(key)
+        if i < self._count and self._key(i) == key:
+            return self._mmap[self._meanings[i]:self._meanings[i + 1]].decode('utf-8')
+        return default
+    
+    def prefixed(self, prefix: str, limit: int = None) -> list:
+        """
+        Abbreviations starting with prefix, in sorted order.
+        
+        Args:
+            prefix: Uppercase prefix
+            limit: Most abbreviations to return
+        """
+        key = prefix.encode('utf-8')
+        data, offsets = self._mmap, self._keys
+        words = []
+        i = self._find(key)
+        while i < self._count and (limit is None or len(words) < limit):
+            word = data[offsets[i]:offsets[i + 1]]
+            if not word.startswith(key):
+                break
+            words.append(word.decode('utf-8'))
+            i += 1
+        return words
+    
+    def close(self):
+        """Unmap the index."""
+        if self._mmap is not None:
+            for view in ('_keys', '_meanings'):
+                if hasattr(self, view):
+                    getattr(self, view).release()
+            self._mmap.close()
+            self._mmap = None
+
+
+class _IndexTable:
+    """Expansion lookups for AbbreviationExpander backed by an index."""
+    
+    def __init__(self, index: AbbreviationIndex, reports: dict, show_original: bool):
+        self.index = index
+        self.reports = reports
+        self.show_original = show_original
+        self._cache = {}  # Recent words → expansion (or None)
+    
+    def get(self, word: str, default=None):
+        if word in self._cache:
+            expansion = self._cache[word]
+        else:
+            expansion = self.reports.get(word)
+            if expansion is None:
+                meaning = self.index.get(word)
+                if meaning is not None:
+                    expansion = f"{word} [{meaning}]" if self.show_original else meaning
+            if len(self._cache) >= 65536:
+                self._cache.clear()
+            self._cache[word] = expansion
+        return default if expansion is None else expansion
+
+
+class AbbreviationExpander:
+    """
+    Compiled abbreviation expander.
+    
+    Every word that expands (each abbreviation, and each valid RST
+    report, which takes precedence) is looked up in one table built up
+    front, so expanding a word is a single dict lookup done in C.
+    feed() expands text as it arrives, e.g. from a decoder, holding
+    back only a word that may not be finished yet.
+    """
+    
+    def __init__(self, abbreviations: dict = None, show_original: bool = True):
+        """
+        Compile the lookup table.
+        
+        Args:
+            abbreviations: Abbreviation → meaning, or an
+                AbbreviationIndex, which is looked up as words arrive
+                rather than copied (default: CW_ABBREVIATIONS)
+            show_original: If True, show original in brackets
+        """
+        if abbreviations is None:
+            abbreviations = CW_ABBREVIATIONS
+        self.show_original = show_original
+        
+        reports = {}
+        for r in '12345':
+            for s in '123456789':
+                for t in '123456789':
+                    rst = r + s + t
+                    reports[rst] = f"{rst} [{_RST_REPORTS[rst]}]" if show_original else _RST_REPORTS[rst]
+        if isinstance(abbreviations, AbbreviationIndex):
+            self.table = _IndexTable(abbreviations, reports, show_original)
+        else:
+            table = {}
+            for word, meaning in abbreviations.items():
+                table[word] = f"{word} [{meaning}]" if show_original else meaning
+            table.update(reports)
+            self.table = table
+        
+        self._pending = ''  # Unfinished last word of the stream
+        self._started = False  # A word has been output
+    
+    def expand(self, text: str) -> str:
+        """Expand a whole text; same output as expand_abbreviations()."""
+        words = text.upper().split()
+        return ' '.join(map(self.table.get, words, words))
+    
+    def feed(self, text: str) -> str:
+        """
+        Expand the next piece of a stream of text.
+        
+        Joining everything returned by feed() and flush() gives the
+        same result as expanding the whole text at once.
+        
+        Args:
+            text: Next piece of text
+            
+        Returns:
+            Expansion of the words completed so far (a word is complete
+            once whitespace follows it)
+        """
+        text = self._pending + text.upper()
+        if text and not text[-1].isspace():
+            # Only the last word can still grow
+            parts = text.rsplit(None, 1)
+            self._pending = parts.pop()
+            text = parts[0] if parts else ''
+        else:
+            self._pending = ''
+        return self._emit(text)
+    
+    def flush(self) -> str:
+        """Expand the held-back last word and start a new stream."""
+        output = self._emit(self._pending)
+        self._pending = ''
+        self._started = False
+        return output
+    
+    def _emit(self, text: str) -> str:
+        output = self.expand(text)
+        if not output:
+            return ''
+        if self._started:
+            output = ' ' + output
+        self._started = True
+        return output
+
+
+_EXPANDERS = {}
+_index = None  # AbbreviationIndex of the user dictionaries in use
+
+
+def use_dictionaries(sources: list, index_path: str = None) -> AbbreviationIndex:
+    """
+    Make expand_abbreviations() use user dictionaries as well as the built-ins.
+    
+    Args:
+        sources: CSV/JSON dictionary files; later ones take precedence
+        index_path: Index file (see AbbreviationIndex.open())
+        
+    Returns:
+        The opened index
+    """
+    global _index
+    index = AbbreviationIndex.open(sources, index_path)
+    _EXPANDERS.clear()
+    if _index is not None:
+        _index.close()
+    _index = index
+    return index
 
 
 def expand_abbreviations(text: str, show_original: bool = True) -> str:
@@ -166,30 +566,10 @@ def expand_abbreviations(text: str, show_original: bool = True) -> str:
     Returns:
         Expanded text
     """
-    words = text.upper().split()
-    expanded = []
-    
-    for word in words:
-        # Check for RST code
-        if len(word) == 3 and word.isdigit():
-            if word[0] in '12345' and word[1] in '123456789' and word[2] in '123456789':
-                expanded_word = decode_rst(word)
-                if show_original and expanded_word != word:
-                    expanded.append(f"{word} [{expanded_word}]")
-                else:
-                    expanded.append(expanded_word)
-                continue
-        
-        # Check for abbreviation
-        if word in CW_ABBREVIATIONS:
-            if show_original:
-                expanded.append(f"{word} [{CW_ABBREVIATIONS[word]}]")
-            else:
-                expanded.append(CW_ABBREVIATIONS[word])
-        else:
-            expanded.append(word)
-    
-    return ' '.join(expanded)
+    expander = _EXPANDERS.get(show_original)
+    if expander is None:
+        expander = _EXPANDERS[show_original] = AbbreviationExpander(_index, show_original=show_original)
+    return expander.expand(text)
 
 
 def is_prosign(text: str) -> bool:
@@ -0,0 +1,198 @@
+"""
+Byte-budgeted caches for rendered Morse audio.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from .morse import MORSE_CODE, iter_morse
+except ImportError:  # Running as a script from the morse_chat directory
+    from morse import MORSE_CODE, iter_morse
+
+
+class PCMCache:
+    """
+    Thread-safe LRU cache of PCM arrays bounded by total size in bytes.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize cache.
+
+        Args:
+            max_bytes: Byte budget for all cached arrays
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached array for key, or None on a miss."""
+        with self._lock:
+            pcm = self._entries.get(key)
+            if pcm is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return pcm
+
+    def put(self, key, pcm):
+        """
+        Store an array, evicting least recently used entries to fit.
+
+        Arrays larger than the whole budget are not cached. Stored
+        arrays are made read-only since they are shared between callers.
+        """
+        if pcm.nbytes > self.max_bytes:
+            return
+        pcm.flags.writeable = False
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = pcm
+            self.nbytes += pcm.nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """Drop all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+class GlyphCache:
+    """
+    Pre-rendered PCM glyphs for every character in MORSE_CODE.
+
+    Glyphs are keyed by Morse code and the encoder's (wpm, tone_freq,
+    sample_rate), so encoders rebuilt for the same settings share
+    them. Every keyed element starts at zero phase and each glyph
+    begins and ends in silence, so concatenated glyphs are
+    sample-identical to rendering the whole message at once.
+    """
+
+    # Keys for the gaps between letters and words
+    LETTER_GAP = ' '
+    WORD_GAP = '/'
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024):
+        """
+        Initialize glyph cache.
+
+        Args:
+            max_bytes: Byte budget for all cached glyphs
+        """
+        self._cache = PCMCache(max_bytes)
+
+        self._warm_target = None
+        self._warm_thread = None
+        self._warm_lock = threading.Lock()
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    @property
+    def nbytes(self) -> int:
+        return self._cache.nbytes
+
+    @staticmethod
+    def params(encoder) -> tuple:
+        """Cache key prefix for an encoder's settings."""
+        return (encoder.wpm, encoder.tone_freq, encoder.sample_rate)
+
+    def glyph(self, encoder, code: str):
+        """
+        Get the rendered glyph for a letter or gap.
+
+        Args:
+            encoder: MorseEncoder supplying the timing and tone
+            code: Morse code of a letter, LETTER_GAP or WORD_GAP
+
+        Returns:
+            Read-only NumPy int16 array
+        """
+        key = self.params(encoder) + (code,)
+        pcm = self._cache.get(key)
+        if pcm is None:
+            pcm = encoder.render_morse(code)
+            self._cache.put(key, pcm)
+        return pcm
+
+    def render(self, encoder, text: str):
+        """
+        Assemble a message from cached glyphs.
+
+        Args:
+            encoder: MorseEncoder supplying the timing and tone
+            text: Text to encode; unknown characters are dropped
+
+        Returns:
+            NumPy int16 array of mono samples
+        """
+        parts = []
+        for code in iter_morse(text):
+            if parts:
+                parts.append(self.glyph(encoder, self.LETTER_GAP))
+            parts.append(self.glyph(encoder, code))
+
+        if not parts:
+            return np.zeros(0, dtype=np.int16)
+        return np.concatenate(parts)
+
+    def warm(self, encoder):
+        """Render every glyph for the encoder's settings."""
+        for char, code in MORSE_CODE.items():
+            self.glyph(encoder, self.WORD_GAP if char == ' ' else code)
+        self.glyph(encoder, self.LETTER_GAP)
+
+    def warm_async(self, encoder) -> threading.Thread:
+        """
+        Warm the cache for an encoder on a background thread.
+
+        Only one warming thread runs at a time; if settings change
+        while it is busy (e.g. while a slider is dragged) it moves on to
+        the most recent encoder when the current one is done.
+        """
+        with self._warm_lock:
+            self._warm_target = encoder
+            if self._warm_thread is None or not self._warm_thread.is_alive():
+                self._warm_thread = threading.Thread(target=self._warm_worker, daemon=True)
+                self._warm_thread.start()
+            return self._warm_thread
+
+    def _warm_worker(self):
+        """Warm glyphs until no newer target is pending."""
+        while True:
+            with self._warm_lock:
+                encoder = self._warm_target
+                self._warm_target = None
+                if encoder is None:
+                    self._warm_thread = None
+                    return
+            self.warm(encoder)
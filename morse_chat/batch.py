@@ -0,0 +1,312 @@
+"""
+Offline decoding of WAV/raw PCM recordings to timestamped transcripts.
+
+Usage: morse-chat decode [options] FILE_OR_GLOB [...]
+"""
+
+import argparse
+import glob
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+try:
+    from .morse import MorseDecoder
+    from .detector import ToneDetector, find_tone
+    from .recording import PCMFile, file_identity
+except ImportError:  # Running as a script from the morse_chat directory
+    from morse import MorseDecoder
+    from detector import ToneDetector, find_tone
+    from recording import PCMFile, file_identity
+
+
+def format_timestamp(seconds: float) -> str:
+    """Format an offset into a recording as HH:MM:SS.s."""
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:04.1f}"
+
+
+class Transcriber:
+    """
+    Decoding state of one recording.
+
+    Plain picklable state, so a checkpoint is simply this object and a
+    resumed job continues exactly where the saved one stopped.
+    """
+
+    def __init__(self, sample_rate: int, tone_freq: int, wpm: int = 20, line_gap_s: float = 2.0):
+        """
+        Initialize transcriber.
+
+        Args:
+            sample_rate: Sample rate of the recording in Hz
+            tone_freq: Tone frequency to decode in Hz
+            wpm: Starting speed for the adaptive decoder
+            line_gap_s: Silence that starts a new transcript line
+        """
+        self.sample_rate = sample_rate
+        self.line_gap_s = line_gap_s
+        self.decoder = MorseDecoder(wpm=wpm, tone_freq=tone_freq)
+        self.detector = ToneDetector(self.decoder, sample_rate=sample_rate)
+
+        self.lines = []
+        self.position = 0  # Frames consumed
+        self._words = []
+        self._line_start = None
+        self._last_tone = 0.0
+
+    def feed(self, samples: np.ndarray):
+        """Decode the next stretch of mono audio."""
+        start_s = self.position / self.sample_rate
+        self.position += len(samples)
+        end_s = self.position / self.sample_rate
+
+        events = self.detector.process(samples)
+        if any(is_tone for is_tone, _ in events):
+            if self._line_start is None:
+                self._line_start = start_s
+            self._last_tone = end_s
+
+        # Move finished words out so the decoder does not grow with the file
+        self._words.extend(self.decoder.decoded_text)
+        self.decoder.decoded_text.clear()
+        idle = not (self.decoder.current_word or self.decoder.current_code)
+        if end_s - self._last_tone >= self.line_gap_s and idle:
+            self._end_line()
+
+    def finish(self) -> list:
+        """
+        Flush the last word and line.
+
+        Returns:
+            List of (start_s, text) lines
+        """
+        # A word gap of silence flushes the decoder's partial word
+        tail = int(self.sample_rate * self.decoder.timing['word_gap_ms'] * 2 / 1000)
+        self.detector.process(np.zeros(tail, dtype=np.float32))
+        self._words.extend(self.decoder.decoded_text)
+        self.decoder.decoded_text.clear()
+        self._end_line()
+        return self.lines
+
+    def _end_line(self):
+        if self._words:
+            self.lines.append((self._line_start, ' '.join(self._words)))
+        self._words = []
+        self._line_start = None
+
+
+def load_checkpoint(checkpoint: str, path: str, options: tuple):
+    """Saved Transcriber for this file and options, or None."""
+    try:
+        with open(checkpoint, 'rb') as f:
+            saved = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if saved.get('identity') != file_identity(path) or saved.get('options') != options:
+        return None
+    return saved['transcriber']
+
+
+def save_checkpoint(checkpoint: str, path: str, options: tuple, transcriber: Transcriber):
+    """Write a checkpoint atomically so a crash never leaves half of one."""
+    temp = checkpoint + '.tmp'
+    with open(temp, 'wb') as f:
+        pickle.dump({'identity': file_identity(path), 'options': options,
+                     'transcriber': transcriber}, f)
+    os.replace(temp, checkpoint)
+
+
+def decode_file(path: str, wpm: int = 20, tone_freq: int = None,
+                line_gap_s: float = 2.0, chunk_s: float = 0.25,
+                sample_rate: int = None, channels: int = 1,
+                checkpoint: str = None, checkpoint_s: float = 60.0) -> dict:
+    """
+    Decode one recording.
+
+    The file is memory mapped and decoded window by window, so memory
+    use does not grow with its length.
+
+    Args:
+        path: WAV file, or raw int16 PCM when sample_rate is given
+        wpm: Starting speed for the adaptive decoder
+        tone_freq: Tone frequency in Hz, or None to use the strongest
+            tone in the first seconds of the recording
+        line_gap_s: Silence that starts a new transcript line
+        chunk_s: Audio processed per step; timestamps are this precise
+        sample_rate: Sample rate of a raw PCM file
+        channels: Channel count of a raw PCM file
+        checkpoint: File to save progress to and resume from
+        checkpoint_s: Audio decoded between checkpoints
+
+    Returns:
+        Dict with 'lines' as (start_s, text) tuples, the 'duration_s'
+        of the recording, the 'tone_freq' used, 'resumed_s' (where
+        decoding started) and 'elapsed_s'
+
+    Raises:
+        OSError: If the file cannot be read
+        ValueError: If the file is not a supported recording or the
+            tone frequency is not positive
+    """
+    if tone_freq is not None and tone_freq <= 0:
+        raise ValueError(f"invalid tone frequency: {tone_freq} Hz")
+    started = time.perf_counter()
+    options = (wpm, tone_freq, line_gap_s)
+    with PCMFile(path, sample_rate=sample_rate, channels=channels) as recording:
+        rate = recording.sample_rate
+        transcriber = load_checkpoint(checkpoint, path, options) if checkpoint else None
+        if transcriber is None:
+            if tone_freq is None:
+                tone_freq = find_tone(recording.mono(recording.samples[:rate * 20]), rate)
+            transcriber = Transcriber(rate, tone_freq, wpm=wpm, line_gap_s=line_gap_s)
+        resumed = transcriber.position
+
+        save_every = max(1, int(rate * checkpoint_s))
+        next_save = resumed + save_every
+        view = None
+        for _, view in recording.windows(max(1, int(rate * chunk_s)), start=resumed):
+            transcriber.feed(recording.mono(view))
+            if checkpoint and transcriber.position >= next_save:
+                save_checkpoint(checkpoint, path, options, transcriber)
+                next_save += save_every
+        # The mapping can only be closed once no view refers to it
+        del view
+        duration_s = recording.duration_s
+
+    lines = transcriber.finish()
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return {
+        'path': path,
+        'lines': lines,
+        'duration_s': duration_s,
+        'tone_freq': transcriber.decoder.tone_freq,
+        'resumed_s': resumed / rate,
+        'elapsed_s': time.perf_counter() - started,
+    }
+
+
+def write_transcript(result: dict, out_path: str):
+    """Write decoded lines as '[HH:MM:SS.s] text'."""
+    with open(out_path, 'w', encoding='utf-8') as f:
+        for start_s, text in result['lines']:
+            f.write(f"[{format_timestamp(start_s)}] {text}\n")
+
+
+def transcript_path(path: str, output_dir: str = None) -> str:
+    """Transcript file for a recording: same name with a .txt suffix."""
+    base = os.path.splitext(os.path.basename(path))[0] + '.txt'
+    return os.path.join(output_dir if output_dir else os.path.dirname(path), base)
+
+
+def _decode_job(job: tuple) -> dict:
+    """Decode a file and write its transcript (runs in a worker process)."""
+    path, out_path, kwargs = job
+    try:
+        result = decode_file(path, checkpoint=out_path + '.ckpt', **kwargs)
+    except (OSError, ValueError) as e:
+        return {'path': path, 'error': str(e)}
+    write_transcript(result, out_path)
+    result['output'] = out_path
+    result['bytes'] = os.path.getsize(path)
+    return result
+
+
+def expand_inputs(patterns: list) -> list:
+    """Expand files, directories (their .wav files) and glob patterns."""
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*.wav'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True) or [pattern]
+        paths.extend(sorted(matches))
+    return list(dict.fromkeys(paths))
+
+
+def decode_files(paths: list, jobs: int = None, output_dir: str = None, **kwargs):
+    """
+    Decode recordings in parallel and write their transcripts.
+
+    Args:
+        paths: Recordings to decode
+        jobs: Worker processes (default: CPU count)
+        output_dir: Directory for transcripts (default: next to each file)
+        **kwargs: Options passed to decode_file
+
+    Progress is checkpointed next to each transcript, and a run that
+    was interrupted picks up from there.
+
+    Yields:
+        Result dicts in input order; failed files carry 'error'
+    """
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    work = [(path, transcript_path(path, output_dir), kwargs) for path in paths]
+    if jobs == 1:
+        yield from map(_decode_job, work)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        yield from pool.map(_decode_job, work)
+
+
+def main(argv=None) -> int:
+    """Entry point of `morse-chat decode`."""
+    parser = argparse.ArgumentParser(prog='morse-chat decode',
+                                     description="Transcribe CW in WAV or raw PCM recordings.")
+    parser.add_argument('inputs', nargs='+', help="WAV files, directories or glob patterns")
+    parser.add_argument('-o', '--output-dir', help="directory for transcripts (default: next to each file)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--wpm', type=int, default=20, help="starting speed (default: 20)")
+    parser.add_argument('--tone', type=int, default=None, help="tone frequency in Hz (default: detect)")
+    parser.add_argument('--line-gap', type=float, default=2.0,
+                        help="seconds of silence that start a new line (default: 2)")
+    parser.add_argument('--rate', type=int, default=None,
+                        help="sample rate of raw 16-bit PCM inputs (default: inputs are WAV)")
+    parser.add_argument('--channels', type=int, default=1, help="channels of raw PCM inputs (default: 1)")
+    parser.add_argument('--checkpoint-every', type=float, default=60.0,
+                        help="seconds of audio between resume checkpoints (default: 60)")
+    args = parser.parse_args(argv)
+    for option, value in (('--tone', args.tone), ('--rate', args.rate), ('--channels', args.channels)):
+        if value is not None and value <= 0:
+            parser.error(f"{option} must be positive")
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("no input files")
+
+    started = time.perf_counter()
+    audio_s = 0.0
+    total_bytes = 0
+    failed = 0
+    for result in decode_files(paths, jobs=args.jobs, output_dir=args.output_dir,
+                               wpm=args.wpm, tone_freq=args.tone, line_gap_s=args.line_gap,
+                               sample_rate=args.rate, channels=args.channels,
+                               checkpoint_s=args.checkpoint_every):
+        if 'error' in result:
+            failed += 1
+            print(f"❌ {result['path']}: {result['error']}", file=sys.stderr)
+            continue
+        decoded_s = result['duration_s'] - result['resumed_s']
+        audio_s += decoded_s
+        total_bytes += result['bytes'] * decoded_s / max(result['duration_s'], 1e-9)
+        resumed = f", resumed at {format_timestamp(result['resumed_s'])}" if result['resumed_s'] else ""
+        print(f"✅ {result['path']} → {result['output']} "
+              f"({result['duration_s']:.1f} s at {result['tone_freq']} Hz, {len(result['lines'])} lines, "
+              f"{decoded_s / max(result['elapsed_s'], 1e-9):.0f}x realtime{resumed})")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{len(paths) - failed} of {len(paths)} files, {audio_s / 3600:.2f} h of audio in {elapsed:.1f} s: "
+          f"{audio_s / max(elapsed, 1e-9):.0f}x realtime, "
+          f"{total_bytes / 1e6 / max(elapsed, 1e-9):.1f} MB/s")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+Real-time capture from an input device to decoded text.
+"""
+
+import threading
+
+import numpy as np
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+try:
+    from .detector import ToneDetector
+    from .ring import RingBuffer
+except ImportError:  # Running as a script from the morse_chat directory
+    from detector import ToneDetector
+    from ring import RingBuffer
+
+
+class AudioCapture:
+    """
+    Decode CW from an input device on a dedicated thread.
+
+    The PortAudio callback only copies each block into a preallocated
+    RingBuffer and wakes the decode thread, which runs the tone
+    detector and decoder over everything that has arrived, so the two
+    threads share no lock. Other consumers (a level meter, a recorder)
+    can read the same audio through their own ring.reader(). If the
+    decoder falls a whole ring behind, the oldest audio is skipped and
+    counted as an overrun.
+    """
+
+    def __init__(self, decoder, sample_rate: int = 44100, ring_s: float = 4.0,
+                 frames_per_buffer: int = 256, line_gap_s: float = 2.0,
+                 on_text=None, on_overrun=None):
+        """
+        Initialize capture; no device is opened until open() is called.
+
+        Args:
+            decoder: MorseDecoder to drive
+            sample_rate: Capture sample rate in Hz
+            ring_s: Audio the ring buffer holds
+            frames_per_buffer: Samples per PortAudio callback
+            line_gap_s: Silence that ends a received line
+            on_text: Called on the decode thread with newly decoded
+                text; words are separated by ' ' and lines end with '\\n'
+            on_overrun: Called on the decode thread with the total
+                number of overruns whenever it grows
+        """
+        self.decoder = decoder
+        self.detector = ToneDetector(decoder, sample_rate=sample_rate)
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.line_gap_s = line_gap_s
+        self.on_text = on_text
+        self.on_overrun = on_overrun
+        self.device = None
+
+        self.ring = RingBuffer(int(sample_rate * ring_s))
+        self._reader = self.ring.reader()
+        self.device_overruns = 0  # Input overflows reported by PortAudio
+
+        self._reported_overruns = 0
+        self._sent = 0  # Letters of the current word already sent
+        self._last_tone = 0
+        self._line_open = False
+
+        self._wake = threading.Event()
+        self._thread = None
+        self._running = False
+        self._pyaudio = None
+        self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self._stream is not None
+
+    @property
+    def overruns(self) -> int:
+        """Times input audio was lost, by the device or the decoder."""
+        return self.device_overruns + self._reader.overruns
+
+    @property
+    def dropped(self) -> int:
+        """Samples the decoder lost by falling behind."""
+        return self._reader.lost
+
+    def open(self, device: int = None):
+        """
+        Open (or reopen) the input stream and start decoding.
+
+        Args:
+            device: PyAudio input device index, or None for the default
+
+        Raises:
+            RuntimeError: If PyAudio is not installed
+        """
+        if pyaudio is None:
+            raise RuntimeError("PyAudio is not installed")
+        self._close_stream()
+        if self._pyaudio is None:
+            self._pyaudio = pyaudio.PyAudio()
+        self.start()
+        self.device = device
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            input=True,
+            input_device_index=device,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+
+    def start(self):
+        """Start the decode thread (open() does this)."""
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='decode', daemon=True)
+            self._thread.start()
+
+    def write(self, pcm):
+        """
+        Add captured audio; called from the audio thread.
+
+        Args:
+            pcm: int16 samples or raw little-endian int16 bytes
+        """
+        self.ring.write(pcm)
+        self._wake.set()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback; runs on PortAudio's thread."""
+        if status & pyaudio.paInputOverflow:
+            self.device_overruns += 1
+        self.write(in_data)
+        return None, pyaudio.paContinue
+
+    def _run(self):
+        """Decode thread: wait for audio and decode it."""
+        while self._running:
+            self._wake.wait(timeout=0.05)
+            self._wake.clear()
+            self.process_available()
+
+    def process_available(self):
+        """Decode everything written so far."""
+        views = self._reader.views()
+        for view in views:
+            self._decode(view, self._reader.cursor)
+            self._reader.consume(len(view))
+
+        if self.overruns != self._reported_overruns:
+            self._reported_overruns = self.overruns
+            if self.on_overrun:
+                self.on_overrun(self.overruns)
+
+    def _decode(self, samples: np.ndarray, position: int):
+        """Run audio starting at a ring position through the decoder and send new text."""
+        events = self.detector.process(samples)
+        end = position + len(samples)
+        if any(is_tone for is_tone, _ in events):
+            self._last_tone = end
+            self._line_open = True
+
+        decoder = self.decoder
+        text = []
+        # Finished words leave the decoder so it does not grow over a session
+        for word in decoder.decoded_text:
+            text.append(word[self._sent:] + ' ')
+            self._sent = 0
+        decoder.decoded_text.clear()
+        if len(decoder.current_word) > self._sent:
+            text.append(''.join(decoder.current_word[self._sent:]))
+            self._sent = len(decoder.current_word)
+
+        silence = end - self._last_tone
+        idle = not (decoder.current_word or decoder.current_code)
+        if self._line_open and idle and silence >= self.line_gap_s * self.sample_rate:
+            self._line_open = False
+            text.append('\n')
+
+        if text and self.on_text:
+            self.on_text(''.join(text))
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+    def stop(self):
+        """Close the input stream and stop the decode thread."""
+        self._close_stream()
+        if self._thread is not None:
+            self._running = False
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+    def close(self):
+        """Stop capturing and release PortAudio."""
+        self.stop()
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
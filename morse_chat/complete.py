@@ -0,0 +1,154 @@
+"""
+Autocomplete for abbreviations and callsigns while typing.
+"""
+
+import bisect
+import re
+import threading
+
+try:
+    from .abbreviations import CW_ABBREVIATIONS, AbbreviationIndex
+except ImportError:  # Running as a script from the morse_chat directory
+    from abbreviations import CW_ABBREVIATIONS, AbbreviationIndex
+
+# A prefix of up to three characters ending in a letter, a digit, a
+# suffix ending in a letter, and an optional /portable designator
+_CALLSIGN = re.compile(r'[A-Z0-9]{0,2}[A-Z][0-9][A-Z0-9]{0,3}[A-Z](/[A-Z0-9]{1,4})?')
+
+
+def is_callsign(word: str) -> bool:
+    """Check if a word looks like an amateur radio callsign."""
+    return _CALLSIGN.fullmatch(word.upper()) is not None
+
+
+class Completer:
+    """
+    Top-k completions of a word prefix.
+
+    Suggestions come from recently worked callsigns (newest first), the
+    abbreviations, and an optional callsign database, in that order.
+    Abbreviations are kept as a sorted list and the database as a
+    memory-mapped sorted AbbreviationIndex, so a lookup is a bisection
+    plus reading the next k entries. Both are prepared on a background
+    thread; until then only recent callsigns are suggested.
+    """
+
+    def __init__(self, abbreviations=None, database: str = None, index_path: str = None,
+                 max_recent: int = 200):
+        """
+        Start preparing the completer.
+
+        Args:
+            abbreviations: Abbreviation → meaning, or an
+                AbbreviationIndex (default: CW_ABBREVIATIONS)
+            database: CSV/JSON callsign table (callsign,name per row)
+                for load_dictionary(), indexed in the background
+            index_path: Index file for the database (see
+                AbbreviationIndex.open())
+            max_recent: Recent callsigns remembered
+        """
+        self.max_recent = max_recent
+        self.recent = []  # Newest first
+        self._pending = ''  # Unfinished last word given to feed()
+        self.error = None  # Exception from preparing, if any
+
+        self._abbreviations = abbreviations if abbreviations is not None else CW_ABBREVIATIONS
+        self._words = None
+        self._database = None
+        self.ready = threading.Event()
+        self._thread = threading.Thread(target=self._prepare, args=(database, index_path),
+                                        name='complete', daemon=True)
+        self._thread.start()
+
+    def _prepare(self, database, index_path):
+        """Build the sorted abbreviations and open the database index."""
+        try:
+            if not isinstance(self._abbreviations, AbbreviationIndex):
+                self._words = sorted(self._abbreviations)
+            if database:
+                self._database = AbbreviationIndex.open([database], index_path, builtins=False)
+        except (OSError, ValueError) as e:
+            self.error = e
+        finally:
+            self.ready.set()
+
+    def wait(self, timeout: float = None) -> bool:
+        """Wait until everything is prepared; returns False on timeout."""
+        return self.ready.wait(timeout)
+
+    def add_recent(self, callsign: str):
+        """Remember a callsign as the most recently worked."""
+        callsign = callsign.upper()
+        if callsign in self.recent:
+            self.recent.remove(callsign)
+        self.recent.insert(0, callsign)
+        del self.recent[self.max_recent:]
+
+    def add_recent_from(self, text: str):
+        """Remember every callsign in a message."""
+        for word in reversed(text.upper().split()):
+            if is_callsign(word):
+                self.add_recent(word)
+
+    def feed(self, text: str):
+        """Remember callsigns in text arriving in pieces (e.g. decoded CW)."""
+        text = self._pending + text
+        words = text.split()
+        if words and not text[-1].isspace():
+            self._pending = words.pop()
+        else:
+            self._pending = ''
+        self.add_recent_from(' '.join(words))
+
+    def complete(self, prefix: str, k: int = 5) -> list:
+        """
+        Suggest up to k words starting with prefix.
+
+        Args:
+            prefix: Start of the word being typed (any case)
+            k: Most suggestions
+
+        Returns:
+            Uppercase words, best first; the prefix itself is not
+            suggested
+        """
+        prefix = prefix.upper()
+        if not prefix:
+            return []
+        suggestions = []
+
+        def add(words):
+            for word in words:
+                if word != prefix and word not in suggestions:
+                    suggestions.append(word)
+                    if len(suggestions) == k:
+                        return True
+            return False
+
+        if add(word for word in self.recent if word.startswith(prefix)):
+            return suggestions
+        if not self.ready.is_set():
+            return suggestions
+
+        if self._words is not None:
+            words = self._words
+            i = bisect.bisect_left(words, prefix)
+            matches = []
+            while i < len(words) and words[i].startswith(prefix) and len(matches) <= k:
+                matches.append(words[i])
+                i += 1
+        else:
+            matches = self._abbreviations.prefixed(prefix, k + 1)
+        if add(matches):
+            return suggestions
+
+        if self._database is not None:
+            add(self._database.prefixed(prefix, k + 1 + len(suggestions)))
+        return suggestions
+
+    def close(self):
+        """Unmap the callsign database."""
+        self._thread.join()
+        if self._database is not None:
+            self._database.close()
+            self._database = None
@@ -0,0 +1,311 @@
+"""
+Tone detection front end turning raw PCM into Morse decoder events.
+"""
+
+import numpy as np
+
+
+def to_float32(pcm) -> np.ndarray:
+    """
+    Convert a chunk of PCM to float32 samples in [-1, 1).
+
+    Args:
+        pcm: NumPy int16/float32 array, or raw little-endian int16 bytes
+
+    Returns:
+        NumPy float32 array
+    """
+    if isinstance(pcm, (bytes, bytearray, memoryview)):
+        pcm = np.frombuffer(pcm, dtype='<i2')
+    pcm = np.asarray(pcm)
+    if pcm.dtype == np.int16:
+        return pcm.astype(np.float32) * (1 / 32768)
+    return pcm.astype(np.float32, copy=False)
+
+
+def find_tone(samples: np.ndarray, sample_rate: int, low_hz: float = 300,
+              high_hz: float = 3300, fft_size: int = 4096) -> int:
+    """
+    Frequency of the strongest steady tone in a stretch of audio.
+
+    Args:
+        samples: float32 audio
+        sample_rate: Sample rate in Hz
+        low_hz: Lowest frequency considered
+        high_hz: Highest frequency considered
+        fft_size: FFT length; sets the frequency resolution
+
+    Returns:
+        Tone frequency in Hz, rounded to the nearest integer
+    """
+    fft_size = min(fft_size, max(len(samples), 2))
+    n_frames = len(samples) // fft_size
+    if n_frames == 0:
+        samples = np.pad(samples, (0, fft_size - len(samples)))
+        n_frames = 1
+    frames = samples[:n_frames * fft_size].reshape(n_frames, fft_size)
+    power = (np.abs(np.fft.rfft(frames * np.hanning(fft_size), axis=1)) ** 2).mean(axis=0)
+
+    bin_hz = sample_rate / fft_size
+    low = max(1, int(np.ceil(low_hz / bin_hz)))
+    high = min(len(power) - 1, int(high_hz / bin_hz))
+    if high < low:
+        return int(round(sample_rate / 4))
+    peak = low + int(np.argmax(power[low:high + 1]))
+
+    # Parabolic interpolation between bins for a finer estimate
+    if 0 < peak < len(power) - 1:
+        a, b, c = np.log(power[peak - 1:peak + 2] + 1e-20)
+        denom = a - 2 * b + c
+        peak += 0.5 * (a - c) / denom if denom else 0.0
+    return int(round(peak * bin_hz))
+
+
+def _time_steps(levels: np.ndarray, log_rate: float) -> np.ndarray:
+    """Cumulative log decay per block, shaped to broadcast along axis 0."""
+    steps = log_rate * np.arange(1, len(levels) + 1)
+    return steps.reshape((-1,) + (1,) * (levels.ndim - 1))
+
+
+def decaying_peak(levels: np.ndarray, initial, log_decay: float) -> np.ndarray:
+    """
+    Running peak that decays exponentially, evaluated along axis 0.
+
+    peak[i] = max(level[i], peak[i-1] * exp(-log_decay)), computed in the
+    log domain with a single accumulate instead of a Python loop.
+
+    Args:
+        levels: Levels of shape (n_blocks,) or (n_blocks, n_channels)
+        initial: Peak before the first block (scalar or per channel)
+        log_decay: Log decay per block
+
+    Returns:
+        Array of running peaks, same shape as levels
+    """
+    steps = _time_steps(levels, log_decay)
+    log_levels = np.log(np.maximum(levels, 1e-12))
+    peak = np.maximum.accumulate(np.maximum(log_levels + steps, np.log(initial)), axis=0)
+    return np.exp(peak - steps)
+
+
+def rising_floor(levels: np.ndarray, initial, log_growth: float) -> np.ndarray:
+    """
+    Running minimum that rises exponentially, evaluated along axis 0.
+
+    floor[i] = min(level[i], floor[i-1] * exp(log_growth))
+
+    Args:
+        levels: Levels of shape (n_blocks,) or (n_blocks, n_channels)
+        initial: Floor before the first block (scalar or per channel)
+        log_growth: Log growth per block
+
+    Returns:
+        Array of running floors, same shape as levels
+    """
+    steps = _time_steps(levels, log_growth)
+    log_levels = np.log(np.maximum(levels, 1e-12))
+    floor = np.minimum.accumulate(np.minimum(log_levels - steps, np.log(initial)), axis=0)
+    return np.exp(floor + steps)
+
+
+def hysteresis(levels: np.ndarray, on_level, off_level, initial_state) -> np.ndarray:
+    """
+    Key state with hysteresis, evaluated along axis 0.
+
+    A block at or above on_level is key-down, one at or below off_level
+    is key-up, and anything in between holds the previous state.
+
+    Args:
+        levels: Levels of shape (n_blocks,) or (n_blocks, n_channels)
+        on_level: Key-down threshold, broadcastable to levels
+        off_level: Key-up threshold, broadcastable to levels
+        initial_state: Key state before the first block
+
+    Returns:
+        Boolean array of key states, same shape as levels
+    """
+    decision = np.full(levels.shape, -1, dtype=np.int8)
+    decision[levels <= off_level] = 0
+    decision[levels >= on_level] = 1
+
+    # Carry the last decisive state forward through held blocks
+    index = np.arange(len(levels)).reshape((-1,) + (1,) * (levels.ndim - 1))
+    decided = np.maximum.accumulate(np.where(decision >= 0, index, -1), axis=0)
+    held = np.take_along_axis(decision, np.maximum(decided, 0), axis=0)
+    return np.where(decided >= 0, held, initial_state).astype(bool)
+
+
+class ToneDetector:
+    """
+    Block-based Goertzel detector for a single CW tone.
+
+    Incoming audio is cut into short blocks and the signal level at the
+    decoder's tone frequency is measured for all blocks of a chunk at
+    once. Key-down is declared with hysteresis between thresholds that
+    track the recent peak and noise floor, and the resulting tone and
+    silence durations are fed to the decoder's state machine.
+    """
+
+    def __init__(self, decoder, sample_rate: int = 44100, block_ms: float = 5.0,
+                 on_ratio: float = 0.5, off_ratio: float = 0.3,
+                 min_snr: float = 4.0, min_level: float = 0.005,
+                 min_purity: float = 0.1, peak_decay_s: float = 2.0):
+        """
+        Initialize detector.
+
+        Args:
+            decoder: MorseDecoder receiving tone/silence durations; its
+                tone_freq selects the detection frequency
+            sample_rate: Input sample rate in Hz
+            block_ms: Analysis block length in milliseconds
+            on_ratio: Key-down threshold between floor (0) and peak (1)
+            off_ratio: Key-up threshold between floor (0) and peak (1)
+            min_snr: Minimum peak to floor ratio before keying is detected
+            min_level: Minimum tone amplitude treated as a signal
+            min_purity: Minimum share of a block's amplitude that must be
+                at the tone frequency, rejecting off-frequency signals
+            peak_decay_s: Time for the peak/floor trackers to move by e
+        """
+        self.decoder = decoder
+        self.sample_rate = sample_rate
+        self.block_size = max(1, int(sample_rate * block_ms / 1000))
+        self.block_ms = self.block_size * 1000 / sample_rate
+
+        self.on_ratio = on_ratio
+        self.off_ratio = off_ratio
+        self.min_snr = min_snr
+        self.min_level = min_level
+        self.min_purity = min_purity
+
+        # Per-block log decay of the peak tracker (and growth of the floor)
+        self._log_decay = self.block_ms / (peak_decay_s * 1000)
+        self._basis = None
+        self._basis_freq = None
+
+        self.reset()
+
+    def reset(self):
+        """Forget buffered audio, levels and keying state."""
+        self._pending = np.zeros(0, dtype=np.float32)
+        self.peak = self.min_level
+        self.floor = self.min_level
+        self.key_down = False
+        self.run_blocks = 0
+        self._silence_flushed = False
+
+    def _get_basis(self) -> np.ndarray:
+        """Windowed cosine/sine basis for the decoder's tone frequency."""
+        freq = self.decoder.tone_freq
+        if self._basis is None or self._basis_freq != freq:
+            n = np.arange(self.block_size)
+            phase = 2 * np.pi * freq * n / self.sample_rate
+            # Hann window keeps off-frequency leakage low; scaled so a
+            # full-scale tone measures an amplitude of 1
+            window = np.hanning(self.block_size)
+            window *= 2 / max(window.sum(), 1e-12)
+            basis = np.stack([np.cos(phase), np.sin(phase)], axis=1) * window[:, None]
+            self._basis = basis.astype(np.float32)
+            self._basis_freq = freq
+        return self._basis
+
+    def levels(self, blocks: np.ndarray) -> np.ndarray:
+        """
+        Tone amplitude for each block.
+
+        This evaluates the same single DFT bin as the Goertzel
+        recurrence, as one matrix product over all blocks. Blocks where
+        the tone is only a small share of the total signal are zeroed.
+
+        Args:
+            blocks: float32 array of shape (n_blocks, block_size)
+
+        Returns:
+            float64 array of estimated tone amplitudes
+        """
+        projection = blocks @ self._get_basis()
+        levels = np.sqrt(np.einsum('ij,ij->i', projection, projection, dtype=np.float64))
+
+        # Amplitude of a sine with the same energy as the whole block
+        total = np.sqrt(2 * np.einsum('ij,ij->i', blocks, blocks, dtype=np.float64) / self.block_size)
+        levels[levels < self.min_purity * total] = 0.0
+        return levels
+
+    def process(self, pcm) -> list:
+        """
+        Feed a chunk of audio to the detector.
+
+        Args:
+            pcm: int16/float32 samples or raw int16 bytes of any length
+
+        Returns:
+            List of (is_tone, duration_ms) events sent to the decoder
+        """
+        samples = to_float32(pcm)
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+
+        n_blocks = len(samples) // self.block_size
+        used = n_blocks * self.block_size
+        self._pending = samples[used:].copy()
+        if n_blocks == 0:
+            return []
+
+        levels = self.levels(samples[:used].reshape(n_blocks, self.block_size))
+        return self._process_levels(levels)
+
+    def _process_levels(self, levels: np.ndarray) -> list:
+        """Apply hysteresis to block levels and emit keying events."""
+        peak = decaying_peak(levels, self.peak, self._log_decay)
+        floor = np.minimum(rising_floor(levels, self.floor, self._log_decay), peak)
+        self.peak = max(peak[-1], self.min_level)
+        self.floor = floor[-1]
+
+        span = peak - floor
+        valid = (peak >= self.min_level) & (peak >= floor * self.min_snr)
+        on_level = np.where(valid, floor + self.on_ratio * span, np.inf)
+        off_level = np.where(valid, floor + self.off_ratio * span, np.inf)
+        state = hysteresis(levels, on_level, off_level, self.key_down)
+
+        # Run lengths between state changes
+        changes = np.flatnonzero(np.diff(state.astype(np.int8), prepend=np.int8(self.key_down)))
+        events = []
+        start = 0
+        for index in changes:
+            self.run_blocks += index - start
+            events.extend(self._end_run())
+            start = index
+        self.run_blocks += len(levels) - start
+        events.extend(self._check_long_silence())
+        return events
+
+    def _end_run(self) -> list:
+        """Report the run that just ended and flip the key state."""
+        duration = self.run_blocks * self.block_ms
+        events = []
+        if self.key_down:
+            self.decoder.process_tone(duration)
+            events.append((True, duration))
+        elif not self._silence_flushed and self.run_blocks:
+            self.decoder.process_silence(duration)
+            events.append((False, duration))
+
+        self.key_down = not self.key_down
+        self.run_blocks = 0
+        self._silence_flushed = False
+        return events
+
+    def _check_long_silence(self) -> list:
+        """
+        Flush the decoder once a silence passes the word gap.
+
+        Without this the last word of a transmission would only be
+        decoded when the next tone arrives.
+        """
+        if self.key_down or self._silence_flushed:
+            return []
+        duration = self.run_blocks * self.block_ms
+        if duration < self.decoder.timing['word_gap_ms']:
+            return []
+        self.decoder.process_silence(duration)
+        self._silence_flushed = True
+        return [(False, duration)]
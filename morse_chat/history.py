@@ -0,0 +1,279 @@
+"""
+Virtualized chat history: a list model with a scrollback cap that pages
+old entries out to disk, and the view and delegate that draw it.
+"""
+
+import html
+import json
+import tempfile
+from collections import namedtuple
+from datetime import datetime
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QSize
+from PyQt5.QtGui import QTextDocument, QColor
+from PyQt5.QtWidgets import QListView, QStyledItemDelegate, QAbstractItemView, QStyle
+
+# kind is 'message' for a chat line and 'note' for the secondary lines
+# under it (Morse code, expanded abbreviations); message_id is set when
+# the message can be clicked to play it
+ChatEntry = namedtuple('ChatEntry', 'kind timestamp sender text message_id')
+
+
+class ChatHistory(QAbstractListModel):
+    """
+    Chat entries, of which only the most recent are held in memory.
+
+    When more than max_rows entries are held, the oldest page_rows are
+    written to an archive file and removed from the model. Pages are
+    read back, most recent first, with page_in() (e.g. when the view is
+    scrolled to the top).
+    """
+
+    EntryRole = Qt.UserRole + 1
+
+    def __init__(self, max_rows: int = 2000, page_rows: int = 500, archive_path: str = None,
+                 parent=None):
+        """
+        Initialize history.
+
+        Args:
+            max_rows: Entries held in memory before a page is written out
+            page_rows: Entries per page written to the archive
+            archive_path: File for paged-out entries (default: a
+                temporary file deleted on close)
+            parent: Parent QObject
+        """
+        super().__init__(parent)
+        self.max_rows = max_rows
+        self.page_rows = min(page_rows, max_rows)
+        self.archive_path = archive_path
+        self.rows = []
+
+        self._archive = None
+        self._pages = []  # (offset, rows) of each page in the archive
+
+    @property
+    def archived_rows(self) -> int:
+        """Entries paged out to disk."""
+        return sum(rows for _, rows in self._pages)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.rows[index.row()]
+        if role == self.EntryRole:
+            return entry
+        if role == Qt.DisplayRole:
+            if entry.kind == 'note':
+                return entry.text
+            return f"{entry.timestamp} {entry.sender}: {entry.text}"
+        if role == Qt.ToolTipRole and entry.message_id is not None:
+            return "Click to hear Morse code"
+        return None
+
+    def append_message(self, sender: str, text: str, message_id: int = None):
+        """Add a chat message, playable when message_id is given."""
+        timestamp = datetime.now().strftime("%H:%M")
+        self._append(ChatEntry('message', timestamp, sender, text, message_id))
+
+    def append_note(self, text: str):
+        """Add a secondary line under the last message."""
+        self._append(ChatEntry('note', None, None, text, None))
+
+    def extend_last(self, text: str):
+        """Add text to the last entry (e.g. a received line still arriving)."""
+        if not self.rows:
+            return
+        row = len(self.rows) - 1
+        self.rows[row] = self.rows[row]._replace(text=self.rows[row].text + text)
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+
+    def _append(self, entry: ChatEntry):
+        row = len(self.rows)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.rows.append(entry)
+        self.endInsertRows()
+        if len(self.rows) > self.max_rows:
+            self.page_out()
+
+    def page_out(self):
+        """Move the oldest page of entries to the archive."""
+        count = min(self.page_rows, len(self.rows))
+        if not count:
+            return
+        if self._archive is None:
+            if self.archive_path:
+                self._archive = open(self.archive_path, 'w+b')
+            else:
+                self._archive = tempfile.TemporaryFile(prefix='morse-chat-history-')
+
+        self._archive.seek(0, 2)
+        offset = self._archive.tell()
+        for entry in self.rows[:count]:
+            self._archive.write(json.dumps(entry).encode('utf-8') + b'\n')
+        self._archive.flush()
+        self._pages.append((offset, count))
+
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del self.rows[:count]
+        self.endRemoveRows()
+
+    def page_in(self) -> int:
+        """
+        Bring the most recently archived page back into the model.
+
+        Returns:
+            Number of entries inserted at the top (0 if none are archived)
+        """
+        if not self._pages:
+            return 0
+        offset, count = self._pages.pop()
+        self._archive.seek(offset)
+        entries = [ChatEntry(*json.loads(line)) for line in self._archive.read().splitlines()]
+        self._archive.truncate(offset)
+
+        self.beginInsertRows(QModelIndex(), 0, count - 1)
+        self.rows[:0] = entries
+        self.endInsertRows()
+        return count
+
+    def close(self):
+        """Close (and for a temporary archive, delete) the archive file."""
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+            self._pages = []
+
+
+class ChatDelegate(QStyledItemDelegate):
+    """
+    Draws chat entries as rich text.
+
+    Documents are only laid out for entries that are painted or newly
+    measured; heights are cached per entry and view width.
+    """
+
+    MESSAGE_HTML = (
+        '<div style="font-family: Courier New; margin: 5px 0;">'
+        '<span style="color: #996633; font-size: 11pt;">{timestamp}</span> '
+        '<b style="color: #ff8800; font-size: 14pt;">{sender}:</b> '
+        '<span style="color: #ff8800; font-size: 14pt;{link}">{text}</span></div>'
+    )
+    NOTE_HTML = ('<div style="color: #cc6600; font-size: 12pt; font-family: Courier New; '
+                 'margin: 2px 0;">{text}</div>')
+
+    def __init__(self, view):
+        super().__init__(view)
+        self.view = view
+        self._heights = {}
+
+    def _document(self, entry: ChatEntry, width: int) -> QTextDocument:
+        """Laid-out document for an entry."""
+        if entry.kind == 'note':
+            markup = self.NOTE_HTML.format(text=html.escape(entry.text))
+        else:
+            link = ' text-decoration: underline;' if entry.message_id is not None else ''
+            markup = self.MESSAGE_HTML.format(timestamp=entry.timestamp, sender=html.escape(entry.sender),
+                                              text=html.escape(entry.text), link=link)
+        document = QTextDocument()
+        document.setHtml(markup)
+        document.setTextWidth(width)
+        return document
+
+    def _width(self) -> int:
+        return max(self.view.viewport().width() - 4, 50)
+
+    def sizeHint(self, option, index):
+        entry = index.data(ChatHistory.EntryRole)
+        width = self._width()
+        key = (entry, width)
+        height = self._heights.get(key)
+        if height is None:
+            if len(self._heights) > 20000:
+                self._heights.clear()
+            height = int(self._document(entry, width).size().height())
+            self._heights[key] = height
+        return QSize(width, height)
+
+    def paint(self, painter, option, index):
+        entry = index.data(ChatHistory.EntryRole)
+        document = self._document(entry, self._width())
+        painter.save()
+        if entry.message_id is not None and option.state & QStyle.State_MouseOver:
+            painter.fillRect(option.rect, QColor('#4a4a4a'))
+        painter.translate(option.rect.topLeft())
+        document.drawContents(painter)
+        painter.restore()
+
+
+class ChatView(QListView):
+    """
+    List view of a ChatHistory with clickable messages.
+
+    Only visible rows are drawn. The view follows new entries while it
+    is scrolled to the bottom, and pages archived entries back in when
+    scrolled to the top.
+    """
+
+    def __init__(self, parent_window=None):
+        super().__init__(parent_window)
+        self.parent_window = parent_window
+        self.setItemDelegate(ChatDelegate(self))
+        self.setMouseTracking(True)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.setResizeMode(QListView.Adjust)
+        self.setLayoutMode(QListView.Batched)
+        self.setWordWrap(True)
+        self._follow = True
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.rowsAboutToBeInserted.connect(self._remember_position)
+        model.rowsInserted.connect(self._keep_position)
+        model.dataChanged.connect(self._keep_position)
+
+    def _at_bottom(self) -> bool:
+        bar = self.verticalScrollBar()
+        return bar.value() >= bar.maximum() - 2
+
+    def _remember_position(self, *args):
+        self._follow = self._at_bottom()
+
+    def _keep_position(self, *args):
+        if self._follow:
+            self.scrollToBottom()
+
+    def _on_scrolled(self, value):
+        self._follow = self._at_bottom()
+        if value == self.verticalScrollBar().minimum() and self.model() is not None:
+            count = self.model().page_in()
+            if count:
+                # Stay on the entry that was at the top
+                self.setLayoutMode(QListView.SinglePass)
+                self.doItemsLayout()
+                self.setLayoutMode(QListView.Batched)
+                self.scrollTo(self.model().index(count), QAbstractItemView.PositionAtTop)
+
+    def _entry_at(self, pos):
+        index = self.indexAt(pos)
+        return index.data(ChatHistory.EntryRole) if index.isValid() else None
+
+    def mouseMoveEvent(self, event):
+        """Show a hand cursor over playable messages."""
+        entry = self._entry_at(event.pos())
+        playable = entry is not None and entry.message_id is not None
+        self.viewport().setCursor(Qt.PointingHandCursor if playable else Qt.ArrowCursor)
+        super().mouseMoveEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        """Play audio when a message is clicked."""
+        entry = self._entry_at(event.pos())
+        if entry is not None and entry.message_id is not None and self.parent_window:
+            self.parent_window.play_message_audio_by_id(f'#{entry.message_id}')
+        super().mouseReleaseEvent(event)
@@ -0,0 +1,126 @@
+"""
+Contest macros rendered from cached segments.
+"""
+
+import string
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from .audio_cache import GlyphCache, PCMCache
+except ImportError:  # Running as a script from the morse_chat directory
+    from audio_cache import GlyphCache, PCMCache
+
+# Standard contest messages; {call} is the station being worked and
+# {mycall} our own
+DEFAULT_MACROS = {
+    'F1': "CQ TEST DE {mycall} {mycall} TEST",
+    'F2': "{call} 5NN {serial:03d}",
+    'F3': "TU {mycall}",
+    'F4': "{mycall}",
+}
+
+
+@lru_cache(maxsize=256)
+def parse_macro(template: str) -> tuple:
+    """
+    Split a macro template into fixed text and fields.
+
+    Args:
+        template: Text with str.format() fields, e.g. "5NN {serial:03d}"
+
+    Returns:
+        Tuple of (text, field, format_spec) segments; text is the fixed
+        text before the field, and field is None after the last one
+
+    Raises:
+        ValueError: If the template is not a valid format string
+    """
+    return tuple((text, field, spec) for text, field, spec, _ in string.Formatter().parse(template))
+
+
+class MacroEngine:
+    """
+    Render macros by splicing cached audio.
+
+    The fixed text of a macro is rendered once per encoder setting and
+    cached as PCM; fields such as the other station's call and the
+    serial number are assembled at send time from per-character glyphs.
+    Segments are joined with a letter gap as the encoder would, so a
+    spliced macro is sample-identical to rendering its text from
+    scratch, at the cost of a few array copies.
+    """
+
+    def __init__(self, glyph_cache: GlyphCache = None, fields: dict = None,
+                 max_bytes: int = 8 * 1024 * 1024):
+        """
+        Initialize engine.
+
+        Args:
+            glyph_cache: Glyphs for variable fields (default: a new one)
+            fields: Values used for fields not given at send time, e.g.
+                {'mycall': 'W1ABC'}
+            max_bytes: Byte budget for cached fixed segments
+        """
+        self.glyph_cache = glyph_cache if glyph_cache is not None else GlyphCache()
+        self.fields = dict(fields or {})
+        self.segments = PCMCache(max_bytes)
+
+    def text(self, template: str, **fields) -> str:
+        """
+        Text a macro sends.
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        values = {**self.fields, **fields}
+        return ''.join(text + (format(values[field], spec) if field is not None else '')
+                       for text, field, spec in parse_macro(template))
+
+    def _fixed(self, encoder, text: str) -> np.ndarray:
+        """Cached rendering of a fixed piece of a macro."""
+        key = GlyphCache.params(encoder) + (text,)
+        pcm = self.segments.get(key)
+        if pcm is None:
+            pcm = self.glyph_cache.render(encoder, text)
+            self.segments.put(key, pcm)
+        return pcm
+
+    def render(self, encoder, template: str, **fields) -> np.ndarray:
+        """
+        Render a macro.
+
+        Args:
+            encoder: MorseEncoder supplying the timing and tone
+            template: Macro template, e.g. DEFAULT_MACROS['F2']
+            **fields: Field values for this transmission, e.g.
+                call='K2XYZ', serial=42
+
+        Returns:
+            NumPy int16 array of mono samples
+
+        Raises:
+            KeyError: If a field has no value
+        """
+        values = {**self.fields, **fields}
+        parts = []
+        for text, field, spec in parse_macro(template):
+            if text:
+                # Literal text between fields; constant fields are cached
+                # as their own fixed segments below
+                parts.append(self._fixed(encoder, text))
+            if field is None:
+                continue
+            if field in self.fields and field not in fields:
+                parts.append(self._fixed(encoder, format(values[field], spec)))
+            else:
+                parts.append(self.glyph_cache.render(encoder, format(values[field], spec)))
+
+        parts = [pcm for pcm in parts if len(pcm)]
+        if not parts:
+            return np.zeros(0, dtype=np.int16)
+        gap = self.glyph_cache.glyph(encoder, GlyphCache.LETTER_GAP)
+        joined = [gap] * (2 * len(parts) - 1)
+        joined[::2] = parts
+        return np.concatenate(joined)
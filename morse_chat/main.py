@@ -4,10 +4,8 @@ Morse Chat - Desktop application for CW transcription and transmission.
 """
 
 import sys
-import io
-import wave
 import numpy as np
-import threading
+from concurrent.futures import ThreadPoolExecutor
 try:
     import pyaudio
     PYAUDIO_AVAILABLE = True
@@ -17,13 +15,35 @@ except ImportError:
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QTextEdit, QLineEdit, QPushButton, QLabel, QComboBox, QSpinBox,
-    QGroupBox, QCheckBox, QFrame, QTextBrowser, QSlider
+    QGroupBox, QCheckBox, QFrame, QSlider, QCompleter, QShortcut
 )
-from PyQt5.QtCore import Qt, QTimer, pyqtSignal
-from PyQt5.QtGui import QFont, QTextCursor, QTextCharFormat, QColor, QTextOption
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal, QStringListModel, QModelIndex
+from PyQt5.QtGui import QFont, QKeySequence
 
-from morse import text_to_morse, morse_to_text, MorseEncoder, MorseDecoder
-from abbreviations import expand_abbreviations
+try:
+    from .morse import (text_to_morse, morse_to_text, sample_counts, MorseEncoder, MorseDecoder,
+                        IncrementalEncoder)
+    from .abbreviations import expand_abbreviations
+    from .audio_cache import GlyphCache, PCMCache
+    from .output import AudioOutput
+    from .scheduler import TransmitScheduler
+    from .capture import AudioCapture
+    from .history import ChatHistory, ChatView
+    from .complete import Completer
+    from .macros import MacroEngine, DEFAULT_MACROS, parse_macro
+    from .batch import main as decode_main
+except ImportError:  # Running as a script from the morse_chat directory
+    from morse import (text_to_morse, morse_to_text, sample_counts, MorseEncoder, MorseDecoder,
+                       IncrementalEncoder)
+    from abbreviations import expand_abbreviations
+    from audio_cache import GlyphCache, PCMCache
+    from output import AudioOutput
+    from scheduler import TransmitScheduler
+    from capture import AudioCapture
+    from history import ChatHistory, ChatView
+    from complete import Completer
+    from macros import MacroEngine, DEFAULT_MACROS, parse_macro
+    from batch import main as decode_main
 
 
 class ToggleSwitch(QCheckBox):
@@ -51,42 +71,19 @@ class ToggleSwitch(QCheckBox):
         """)
 
 
-class ChatDisplay(QTextBrowser):
-    """Custom text display with hover effects and clickable messages."""
-    
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.parent_window = parent
-        self.setMouseTracking(True)
-        self.last_highlighted = None
-    
-    def mouseMoveEvent(self, event):
-        """Highlight message on hover."""
-        # Get the anchor (link) under the cursor
-        anchor = self.anchorAt(event.pos())
-        
-        if anchor and anchor != self.last_highlighted:
-            # New anchor - change cursor
-            self.viewport().setCursor(Qt.PointingHandCursor)
-            self.last_highlighted = anchor
-        elif not anchor and self.last_highlighted:
-            # Left anchor area
-            self.viewport().setCursor(Qt.ArrowCursor)
-            self.last_highlighted = None
-        
-        super().mouseMoveEvent(event)
-    
-    def mouseReleaseEvent(self, event):
-        """Play audio when message is clicked."""
-        anchor = self.anchorAt(event.pos())
-        if anchor and self.parent_window:
-            self.parent_window.play_message_audio_by_id(anchor)
-        super().mouseReleaseEvent(event)
-
-
 class MorseChatWindow(QMainWindow):
     """Main application window."""
     
+    # Emitted with a message id when its render is done or cancelled
+    render_finished = pyqtSignal(int)
+    # Emitted from the capture decode thread with new text, and with the
+    # overrun count when input audio was lost
+    received_text = pyqtSignal(str)
+    capture_overrun = pyqtSignal(int)
+    # Emitted from the output thread with a message's text as it goes
+    # on the air
+    transmit_started = pyqtSignal(str)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Morse Chat")
@@ -95,22 +92,57 @@ class MorseChatWindow(QMainWindow):
         
         # Morse encoder/decoder
         self.wpm = 20
-        self.encoder = MorseEncoder(wpm=self.wpm)
+        self.glyph_cache = GlyphCache()
+        self.encoder = MorseEncoder(wpm=self.wpm, glyph_cache=self.glyph_cache)
+        self.glyph_cache.warm_async(self.encoder)
         self.decoder = MorseDecoder(wpm=self.wpm)
         
         # Settings
         self.abbreviate = False  # Default OFF
         self.audio_playback = False  # Default OFF
         
-        # Store audio for playback
-        self.message_audio = {}  # message_id -> audio bytes
+        # Store what is needed to render each message; audio is
+        # rendered when a message is clicked and only recent renders kept
+        self.message_audio = {}  # message_id -> (text, wpm, sample_rate)
+        self.render_cache = PCMCache(max_bytes=8 * 1024 * 1024)
         self.next_message_id = 0
         
+        # Messages are rendered ahead of playback off the UI thread
+        self.render_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='render')
+        self.pending_renders = {}  # message_id -> Future
+        self.play_when_rendered = None  # message_id clicked while rendering
+        self.render_finished.connect(self._on_render_finished)
+        
+        # Contest macros are spliced from cached segments and glyphs
+        self.macros = MacroEngine(self.glyph_cache)
+        self.exchange_sent = False  # Serial sent in the current QSO
+        
         # Audio device selection
         self.selected_input_device = None
         self.selected_output_device = None
         
+        # One output stream for all playback, kept open on the selected device
+        self.output = AudioOutput(sample_rate=self.encoder.sample_rate)
+        
+        # Everything played goes through the transmit scheduler, which
+        # sends queued messages back to back a word space apart
+        self.scheduler = TransmitScheduler(self.encoder.sample_rate, spacing=self._word_space())
+        self.scheduler.add_listener(self._on_transmit_event)
+        self.transmit_started.connect(self._on_transmit_started)
+        self.output.source = self.scheduler
+        
+        # Received CW is decoded on the capture thread and arrives as signals
+        self.capture = AudioCapture(self.decoder, sample_rate=self.encoder.sample_rate,
+                                    on_text=self.received_text.emit,
+                                    on_overrun=self.capture_overrun.emit)
+        self.receiving = False  # Default OFF
+        self.rx_line_open = False  # Last chat line is a received one still growing
+        self.received_text.connect(self._on_received_text)
+        self.capture_overrun.connect(self._on_capture_overrun)
+        
         self.init_ui()
+        if not self.output.is_open:
+            self._open_output()
     
     def init_ui(self):
         """Initialize the user interface."""
@@ -391,9 +423,107 @@ class MorseChatWindow(QMainWindow):
         self.audio_toggle.setChecked(False)
         self.audio_toggle.stateChanged.connect(self.toggle_audio)
         options_layout.addWidget(self.audio_toggle)
+        options_layout.addSpacing(10)
+        
+        # Receive toggle
+        self.receive_toggle = ToggleSwitch("Receive CW")
+        self.receive_toggle.setStyleSheet("""
+            QCheckBox {
+                color: #ff8800;
+                font-family: 'Courier New';
+                font-size: 13pt;
+                spacing: 10px;
+            }
+            QCheckBox::indicator {
+                width: 50px;
+                height: 26px;
+            }
+            QCheckBox::indicator:unchecked {
+                background-color: #2a2a2a;
+                border: 1px solid #000;
+                border-radius: 5px;
+            }
+            QCheckBox::indicator:checked {
+                background-color: #ff8800;
+                border: 1px solid #000;
+                border-radius: 5px;
+            }
+        """)
+        self.receive_toggle.setChecked(False)
+        self.receive_toggle.stateChanged.connect(self.toggle_receive)
+        options_layout.addWidget(self.receive_toggle)
         
         options_group.setLayout(options_layout)
         layout.addWidget(options_group)
+        layout.addSpacing(15)
+        
+        # Contest macros
+        contest_group = QGroupBox("Contest")
+        contest_group.setStyleSheet("""
+            QGroupBox {
+                color: #ff8800;
+                font-family: 'Courier New';
+                font-weight: bold;
+                border: 1px solid #000;
+                border-radius: 3px;
+                margin-top: 10px;
+                padding-top: 10px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+                padding: 0 5px;
+                font-size: 18pt;
+            }
+        """)
+        contest_layout = QVBoxLayout()
+        
+        mycall_label = QLabel("My call:")
+        mycall_label.setStyleSheet("color: #ff8800; font-family: 'Courier New'; font-size: 14pt;")
+        self.mycall_input = QLineEdit()
+        self.mycall_input.setPlaceholderText("F1-F4 send macros")
+        self.mycall_input.setStyleSheet("""
+            QLineEdit {
+                background-color: #2a2a2a;
+                color: #ff8800;
+                border: 1px solid #000;
+                border-radius: 3px;
+                padding: 8px;
+                font-family: 'Courier New';
+                font-size: 13pt;
+            }
+        """)
+        
+        serial_label = QLabel("Next serial:")
+        serial_label.setStyleSheet("color: #ff8800; font-family: 'Courier New'; font-size: 14pt;")
+        self.serial_spin = QSpinBox()
+        self.serial_spin.setRange(1, 9999)
+        self.serial_spin.setStyleSheet("""
+            QSpinBox {
+                background-color: #2a2a2a;
+                color: #ff8800;
+                border: 1px solid #000;
+                border-radius: 3px;
+                padding: 8px;
+                font-family: 'Courier New';
+                font-size: 13pt;
+            }
+        """)
+        
+        contest_layout.addWidget(mycall_label)
+        contest_layout.addWidget(self.mycall_input)
+        contest_layout.addWidget(serial_label)
+        contest_layout.addWidget(self.serial_spin)
+        contest_layout.addSpacing(10)
+        contest_group.setLayout(contest_layout)
+        layout.addWidget(contest_group)
+        
+        # F1-F4 send the contest macros
+        for key, template in DEFAULT_MACROS.items():
+            shortcut = QShortcut(QKeySequence(key), self)
+            shortcut.activated.connect(lambda template=template: self.send_macro(template))
+        # Esc stops sending and drops queued macros
+        QShortcut(QKeySequence('Esc'), self).activated.connect(self.stop_transmitting)
         
         layout.addStretch()
         
@@ -405,13 +535,12 @@ class MorseChatWindow(QMainWindow):
         layout = QVBoxLayout()
         chat_widget.setLayout(layout)
         
-        # Chat display
-        self.chat_display = ChatDisplay(self)
-        self.chat_display.setReadOnly(True)
-        self.chat_display.setFont(QFont("Courier New", 14))
-        self.chat_display.setOpenLinks(False)
+        # Chat display; only the visible part of the history is drawn
+        self.chat_history = ChatHistory(parent=self)
+        self.chat_display = ChatView(self)
+        self.chat_display.setModel(self.chat_history)
         self.chat_display.setStyleSheet("""
-            QTextBrowser {
+            QListView {
                 background-color: #3a3a3a;
                 color: #ff8800;
                 border: 2px solid #000;
@@ -420,14 +549,6 @@ class MorseChatWindow(QMainWindow):
                 font-family: 'Courier New';
                 font-size: 14pt;
             }
-            QTextBrowser a {
-                color: #ff8800;
-                text-decoration: underline;
-            }
-            QTextBrowser a:hover {
-                color: #ffaa00;
-                background-color: #4a4a4a;
-            }
         """)
         layout.addWidget(self.chat_display)
         
@@ -453,7 +574,7 @@ class MorseChatWindow(QMainWindow):
         
         self.text_input = QLineEdit()
         self.text_input.setPlaceholderText("Type your message here...")
-        self.text_input.returnPressed.connect(self.send_message)
+        self.text_input.returnPressed.connect(self._on_return_pressed)
         self.text_input.setStyleSheet("""
             QLineEdit {
                 background-color: #1a1a1a;
@@ -502,6 +623,31 @@ class MorseChatWindow(QMainWindow):
         self.morse_preview.setStyleSheet("color: #ff8800; padding: 5px; font-family: 'Courier New'; font-size: 12pt;")
         self.text_input.textChanged.connect(self.update_morse_preview)
         
+        # Abbreviation and callsign suggestions for the word being typed;
+        # the completer prepares its tables in the background
+        self.completer = Completer()
+        self.suggestions = QStringListModel(self)
+        suggestion_popup = QCompleter(self.suggestions, self)
+        suggestion_popup.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        suggestion_popup.setCaseSensitivity(Qt.CaseInsensitive)
+        self.text_input.setCompleter(suggestion_popup)
+        self.text_input.textEdited.connect(self.update_suggestions)
+        
+        # Bursts of keystrokes are coalesced into one preview update.
+        # Typing, pasting and deleting are reported to the encoder as
+        # edits at the cursor, so it does not have to look for them
+        self.preview_encoder = IncrementalEncoder()
+        self._input_state = (0, -1, 0)
+        self._input_length = 0
+        self._input_edit = None
+        self.text_input.textEdited.connect(self._note_input_edit)
+        self.text_input.cursorPositionChanged.connect(self._remember_input_state)
+        self.text_input.selectionChanged.connect(self._remember_input_state)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(30)
+        self.preview_timer.timeout.connect(self._refresh_morse_preview)
+        
         input_layout.addLayout(text_input_layout)
         input_layout.addWidget(self.morse_preview)
         
@@ -544,6 +690,19 @@ class MorseChatWindow(QMainWindow):
         if device_id is not None:
             self.selected_input_device = device_id
             self.statusBar().showMessage(f"Input device: {self.input_combo.currentText()}")
+            if getattr(self, 'receiving', False):
+                self._open_capture()
+    
+    def _open_capture(self):
+        """(Re)open the input stream on the selected device."""
+        if not PYAUDIO_AVAILABLE:
+            self.statusBar().showMessage("PyAudio not installed - cannot receive")
+            return
+        try:
+            self.capture.open(self.selected_input_device)
+        except Exception as e:
+            print(f"Audio input error: {e}")
+            self.statusBar().showMessage(f"Audio input error: {e}")
     
     def _on_output_device_changed(self, index):
         """Handle output device selection change."""
@@ -551,12 +710,25 @@ class MorseChatWindow(QMainWindow):
         if device_id is not None:
             self.selected_output_device = device_id
             self.statusBar().showMessage(f"Output device: {self.output_combo.currentText()}")
+            self._open_output()
+    
+    def _open_output(self):
+        """(Re)open the output stream on the selected device."""
+        if not PYAUDIO_AVAILABLE or not hasattr(self, 'output'):
+            return
+        try:
+            self.output.open(self.selected_output_device)
+        except Exception as e:
+            print(f"Audio output error: {e}")
     
     def update_wpm(self, wpm):
         """Update WPM setting."""
         self.wpm = wpm
-        self.encoder = MorseEncoder(wpm=wpm)
-        self.decoder = MorseDecoder(wpm=wpm)
+        self.cancel_pending_renders()
+        self.encoder = MorseEncoder(wpm=wpm, glyph_cache=self.glyph_cache)
+        self.glyph_cache.warm_async(self.encoder)
+        self.decoder.set_wpm(wpm)
+        self.scheduler.spacing = self._word_space()
         self.wpm_value_label.setText(f"{wpm} WPM")
         self.statusBar().showMessage(f"WPM set to {wpm}")
     
@@ -572,10 +744,95 @@ class MorseChatWindow(QMainWindow):
         else:
             self.statusBar().showMessage("Audio playback disabled")
     
+    def toggle_receive(self, state):
+        """Toggle decoding CW from the input device."""
+        self.receiving = bool(state)
+        if state:
+            self.statusBar().showMessage("Receiving - decoded CW appears in the chat")
+            self._open_capture()
+        else:
+            self.capture.stop()
+            self.statusBar().showMessage("Receiving stopped")
+    
+    def _on_received_text(self, text):
+        """Add decoded text to the received line, starting a new line as needed."""
+        self.completer.feed(text)
+        for index, part in enumerate(text.split('\n')):
+            if index:
+                self.rx_line_open = False
+            if not self.rx_line_open:
+                part = part.lstrip()
+                if not part:
+                    continue
+                self.append_message("RX", part)
+                self.rx_line_open = True
+            elif part:
+                self.chat_history.extend_last(part)
+    
+    def _on_capture_overrun(self, count):
+        """Report input audio lost because decoding fell behind."""
+        self.statusBar().showMessage(f"⚠️ Input overrun: {count} blocks of audio lost")
+    
+    def update_suggestions(self, text):
+        """Offer completions of the word being typed."""
+        head, _, word = text.rpartition(' ')
+        prefix = head + ' ' if head else ''
+        matches = self.completer.complete(word) if word else []
+        self.suggestions.setStringList([prefix + match + ' ' for match in matches])
+        # Nothing is picked until an arrow key is used, so Enter still sends
+        popup = self.text_input.completer().popup()
+        QTimer.singleShot(0, lambda: popup.setCurrentIndex(QModelIndex()))
+    
+    def _on_return_pressed(self):
+        """Send the message unless Enter is picking a suggestion."""
+        popup = self.text_input.completer().popup()
+        if popup.isVisible() and popup.currentIndex().isValid():
+            return
+        self.send_message()
+    
+    def _remember_input_state(self, *args):
+        """Keep the cursor and selection an edit of the input starts from."""
+        self._input_state = (self.text_input.cursorPosition(), self.text_input.selectionStart(),
+                             len(self.text_input.selectedText()))
+    
+    def _note_input_edit(self, text):
+        """
+        Work out the edit a keystroke made from the cursor and selection.
+        
+        textEdited comes before the cursor and selection signals, so
+        _input_state still holds their values from before the edit.
+        The edit is (position, removed, added), or None when it was not
+        typing, pasting or deleting at the cursor (e.g. undo).
+        """
+        cursor, selection_start, selected = self._input_state
+        new_cursor = self.text_input.cursorPosition()
+        delta = len(text) - self._input_length
+        self._input_edit = None
+        if selected:
+            added = selected + delta
+            if added >= 0 and new_cursor == selection_start + added:
+                self._input_edit = (selection_start, selected, added)
+        elif delta > 0 and new_cursor == cursor + delta:
+            self._input_edit = (cursor, 0, delta)
+        elif delta < 0 and new_cursor in (cursor, cursor + delta):
+            self._input_edit = (new_cursor, -delta, 0)
+    
     def update_morse_preview(self, text):
-        """Update the Morse code preview."""
+        """Schedule an update of the Morse code preview."""
+        # Changes made by the program (setText, clear) have no edit
+        if self._input_edit is None:
+            self.preview_encoder.edited(None)
+        else:
+            self.preview_encoder.edited(*self._input_edit)
+        self._input_edit = None
+        self._input_length = len(text)
+        self.preview_timer.start()
+    
+    def _refresh_morse_preview(self):
+        """Update the Morse code preview, re-encoding only the edited text."""
+        text = self.text_input.text()
+        morse = self.preview_encoder.update(text)
         if text:
-            morse = text_to_morse(text)
             self.morse_preview.setText(f"Morse: {morse}")
         else:
             self.morse_preview.setText("")
@@ -589,13 +846,14 @@ class MorseChatWindow(QMainWindow):
         message_id = self.next_message_id
         self.next_message_id += 1
         
-        # Generate audio if playback enabled
+        # Remember the message's settings for playback if enabled
         if self.audio_playback:
-            audio_bytes = self.encoder.generate_audio(text)
-            self.message_audio[message_id] = audio_bytes
+            self.message_audio[message_id] = (text, self.wpm, self.encoder.sample_rate)
+            self.queue_render(message_id)
         
         # Display in chat - Discord style
         self.append_message("You", text, message_id, "#2196F3")
+        self.completer.add_recent_from(text)
         
         # Show expanded abbreviations if enabled
         if self.abbreviate:
@@ -612,48 +870,71 @@ class MorseChatWindow(QMainWindow):
         
         # Clear input
         self.text_input.clear()
+        self.text_input.completer().popup().hide()
+    
+    def send_macro(self, template):
+        """
+        Queue a contest macro for transmission.
+        
+        Macros sent while one is still on the air follow it a word
+        space later. {call} is the call typed in the input box,
+        {mycall} the call in the Contest settings and {serial} the next
+        serial number. The macro that ends a QSO (the one without
+        {call} or {serial} after an exchange) moves on to the next
+        serial and clears the input.
+        """
+        fields = {field for _, field, _ in parse_macro(template)}
+        my_call = self.mycall_input.text().strip().upper()
+        if 'mycall' in fields and not my_call:
+            self.statusBar().showMessage("Enter your call sign under Contest to use macros")
+            return
+        call = self.text_input.text().strip().upper()
+        serial = self.serial_spin.value()
+        # Our call changes rarely, so it is cached with the fixed text
+        self.macros.fields['mycall'] = my_call
+        values = {'call': call, 'serial': serial}
+        
+        if not self.output.is_open:
+            self.statusBar().showMessage("No audio output device available")
+            return
+        
+        # Rendering is a few array copies, so it runs on the key press
+        pcm = self.macros.render(self.encoder, template, **values)
+        text = self.macros.text(template, **values)
+        self.scheduler.submit(pcm, label=text)
+        if self.scheduler.current is not None:
+            self.statusBar().showMessage(f"Queued: {text} ({self.scheduler.depth} waiting)")
+        
+        message_id = self.next_message_id
+        self.next_message_id += 1
+        settings = (text, self.wpm, self.encoder.sample_rate)
+        self.message_audio[message_id] = settings
+        self.render_cache.put(self._render_key(*settings), pcm)
+        self.append_message("You", text, message_id, "#2196F3")
+        self.append_text(f"    └─ {text_to_morse(text)}", "#999")
+        if call:
+            self.completer.add_recent(call)
+        
+        if 'serial' in fields:
+            self.exchange_sent = True
+        elif self.exchange_sent and 'call' not in fields:
+            self.exchange_sent = False
+            self.serial_spin.setValue(serial + 1)
+            self.text_input.clear()
     
     def append_message(self, sender, text, message_id=None, color="#000"):
         """Append a message to the chat display."""
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        
-        # Format timestamp
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M")
-        
-        # Create clickable message if audio is available
-        if message_id is not None and self.audio_playback:
-            html = f'<div style="margin: 5px 0; font-family: Courier New; word-wrap: break-word;">'
-            html += f'<span style="color: #996633; font-size: 11pt;">{timestamp}</span> '
-            html += f'<b style="color: #ff8800; font-size: 14pt;">{sender}:</b> '
-            html += f'<a href="#{message_id}" title="Click to hear Morse code" style="color: #ff8800; font-size: 14pt;">{text}</a>'
-            html += '</div>'
-        else:
-            html = f'<div style="margin: 5px 0; font-family: Courier New; word-wrap: break-word;">'
-            html += f'<span style="color: #996633; font-size: 11pt;">{timestamp}</span> '
-            html += f'<b style="color: #ff8800; font-size: 14pt;">{sender}:</b> '
-            html += f'<span style="color: #ff8800; font-size: 14pt;">{text}</span>'
-            html += '</div>'
+        self.rx_line_open = False
         
-        cursor.insertHtml(html)
-        
-        # Auto-scroll to bottom
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
+        # Messages are clickable if audio is available
+        if not self.audio_playback:
+            message_id = None
+        self.chat_history.append_message(sender, text, message_id)
     
     def append_text(self, text, color="#ff8800"):
         """Append plain text (for Morse/abbreviations)."""
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        
-        # Dimmer orange for secondary text
-        html = f'<div style="margin: 2px 0; color: #cc6600; font-size: 12pt; font-family: Courier New; word-wrap: break-word;">{text}</div>'
-        cursor.insertHtml(html)
-        
-        # Auto-scroll to bottom
-        self.chat_display.setTextCursor(cursor)
-        self.chat_display.ensureCursorVisible()
+        self.rx_line_open = False
+        self.chat_history.append_note(text)
     
     def play_message_audio_by_id(self, anchor):
         """Play audio for a message when clicked."""
@@ -664,51 +945,128 @@ class MorseChatWindow(QMainWindow):
         # Extract message ID from anchor
         try:
             message_id = int(anchor.replace('#', ''))
-            if message_id in self.message_audio:
-                self.statusBar().showMessage(f"🔊 Playing Morse code audio...")
-                # Play audio in background thread to avoid blocking UI
-                audio_data = self.message_audio[message_id]
-                threading.Thread(target=self._play_audio_data, args=(audio_data,), daemon=True).start()
+            if message_id in self.pending_renders:
+                # Played by _on_render_finished as soon as it is ready
+                self.play_when_rendered = message_id
+                self.statusBar().showMessage("⏳ Rendering Morse code audio...")
+            elif message_id in self.message_audio:
+                pcm = self.render_cache.get(self._render_key(*self.message_audio[message_id]))
+                if pcm is not None:
+                    self._play_pcm(pcm)
+                else:
+                    self.queue_render(message_id)
+                    self.play_when_rendered = message_id
             else:
                 self.statusBar().showMessage("No audio available for this message")
         except ValueError:
             pass
     
-    def _play_audio_data(self, audio_bytes):
-        """Play audio data using PyAudio."""
-        if not PYAUDIO_AVAILABLE:
+    def queue_render(self, message_id):
+        """Render a sent message on the render pool ahead of playback."""
+        future = self.render_pool.submit(self.render_message, *self.message_audio[message_id])
+        self.pending_renders[message_id] = future
+        # Done callbacks run on the worker thread; the signal carries
+        # the result over to the UI thread
+        future.add_done_callback(lambda _: self.render_finished.emit(message_id))
+    
+    def cancel_pending_renders(self):
+        """
+        Drop renders that have not started, e.g. when the speed changes.
+        
+        Cancelled messages are rendered when they are clicked instead.
+        """
+        # Cancelling runs the done callback, which edits pending_renders
+        for future in list(self.pending_renders.values()):
+            future.cancel()
+    
+    def _on_render_finished(self, message_id):
+        """Mark a message's audio as ready and play it if it was clicked."""
+        future = self.pending_renders.pop(message_id, None)
+        if self.play_when_rendered != message_id or future is None:
+            return
+        self.play_when_rendered = None
+        if future.cancelled():
+            # Cancelled by a speed change; render it again
+            self.play_message_audio_by_id(f'#{message_id}')
+        elif future.exception() is not None:
+            self.statusBar().showMessage(f"Audio rendering failed: {future.exception()}")
+        else:
+            self._play_pcm(future.result())
+    
+    def _play_pcm(self, pcm):
+        """Play samples at once, cutting off anything still playing."""
+        if not self.output.is_open:
+            self.statusBar().showMessage("No audio output device available")
             return
+        self.statusBar().showMessage(f"🔊 Playing Morse code audio...")
+        self.scheduler.send_now(pcm)
+    
+    def stop_transmitting(self):
+        """Cut off the message on the air and drop queued ones."""
+        if not self.scheduler.idle:
+            self.scheduler.clear()
+            self.statusBar().showMessage("Transmission stopped")
+    
+    def _word_space(self):
+        """Silence between consecutive messages, in samples."""
+        counts = sample_counts(self.wpm, self.encoder.sample_rate)
+        return counts['element_gap'] + counts['letter_gap'] + counts['word_gap']
+    
+    def _on_transmit_event(self, event, transmission):
+        """Scheduler listener; runs on the output thread."""
+        if event == 'start' and transmission.label:
+            self.transmit_started.emit(transmission.label)
+    
+    def _on_transmit_started(self, text):
+        """Show the message going on the air and what is still queued."""
+        depth = self.scheduler.depth
+        self.statusBar().showMessage(f"Sending: {text}" + (f" ({depth} queued)" if depth else ""))
+    
+    def closeEvent(self, event):
+        """Stop rendering and playback when the window closes."""
+        self.cancel_pending_renders()
+        self.render_pool.shutdown(wait=False)
+        self.output.close()
+        self.capture.close()
+        self.chat_history.close()
+        self.completer.close()
+        super().closeEvent(event)
+    
+    def render_message(self, text, wpm, sample_rate):
+        """
+        Render a sent message, reusing recent renders.
         
-        try:
-            # Read WAV data
-            with wave.open(io.BytesIO(audio_bytes), 'rb') as wf:
-                p = pyaudio.PyAudio()
-                
-                # Open stream with selected output device
-                stream = p.open(
-                    format=p.get_format_from_width(wf.getsampwidth()),
-                    channels=wf.getnchannels(),
-                    rate=wf.getframerate(),
-                    output=True,
-                    output_device_index=self.selected_output_device  # Use selected device
-                )
-                
-                # Play audio
-                data = wf.readframes(1024)
-                while data:
-                    stream.write(data)
-                    data = wf.readframes(1024)
-                
-                # Cleanup
-                stream.stop_stream()
-                stream.close()
-                p.terminate()
-        except Exception as e:
-            print(f"Audio playback error: {e}")
+        Args:
+            text: Message text
+            wpm: Speed the message was sent at
+            sample_rate: Sample rate the message was sent at
+            
+        Returns:
+            Read-only NumPy int16 array of mono samples
+        """
+        encoder = self.encoder
+        key = self._render_key(text, wpm, sample_rate)
+        pcm = self.render_cache.get(key)
+        if pcm is None:
+            if (encoder.wpm, encoder.sample_rate) != (wpm, sample_rate):
+                # Sent before the speed was changed
+                encoder = MorseEncoder(wpm=wpm, tone_freq=encoder.tone_freq,
+                                       sample_rate=sample_rate)
+            pcm = encoder.render_plan(encoder.compile(text))
+            self.render_cache.put(key, pcm)
+        return pcm
+    
+    def _render_key(self, text, wpm, sample_rate):
+        """render_cache key of a message at the current tone."""
+        return (text, wpm, self.encoder.tone_freq, sample_rate)
 
 
 def main():
     """Application entry point."""
+    # `morse-chat decode ...` transcribes recordings without opening a window
+    if len(sys.argv) > 1 and sys.argv[1] == 'decode':
+        sys.exit(decode_main(sys.argv[2:]))
+    
     app = QApplication(sys.argv)
     
     # Set application style
@@ -2,6 +2,11 @@
 Morse code encoder and decoder using ITU standard.
 """
 
+import bisect
+import itertools
+import math
+import re
+
 # ITU Morse Code mapping
 MORSE_CODE = {
     'A': '.-',    'B': '-...',  'C': '-.-.',  'D': '-..',   'E': '.',
@@ -20,6 +25,57 @@ MORSE_CODE = {
 CODE_TO_CHAR = {v: k for k, v in MORSE_CODE.items()}
 
 
+def _build_encode_table(batch_separator: bytes = b'') -> bytes:
+    """
+    Fixed-width slots of Morse code for every ASCII character.
+    
+    Each slot holds a character's code already followed by its letter
+    separator and padded with NUL bytes, so encoding is one table
+    lookup per character and deleting the padding. Unknown characters
+    get an empty slot and vanish with it.
+    
+    Args:
+        batch_separator: Output for NUL, which joins texts in
+            encode_many
+    """
+    table = bytearray(_ENCODE_WIDTH * 128)
+    for char, code in MORSE_CODE.items():
+        slot = ('/' if char == ' ' else code).encode() + b' '
+        table[ord(char) * _ENCODE_WIDTH:ord(char) * _ENCODE_WIDTH + len(slot)] = slot
+    table[:len(batch_separator)] = batch_separator
+    return bytes(table)
+
+
+class _CodeMap(dict):
+    """str.translate table that deletes characters without a code."""
+    
+    def __missing__(self, key):
+        return None
+
+
+_ENCODE_WIDTH = 8
+_ENCODE_TABLE = _build_encode_table()
+_BATCH_ENCODE_TABLE = _build_encode_table(b'\n')
+# Code and letter separator of each character, for short texts
+_ENCODE_MAP = _CodeMap({ord(char): ('/' if char == ' ' else code) + ' '
+                        for char, code in MORSE_CODE.items()})
+
+# Below this many characters (e.g. the text typed so far) str.translate
+# beats setting up the array lookup
+_SLOT_ENCODE_MIN = 40
+
+
+def _encode_slots(text: str, table: bytes) -> str:
+    """Look up every character's slot and drop the padding."""
+    import numpy as np
+    
+    # Non-ASCII characters have no code; dropping them here keeps the
+    # lookup to a 128-slot table
+    chars = np.frombuffer(text.upper().encode('ascii', 'ignore'), dtype=np.uint8)
+    slots = np.frombuffer(table, dtype='<u8').take(chars)
+    return slots.tobytes().translate(None, b'\0').decode('ascii')
+
+
 def text_to_morse(text: str) -> str:
     """
     Convert text to Morse code.
@@ -30,28 +86,274 @@ def text_to_morse(text: str) -> str:
     Returns:
         Morse code string with spaces between letters and / between words
     """
-    text = text.upper()
-    morse = []
+    # Every code ends in a separator; the last one is not wanted
+    if len(text) < _SLOT_ENCODE_MIN:
+        return text.upper().translate(_ENCODE_MAP)[:-1]
+    return _encode_slots(text, _ENCODE_TABLE)[:-1]
+
+
+def encode_many(texts) -> list:
+    """
+    Convert many texts to Morse code in one pass.
+    
+    Args:
+        texts: Iterable of plain text strings
+        
+    Returns:
+        List of Morse code strings, as text_to_morse would give for
+        each text
+    """
+    texts = list(texts)
+    if not texts:
+        return []
+    joined = '\0'.join(texts)
+    # NUL separates the texts, so it must not occur inside them
+    if joined.count('\0') != len(texts) - 1:
+        return [text_to_morse(text) for text in texts]
+    return [morse[:-1] for morse in _encode_slots(joined, _BATCH_ENCODE_TABLE).split('\n')]
+
+
+def _common_length(matches, limit: int) -> int:
+    """Largest n <= limit with matches(n), for matches true up to some n."""
+    # Bisection with slice comparisons, which run in C
+    low, high = 0, limit
+    while low < high:
+        mid = (low + high + 1) // 2
+        if matches(mid):
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+class IncrementalEncoder:
+    """
+    Morse code of a text being edited, re-encoding only what changed.
+    
+    The text is kept in chunks with the Morse code of each, so an edit
+    re-encodes only the chunks it touches. Edits reported with edited()
+    are spliced in directly; without them the unchanged start and end
+    of the text are found by comparing it with the previous version.
+    """
+    
+    def __init__(self, chunk_size: int = 1024):
+        """
+        Initialize encoder.
+        
+        Args:
+            chunk_size: Characters of text per re-encoded chunk
+        """
+        self.text = ''
+        self.chunk_size = chunk_size
+        self._chunks = []  # Pieces of text of up to chunk_size characters
+        self._morse = []   # text_to_morse() of each chunk
+        self._edit = None  # Edits since the last update, merged
+        self._edit_known = True
+    
+    def edited(self, position: int = None, removed: int = 0, added: int = 0):
+        """
+        Record an edit made since the last update.
+        
+        Arguments are as reported by QTextDocument.contentsChange:
+        removed characters at position were replaced by added new ones.
+        Several edits between updates are merged into one.
+        
+        Args:
+            position: Index of the first changed character, or None if
+                the edit is not known
+            removed: Characters removed there
+            added: Characters inserted in their place
+        """
+        if position is None:
+            self._edit_known = False
+        elif self._edit is None:
+            self._edit = (position, removed, added)
+        else:
+            # Cover both edits with one span of the text in between
+            first, first_removed, first_added = self._edit
+            start = min(first, position)
+            end = max(first + first_added, position + removed)
+            self._edit = (start, end - start - first_added + first_removed,
+                          end - start - removed + added)
+    
+    def update(self, text: str) -> str:
+        """
+        Encode the new version of the text.
+        
+        Args:
+            text: Full text after the edit
+            
+        Returns:
+            Morse code string, as text_to_morse(text) would give
+        """
+        old = self.text
+        edit, known = self._edit, self._edit_known
+        self._edit, self._edit_known = None, True
+        
+        # A single chunk is encoded faster than the edit can be located
+        if len(text) <= self.chunk_size:
+            self.text = text
+            self._chunks = [text] if text else []
+            self._morse = [text_to_morse(text)] if text else []
+            return self._morse[0] if text else ''
+        
+        if edit is None or not known or not self._fits(edit, text):
+            limit = min(len(old), len(text))
+            # Typing and backspacing at the end need no search
+            if text.startswith(old) or old.startswith(text):
+                prefix = limit
+            else:
+                prefix = _common_length(lambda n: old[:n] == text[:n], limit)
+            suffix = _common_length(lambda n: old[len(old) - n:] == text[len(text) - n:], limit - prefix)
+            edit = (prefix, len(old) - prefix - suffix, len(text) - prefix - suffix)
+        
+        self._splice(text, *edit)
+        self.text = text
+        # Chunks without any codes would leave doubled letter gaps
+        return ' '.join(filter(None, self._morse))
+    
+    def _fits(self, edit: tuple, text: str) -> bool:
+        """Check a recorded edit against the lengths and the text around it."""
+        position, removed, added = edit
+        old = self.text
+        if position < 0 or removed < 0 or added < 0 or position + removed > len(old):
+            return False
+        if len(text) != len(old) - removed + added:
+            return False
+        # The characters on either side of the edit must be unchanged
+        return (old[position - 1:position] == text[position - 1:position] and
+                old[position + removed:position + removed + 1] == text[position + added:position + added + 1])
+    
+    def _splice(self, text: str, position: int, removed: int, added: int):
+        """Re-encode the chunks an edit touches."""
+        chunks, size = self._chunks, self.chunk_size
+        ends = list(itertools.accumulate(map(len, chunks)))
+        
+        # The chunks holding the first and last removed characters; an
+        # insertion between two chunks extends the first
+        first = min(bisect.bisect_left(ends, position), len(chunks) - 1)
+        last = min(bisect.bisect_left(ends, position + removed), len(chunks) - 1)
+        if not chunks:
+            first, last = 0, -1
+            head = tail = ''
+        else:
+            start = ends[first] - len(chunks[first])
+            head = chunks[first][:position - start]
+            tail = chunks[last][position + removed - ends[last] + len(chunks[last]):]
+        
+        # A short piece takes in the next chunk, so deletions do not
+        # leave ever smaller chunks behind
+        piece = head + text[position:position + added] + tail
+        if len(piece) < size // 2 and last + 1 < len(chunks):
+            last += 1
+            piece += chunks[last]
+        
+        pieces = [piece[i:i + size] for i in range(0, len(piece), size)]
+        chunks[first:last + 1] = pieces
+        self._morse[first:last + 1] = map(text_to_morse, pieces)
+
+
+def iter_morse(text):
+    """
+    Lazily convert text to Morse code, one character at a time.
+    
+    Args:
+        text: Plain text string, or an iterable of text chunks
+            (e.g. lines of a file)
+        
+    Yields:
+        Morse code for each known character, and / for each space
+    """
+    for chunk in text:
+        for char in chunk.upper():
+            if char == ' ':
+                yield '/'
+            elif char in MORSE_CODE:
+                yield MORSE_CODE[char]
+
+
+def _build_code_table() -> bytes:
+    """
+    Binary-tree index of CODE_TO_CHAR as a flat lookup table.
     
-    for char in text:
-        if char == ' ':
-            morse.append('/')
-        elif char in MORSE_CODE:
-            morse.append(MORSE_CODE[char])
+    A code's index starts at 1 and each element moves to a child:
+    dit to 2i, dah to 2i + 1. Equivalently the index is the code read as
+    a binary number (dah = 1) with a leading 1 marking its length.
+    Unassigned entries hold '?', and index 1 (the empty code) holds the
+    space that word separators decode to.
+    """
+    table = bytearray(b'?' * 256)
+    table[1] = ord(' ')
+    for code, char in CODE_TO_CHAR.items():
+        if code.strip():
+            index = int('1' + code.replace('.', '0').replace('-', '1'), 2)
+            table[index] = ord(char)
+    return bytes(table)
+
+
+def _build_lane_table() -> bytes:
+    """
+    Byte translation table for the bulk decoder.
     
-    return ' '.join(morse)
+    The low bits of an entry are the length the byte adds to a run of
+    elements: 1 for dits and dahs, 0 for spaces, and more than any code
+    for anything else, so a letter whose run reaches back past a stray
+    byte is unknown. Dahs also set the top bit.
+    """
+    table = bytearray([_LANE_OTHER]) * 256
+    table[ord('.')] = 1
+    table[ord('-')] = _LANE_DAH | 1
+    table[ord(' ')] = 0
+    table[ord('/')] = _LANE_SLASH
+    return bytes(table)
+
+
+# Bulk decoder byte values besides 0 (space) and 1 (dit); a letter's
+# run adds up to less than _LANE_SLASH unless it contains a '/'
+_LANE_DAH, _LANE_OTHER, _LANE_SLASH = 0x80, 9, 32
+_MAX_CODE_LEN = max(len(code) for code in CODE_TO_CHAR)
+_CODE_TABLE = _build_code_table()
+_LANE_TABLE = _build_lane_table()
 
+# Below this many characters splitting beats setting up array work
+_BULK_DECODE_MIN = 4096
 
-def morse_to_text(morse: str) -> str:
+# Bytes per block of the bulk decoder, small enough for each of its
+# passes to stay in cache; blocks end after a space before a dit or dah
+_BULK_BLOCK = 1 << 18
+_BLOCK_BREAK = re.compile(rb' [.-]')
+
+
+def morse_to_text(morse) -> str:
     """
     Convert Morse code to text.
     
+    Long inputs are decoded with array operations over cache-sized
+    blocks: every letter's index in a binary tree of codes is built
+    from the run of elements ending it and looked up in a precomputed
+    table, without splitting the input into words and letters.
+    
     Args:
-        morse: Morse code string (spaces between letters, / between words)
+        morse: Morse code (spaces between letters, / between words) as
+            str, bytes or memoryview; runs of spaces between letters
+            are ignored
         
     Returns:
-        Decoded text string
+        Decoded text string, with '?' for unknown codes
     """
+    if isinstance(morse, str):
+        if len(morse) < _BULK_DECODE_MIN:
+            return _split_morse_to_text(morse)
+        return _bulk_morse_to_text(morse.encode('utf-8'))
+    
+    morse = bytes(morse)
+    if len(morse) < _BULK_DECODE_MIN:
+        return _split_morse_to_text(morse.decode('utf-8', 'replace'))
+    return _bulk_morse_to_text(morse)
+
+
+def _split_morse_to_text(morse: str) -> str:
+    """Decode Morse by splitting words and letters."""
     # Split by word separator
     words = morse.split(' / ')
     decoded_words = []
@@ -72,6 +374,84 @@ def morse_to_text(morse: str) -> str:
     return ' '.join(decoded_words)
 
 
+def _bulk_morse_to_text(morse: bytes) -> str:
+    """
+    Decode non-empty Morse bytes with array operations, exactly as
+    _split_morse_to_text decodes them.
+    
+    The input is decoded in blocks that each end after a space followed
+    by a dit or dah, so no letter, and no separator or pair of
+    separators sharing a space, spans two blocks.
+    """
+    parts = []
+    start = 0
+    while start < len(morse):
+        found = _BLOCK_BREAK.search(morse, start + _BULK_BLOCK)
+        stop = found.start() + 1 if found else len(morse)
+        parts.append(_decode_block(morse[start:stop]))
+        start = stop
+    return b''.join(parts).decode('ascii')
+
+
+def _decode_block(morse: bytes) -> bytes:
+    """
+    Decode a block of Morse bytes to ASCII text.
+    
+    Every byte gets the length and code (dah = 1) of the run of dits
+    and dahs ending at it, built by doubling: a run already w elements
+    long is extended by the run ending w bytes earlier, for w = 1, 2, 4.
+    The run ending a letter then gives its table index. A run that
+    reached back past a stray byte, or is longer than any code, is
+    unknown.
+    """
+    import numpy as np
+    
+    lanes = np.frombuffer(morse.translate(_LANE_TABLE), dtype=np.uint8)
+    space = lanes == 0
+    last = np.empty(len(lanes), dtype=bool)
+    np.greater(space[1:], space[:-1], out=last[:-1])
+    last[-1] = not space[-1]
+    ends = np.flatnonzero(last)
+    
+    # A lone '/' with spaces either side separates words: with a run
+    # length of 0 it decodes to index 1, ' '. str.split leaves the space
+    # between two separators to the first, so of lone '/'s two apart
+    # every other one is an unknown letter instead
+    length = lanes & np.uint8(_LANE_DAH - 1)
+    lone = lanes[1:-1] == _LANE_SLASH
+    lone &= space[:-2]
+    lone &= space[2:]
+    shared = np.flatnonzero(lone[:-2] & lone[2:])
+    if len(shared):
+        chained = np.union1d(shared, shared + 2)
+        order = np.arange(len(chained))
+        head = np.concatenate([[True], np.diff(chained) != 2])
+        chain = np.maximum.accumulate(np.where(head, order, 0))
+        lone[chained[(order - chain) % 2 == 1]] = False
+    length[1:-1] ^= lone.view(np.uint8) * np.uint8(_LANE_SLASH)
+    
+    # The letter ends and spaces are no longer needed, so their arrays
+    # serve as scratch space
+    code = (lanes >= _LANE_DAH).view(np.uint8)
+    full = last.view(np.uint8)
+    extend = space.view(np.uint8)
+    for w in (1, 2, 4):
+        np.equal(length[w:], w, out=full[w:])
+        np.negative(full[w:], out=full[w:])
+        np.multiply(code[:-w], np.uint8(1 << w), out=extend[:-w])
+        extend[:-w] &= full[w:]
+        code[w:] |= extend[:-w]
+        np.bitwise_and(length[:-w], full[w:], out=extend[:-w])
+        length[w:] += extend[:-w]
+    
+    # Index 0 is '?'; the leading bit marks the code's length
+    lengths = length.take(ends)
+    known = np.negative((lengths <= _MAX_CODE_LEN).view(np.uint8))
+    index = (code.take(ends) | np.left_shift(np.uint8(1), lengths)) & known
+    
+    return index.tobytes().translate(_CODE_TABLE)
+
+
 def get_timing(wpm: int) -> dict:
     """
     Calculate Morse code timing parameters for given WPM.
@@ -96,21 +476,63 @@ def get_timing(wpm: int) -> dict:
     }
 
 
+def sample_counts(wpm: int, sample_rate: int) -> dict:
+    """
+    Sample counts for each keyed element and gap.
+    
+    Args:
+        wpm: Words per minute
+        sample_rate: Audio sample rate
+        
+    Returns:
+        Dictionary with dit, dah, element_gap, letter_gap and word_gap
+    """
+    timing = get_timing(wpm)
+    return {
+        'dit': int(sample_rate * (timing['dit_ms'] / 1000)),
+        'dah': int(sample_rate * (timing['dah_ms'] / 1000)),
+        'element_gap': int(sample_rate * (timing['element_gap_ms'] / 1000)),
+        # Letter and word gaps follow an element gap, so only the
+        # additional silence is counted here
+        'letter_gap': int(sample_rate * ((timing['letter_gap_ms'] - timing['element_gap_ms']) / 1000)),
+        'word_gap': int(sample_rate * ((timing['word_gap_ms'] - timing['letter_gap_ms']) / 1000)),
+    }
+
+
 class MorseDecoder:
     """
     Real-time Morse code audio decoder.
+    
+    With adaptive speed tracking, the dit/dah split and the gap classes
+    follow the sending station. Mark and space durations are clustered
+    with exponentially weighted averages, each cluster loosely tied to
+    the standard 1:3:7 ratios so a run of only dits or only element
+    gaps does not leave the other estimates stale.
     """
     
-    def __init__(self, wpm: int = 20, tone_freq: int = 700):
+    # Weight of a new duration in its cluster average
+    ADAPT_RATE = 0.3
+    # Pull of each cluster towards the ratio implied by the others
+    RATIO_RATE = 0.1
+    # Range of speeds the estimator will follow
+    MIN_WPM = 5
+    MAX_WPM = 60
+    # Nominal length of each timing entry in dit units
+    UNITS = {'dit_ms': 1, 'dah_ms': 3, 'element_gap_ms': 1,
+             'letter_gap_ms': 3, 'word_gap_ms': 7}
+    
+    def __init__(self, wpm: int = 20, tone_freq: int = 700, adaptive: bool = True):
         """
         Initialize decoder.
         
         Args:
-            wpm: Expected words per minute
+            wpm: Expected words per minute (starting point when adaptive)
             tone_freq: Expected tone frequency in Hz
+            adaptive: Track the sending speed from received timing
         """
         self.wpm = wpm
         self.tone_freq = tone_freq
+        self.adaptive = adaptive
         self.timing = get_timing(wpm)
         
         self.current_code = []
@@ -119,6 +541,61 @@ class MorseDecoder:
         
         self.tone_start = None
         self.silence_start = None
+        self._last_mark_ms = None
+        self._last_unit_ms = None
+    
+    @property
+    def estimated_wpm(self) -> float:
+        """Current estimate of the sending speed."""
+        return 1200 / self._unit_ms()
+    
+    def set_wpm(self, wpm: int):
+        """
+        Reset the timing estimates to a new expected speed.
+        
+        Decoded text and any partial character are kept.
+        
+        Args:
+            wpm: Expected words per minute
+        """
+        self.wpm = wpm
+        self.timing = get_timing(wpm)
+    
+    def _unit_ms(self) -> float:
+        """Dit unit implied by the current dit and dah estimates."""
+        return (self.timing['dit_ms'] + self.timing['dah_ms'] / 3) / 2
+    
+    def _adapt(self, key: str, duration_ms: float, partner: str):
+        """
+        Move one timing cluster towards a newly classified duration.
+        
+        The partner cluster is nudged towards its nominal ratio to the
+        updated one, and both are kept within MIN_WPM..MAX_WPM.
+        """
+        timing = self.timing
+        timing[key] += self.ADAPT_RATE * (duration_ms - timing[key])
+        target = timing[key] * self.UNITS[partner] / self.UNITS[key]
+        timing[partner] += self.RATIO_RATE * (target - timing[partner])
+        self._clamp(key)
+        self._clamp(partner)
+        
+        # Word gaps are too rare and irregular to track on their own
+        timing['word_gap_ms'] = timing['letter_gap_ms'] * 7 / 3
+    
+    def _clamp(self, key: str):
+        """Keep a timing entry within the followed speed range."""
+        units = self.UNITS[key]
+        low = units * 1200 / self.MAX_WPM
+        high = units * 1200 / self.MIN_WPM
+        self.timing[key] = min(max(self.timing[key], low), high)
+    
+    def _follow_marks(self):
+        """Nudge the gap estimates towards the speed of the marks."""
+        timing = self.timing
+        unit = self._unit_ms()
+        timing['element_gap_ms'] += self.ADAPT_RATE * (unit - timing['element_gap_ms'])
+        timing['letter_gap_ms'] += self.ADAPT_RATE * (3 * unit - timing['letter_gap_ms'])
+        timing['word_gap_ms'] = timing['letter_gap_ms'] * 7 / 3
     
     def process_tone(self, duration_ms: float):
         """
@@ -127,12 +604,31 @@ class MorseDecoder:
         Args:
             duration_ms: Duration of tone in milliseconds
         """
-        threshold = (self.timing['dit_ms'] + self.timing['dah_ms']) / 2
+        threshold = math.sqrt(self.timing['dit_ms'] * self.timing['dah_ms'])
+        is_dit = duration_ms < threshold
+        
+        # A mark less than half (or more than twice) the previous one
+        # must be of the other kind, which catches up with sudden speed
+        # changes before the averages do
+        last = self._last_mark_ms
+        if self.adaptive and last is not None:
+            if not is_dit and duration_ms * 2 < last:
+                is_dit = True
+            elif is_dit and duration_ms > last * 2:
+                is_dit = False
+        self._last_mark_ms = duration_ms
+        self._last_unit_ms = duration_ms if is_dit else duration_ms / 3
         
-        if duration_ms < threshold:
+        if is_dit:
             self.current_code.append('.')
+            if self.adaptive:
+                self._adapt('dit_ms', duration_ms, 'dah_ms')
+                self._follow_marks()
         else:
             self.current_code.append('-')
+            if self.adaptive:
+                self._adapt('dah_ms', duration_ms, 'dit_ms')
+                self._follow_marks()
     
     def process_silence(self, duration_ms: float):
         """
@@ -141,12 +637,27 @@ class MorseDecoder:
         Args:
             duration_ms: Duration of silence in milliseconds
         """
+        # Thresholds sit between the gap estimates (on a log scale) so
+        # measured durations with some jitter are still classified correctly
+        letter_threshold = math.sqrt(self.timing['element_gap_ms'] * self.timing['letter_gap_ms'])
+        word_threshold = math.sqrt(self.timing['letter_gap_ms'] * self.timing['word_gap_ms'])
+        
+        # Element gaps are one unit even with stretched letter spacing,
+        # so the unit of the mark just received is the most current guide
+        if self.adaptive and self._last_unit_ms is not None:
+            letter_threshold = 2 * self._last_unit_ms
+            word_threshold = max(word_threshold, letter_threshold * 2)
+        
         # Short silence: element gap (within letter)
-        if duration_ms < self.timing['letter_gap_ms']:
+        if duration_ms < letter_threshold:
+            if self.adaptive:
+                self._adapt('element_gap_ms', duration_ms, 'letter_gap_ms')
             return
         
         # Medium silence: letter gap
-        if duration_ms < self.timing['word_gap_ms']:
+        if duration_ms < word_threshold:
+            if self.adaptive:
+                self._adapt('letter_gap_ms', duration_ms, 'element_gap_ms')
             if self.current_code:
                 morse_char = ''.join(self.current_code)
                 if morse_char in CODE_TO_CHAR:
@@ -183,7 +694,8 @@ class MorseEncoder:
     Generate Morse code audio from text.
     """
     
-    def __init__(self, wpm: int = 20, tone_freq: int = 700, sample_rate: int = 44100):
+    def __init__(self, wpm: int = 20, tone_freq: int = 700, sample_rate: int = 44100,
+                 glyph_cache=None):
         """
         Initialize encoder.
         
@@ -191,11 +703,17 @@ class MorseEncoder:
             wpm: Words per minute
             tone_freq: Audio tone frequency in Hz
             sample_rate: Audio sample rate
+            glyph_cache: Optional GlyphCache used to assemble messages
+                from pre-rendered characters
         """
         self.wpm = wpm
         self.tone_freq = tone_freq
         self.sample_rate = sample_rate
         self.timing = get_timing(wpm)
+        self.glyph_cache = glyph_cache
+        
+        # Rendered dit/dah segments, keyed by element and parameters
+        self._tone_cache = {}
     
     def generate_audio(self, text: str) -> bytes:
         """
@@ -207,52 +725,217 @@ class MorseEncoder:
         Returns:
             WAV audio data as bytes
         """
+        plan = self.compile(text)
+        frames = 65536
+        return self._pcm_to_wav(self.render_plan(plan, start, start + frames)
+                                for start in range(0, plan.total_samples, frames))
+    
+    def compile(self, text: str):
+        """
+        Compile text to a TimingPlan for this encoder's speed and rate.
+        
+        Plans are cached, so compiling the same message again is free.
+        """
+        # The plan module builds on this one, so it is imported late
+        try:
+            from .plan import compile_plan
+        except ImportError:  # Running as a script from the morse_chat directory
+            from plan import compile_plan
+        return compile_plan(text, self.wpm, self.sample_rate)
+    
+    def render_plan(self, plan, start: int = 0, stop: int = None):
+        """
+        Render a timing plan, or a range of its samples, to 16-bit PCM.
+        
+        Only the events overlapping the range are rendered, so a long
+        plan can be rendered frame by frame or from any position.
+        
+        Args:
+            plan: TimingPlan, e.g. from compile()
+            start: First sample to render
+            stop: End of the range (default: end of the plan)
+            
+        Returns:
+            NumPy int16 array of mono samples
+        """
         import numpy as np
-        import io
-        import wave
         
-        morse = text_to_morse(text)
-        samples = []
+        stop = plan.total_samples if stop is None else min(stop, plan.total_samples)
+        pcm = np.zeros(max(stop - start, 0), dtype=np.int16)
+        if not len(pcm):
+            return pcm
+        
+        offsets = plan.offsets
+        first = np.searchsorted(offsets, start, side='right') - 1
+        last = np.searchsorted(offsets, stop, side='left')
+        for index in range(first, last):
+            key_down, count = plan.events[index]
+            if not key_down:
+                continue
+            tone = self._keyed_samples(int(count))
+            begin = int(offsets[index])
+            lo, hi = max(begin, start), min(begin + count, stop)
+            pcm[lo - start:hi - start] = tone[lo - begin:hi - begin]
         
-        t = 0
+        return pcm
+    
+    def stream_pcm(self, text, frames: int = 1024):
+        """
+        Render text to 16-bit PCM in fixed-size frames.
+        
+        Characters are converted and rendered lazily as frames are
+        consumed, so memory use does not depend on message length and
+        the first frame is available after rendering a single letter.
+        
+        Args:
+            text: Text to encode, or an iterable of text chunks
+            frames: Samples per yielded frame
+            
+        Yields:
+            NumPy int16 arrays of `frames` samples; the last one may
+            be shorter
+        """
+        import numpy as np
+        
+        rendered = {}
+        buffer = np.empty(frames, dtype=np.int16)
+        fill = 0
+        
+        first = True
+        for code in iter_morse(text):
+            # Letters are separated by a letter gap, as in text_to_morse
+            tokens = (code,) if first else (' ', code)
+            for token in tokens:
+                segment = rendered.get(token)
+                if segment is None:
+                    segment = self._render_token(token)
+                    rendered[token] = segment
+                
+                pos = 0
+                while pos < len(segment):
+                    count = min(frames - fill, len(segment) - pos)
+                    buffer[fill:fill + count] = segment[pos:pos + count]
+                    fill += count
+                    pos += count
+                    if fill == frames:
+                        yield buffer.copy()
+                        fill = 0
+            first = False
+        
+        if fill:
+            yield buffer[:fill].copy()
+    
+    def _render_token(self, code: str):
+        """Render one letter's Morse code or a gap, via the glyph cache if set."""
+        if self.glyph_cache is not None:
+            return self.glyph_cache.glyph(self, code)
+        return self.render_morse(code)
+    
+    def render_pcm(self, text: str):
+        """
+        Render the given text to 16-bit PCM samples.
+        
+        With a glyph cache attached, the message is assembled from
+        pre-rendered characters instead of being synthesized.
+        
+        Args:
+            text: Text to encode as Morse code
+            
+        Returns:
+            NumPy int16 array of mono samples
+        """
+        if self.glyph_cache is not None:
+            return self.glyph_cache.render(self, text)
+        return self.render_morse(text_to_morse(text))
+    
+    def render_morse(self, morse: str):
+        """
+        Render a Morse code string to 16-bit PCM samples.
+        
+        The total sample count is worked out from the Morse string up
+        front and every keyed element is copied into a single
+        preallocated buffer from precomputed tone segments.
+        
+        Args:
+            morse: Morse code string as produced by text_to_morse
+            
+        Returns:
+            NumPy int16 array of mono samples
+        """
+        import numpy as np
+        
+        counts = self._sample_counts()
+        dit = self._keyed_tone('dit')
+        dah = self._keyed_tone('dah')
+        gap = counts['element_gap']
+        
+        # Samples consumed by each symbol of the Morse string
+        steps = {
+            '.': len(dit) + gap,
+            '-': len(dah) + gap,
+            ' ': counts['letter_gap'],
+            '/': counts['word_gap'],
+        }
+        total = sum(morse.count(symbol) * step for symbol, step in steps.items())
+        pcm = np.zeros(total, dtype=np.int16)
+        
+        pos = 0
         for element in morse:
             if element == '.':
-                # Dit
-                duration = self.timing['dit_ms'] / 1000
-                samples.extend(self._generate_tone(duration))
-                samples.extend(self._generate_silence(self.timing['element_gap_ms'] / 1000))
-                
+                pcm[pos:pos + len(dit)] = dit
             elif element == '-':
-                # Dah
-                duration = self.timing['dah_ms'] / 1000
-                samples.extend(self._generate_tone(duration))
-                samples.extend(self._generate_silence(self.timing['element_gap_ms'] / 1000))
-                
-            elif element == ' ':
-                # Letter gap (already have element gap, add more)
-                additional = (self.timing['letter_gap_ms'] - self.timing['element_gap_ms']) / 1000
-                samples.extend(self._generate_silence(additional))
-                
-            elif element == '/':
-                # Word gap (already have letter gap, add more)
-                additional = (self.timing['word_gap_ms'] - self.timing['letter_gap_ms']) / 1000
-                samples.extend(self._generate_silence(additional))
+                pcm[pos:pos + len(dah)] = dah
+            pos += steps.get(element, 0)
         
-        # Convert to 16-bit PCM
-        audio_array = np.array(samples, dtype=np.float32)
-        audio_int16 = (audio_array * 32767).astype(np.int16)
+        return pcm
+    
+    def _sample_counts(self) -> dict:
+        """Sample counts for each keyed element and gap."""
+        return sample_counts(self.wpm, self.sample_rate)
+    
+    def _keyed_tone(self, element: str):
+        """Precomputed int16 tone segment for a dit or dah."""
+        import numpy as np
+        
+        key = (element, self.wpm, self.tone_freq, self.sample_rate)
+        if key not in self._tone_cache:
+            duration = self.timing[f'{element}_ms'] / 1000
+            tone = self._generate_tone(duration).astype(np.float32)
+            self._tone_cache[key] = (tone * 32767).astype(np.int16)
+        return self._tone_cache[key]
+    
+    def _keyed_samples(self, count: int):
+        """Tone segment for a key-down period of any length in samples."""
+        import numpy as np
+        
+        for element in ('dit', 'dah'):
+            tone = self._keyed_tone(element)
+            if len(tone) == count:
+                return tone
+        
+        key = ('samples', count, self.tone_freq, self.sample_rate)
+        if key not in self._tone_cache:
+            tone = self._generate_tone(count / self.sample_rate).astype(np.float32)
+            tone = np.resize((tone * 32767).astype(np.int16), count)
+            self._tone_cache[key] = tone
+        return self._tone_cache[key]
+    
+    def _pcm_to_wav(self, chunks) -> bytes:
+        """Wrap chunks of int16 PCM samples in a mono 16-bit WAV container."""
+        import io
+        import wave
         
-        # Create WAV file in memory
         wav_buffer = io.BytesIO()
         with wave.open(wav_buffer, 'wb') as wf:
             wf.setnchannels(1)  # Mono
             wf.setsampwidth(2)  # 16-bit
             wf.setframerate(self.sample_rate)
-            wf.writeframes(audio_int16.tobytes())
+            for pcm in chunks:
+                wf.writeframes(pcm.tobytes())
         
         return wav_buffer.getvalue()
     
-    def _generate_tone(self, duration: float) -> list:
+    def _generate_tone(self, duration: float):
         """Generate tone samples."""
         import numpy as np
         
@@ -268,9 +951,4 @@ class MorseEncoder:
             envelope[-envelope_samples:] = np.linspace(1, 0, envelope_samples)
             tone *= envelope
         
-        return tone.tolist()
-    
-    def _generate_silence(self, duration: float) -> list:
-        """Generate silence samples."""
-        num_samples = int(self.sample_rate * duration)
-        return [0.0] * num_samples
+        return tone
@@ -0,0 +1,162 @@
+"""
+Persistent audio output engine.
+"""
+
+import threading
+from collections import deque
+
+import numpy as np
+
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
+
+
+class AudioOutput:
+    """
+    One long-lived callback-mode output stream fed from a queue of PCM.
+
+    PortAudio is initialized once and the stream stays open, playing
+    silence when nothing is queued, so starting a clip is only a queue
+    operation. Buffers are mixed into the stream by read(), which the
+    PortAudio callback calls; without a device the same method can be
+    called directly to pull the audio (e.g. in tests).
+
+    An object with the same read() method, such as a TransmitScheduler,
+    can be set as the source; it is then played instead of the queue.
+    """
+
+    def __init__(self, sample_rate: int = 44100, frames_per_buffer: int = 256):
+        """
+        Initialize engine; no device is opened until open() is called.
+
+        Args:
+            sample_rate: Sample rate of all queued audio
+            frames_per_buffer: Samples per callback, which bounds the
+                latency from queueing a clip to hearing it
+        """
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.device = None
+        self.frames_played = 0  # Samples handed to the device so far
+        self.source = None  # Played instead of the queue when set
+
+        self._buffers = deque()
+        self._offset = 0  # Samples of the first buffer already played
+        self._lock = threading.Lock()
+
+        self._pyaudio = None
+        self._stream = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        return self._stream is not None
+
+    @property
+    def pending_samples(self) -> int:
+        """Samples queued and not yet played."""
+        with self._lock:
+            return sum(len(pcm) for pcm in self._buffers) - self._offset
+
+    def open(self, device: int = None):
+        """
+        Open (or reopen) the stream on an output device.
+
+        Queued audio is kept and continues on the new device.
+
+        Args:
+            device: PyAudio output device index, or None for the default
+
+        Raises:
+            RuntimeError: If PyAudio is not installed
+        """
+        if pyaudio is None:
+            raise RuntimeError("PyAudio is not installed")
+        self._close_stream()
+        if self._pyaudio is None:
+            self._pyaudio = pyaudio.PyAudio()
+        self.device = device
+        self._stream = self._pyaudio.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=self.sample_rate,
+            output=True,
+            output_device_index=device,
+            frames_per_buffer=self.frames_per_buffer,
+            stream_callback=self._callback,
+        )
+
+    def queue(self, pcm):
+        """Play int16 samples after everything already queued."""
+        pcm = np.asarray(pcm, dtype=np.int16)
+        if len(pcm):
+            with self._lock:
+                self._buffers.append(pcm)
+
+    def interrupt(self, pcm=None):
+        """Cut off queued and playing audio and start pcm (if given) at once."""
+        pcm = None if pcm is None else np.asarray(pcm, dtype=np.int16)
+        with self._lock:
+            self._buffers.clear()
+            self._offset = 0
+            if pcm is not None and len(pcm):
+                self._buffers.append(pcm)
+
+    def stop(self):
+        """Silence the output and drop everything queued."""
+        self.interrupt()
+
+    def read(self, frames: int) -> np.ndarray:
+        """
+        Take the next samples to play, padded with silence.
+
+        Args:
+            frames: Samples wanted
+
+        Returns:
+            NumPy int16 array of exactly `frames` samples
+        """
+        source = self.source
+        if source is not None:
+            out = source.read(frames)
+            self.frames_played += frames
+            return out
+
+        out = np.zeros(frames, dtype=np.int16)
+        filled = 0
+        with self._lock:
+            while filled < frames and self._buffers:
+                head = self._buffers[0]
+                count = min(frames - filled, len(head) - self._offset)
+                out[filled:filled + count] = head[self._offset:self._offset + count]
+                filled += count
+                self._offset += count
+                if self._offset == len(head):
+                    self._buffers.popleft()
+                    self._offset = 0
+            self.frames_played += frames
+        return out
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        """PortAudio callback; runs on PortAudio's thread."""
+        return self.read(frame_count).tobytes(), pyaudio.paContinue
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+
+    def close(self):
+        """Close the stream and release PortAudio."""
+        self._close_stream()
+        if self._pyaudio is not None:
+            self._pyaudio.terminate()
+            self._pyaudio = None
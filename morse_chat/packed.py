@@ -0,0 +1,190 @@
+"""
+Bit-packed Morse code for storage and transport.
+
+Each symbol of the Morse string form ('.', '-', ' ' and '/') takes two
+bits, four to a byte with the first symbol in the low bits. A leading
+byte holds the number of padding symbols in the last byte, so packed
+Morse is a quarter of the size of the string and needs no other framing
+than its length.
+"""
+
+import numpy as np
+
+# Symbol for each two-bit code
+SYMBOLS = b'.- /'
+DIT, DAH, LETTER_GAP, WORD_GAP = range(4)
+
+# Durations in dit units, keyed like MorseEncoder._sample_counts(). The
+# gaps count only the silence added after an element's own gap.
+UNIT_COUNTS = {'dit': 1, 'dah': 3, 'element_gap': 1, 'letter_gap': 2, 'word_gap': 4}
+
+_INVALID = 0xFF
+
+
+def _build_code_table() -> np.ndarray:
+    """Two-bit code of every byte, or _INVALID."""
+    table = np.full(256, _INVALID, dtype=np.uint8)
+    for code, symbol in enumerate(SYMBOLS):
+        table[symbol] = code
+    return table
+
+
+def _build_unpack_table(alphabet: bytes) -> np.ndarray:
+    """The four symbols of every packed byte as one little-endian word."""
+    table = bytearray()
+    for byte in range(256):
+        table.extend(alphabet[(byte >> shift) & 3] for shift in (0, 2, 4, 6))
+    return np.frombuffer(bytes(table), dtype='<u4')
+
+
+_CODE_TABLE = _build_code_table()
+_UNPACK_SYMBOLS = _build_unpack_table(SYMBOLS)
+_UNPACK_CODES = _build_unpack_table(bytes(range(4)))
+
+# Morse for a mark followed by each class of gap, in NUL-padded slots
+# indexed by 2 * gap class + (1 if dah)
+_MARK_SLOTS = np.frombuffer(b''.join(token.ljust(4, b'\0') for token in (
+    b'.', b'-', b'. ', b'- ', b'. / ', b'- / ')), dtype='<u4')
+
+
+def pack(morse) -> bytes:
+    """
+    Pack a Morse code string.
+
+    Args:
+        morse: Morse code as produced by text_to_morse, as str or any
+            bytes-like object (read in place)
+
+    Returns:
+        Packed bytes
+
+    Raises:
+        ValueError: If the string holds anything but '.', '-', ' ' and '/'
+    """
+    if isinstance(morse, str):
+        morse = morse.encode('ascii', 'replace')
+    codes = _CODE_TABLE.take(np.frombuffer(morse, dtype=np.uint8))
+    return pack_codes(codes)
+
+
+def pack_codes(codes: np.ndarray) -> bytes:
+    """
+    Pack an array of two-bit symbol codes (DIT, DAH, LETTER_GAP, WORD_GAP).
+
+    Raises:
+        ValueError: If a code is out of range
+    """
+    if len(codes) and codes.max() > WORD_GAP:
+        raise ValueError("Morse code may only contain '.', '-', ' ' and '/'")
+    padding = -len(codes) % 4
+    quads = np.zeros((len(codes) + padding) // 4 * 4, dtype=np.uint8)
+    quads[:len(codes)] = codes
+    quads = quads.reshape(-1, 4)
+    packed = quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6
+    return bytes([padding]) + packed.tobytes()
+
+
+def _unpack(packed, table: np.ndarray) -> bytes:
+    """Expand packed Morse through an unpack table, without the padding."""
+    data = np.frombuffer(packed, dtype=np.uint8)
+    if not len(data) or data[0] > 3 or (data[0] and len(data) == 1):
+        raise ValueError("not packed Morse code")
+    expanded = table.take(data[1:]).tobytes()
+    return expanded[:len(expanded) - int(data[0])]
+
+
+def unpack(packed) -> str:
+    """
+    Unpack Morse code to its string form.
+
+    Args:
+        packed: Packed Morse as bytes, array('B') or any bytes-like
+            object (read in place)
+
+    Returns:
+        Morse code string
+    """
+    return _unpack(packed, _UNPACK_SYMBOLS).decode('ascii')
+
+
+def unpack_codes(packed) -> np.ndarray:
+    """Unpack Morse code to an array of two-bit symbol codes."""
+    return np.frombuffer(_unpack(packed, _UNPACK_CODES), dtype=np.uint8)
+
+
+def to_timing(packed, counts: dict = None) -> np.ndarray:
+    """
+    Key-down and key-up periods of packed Morse.
+
+    Every mark is followed by an element gap, and letter and word gaps
+    add to the silence before them, as MorseEncoder renders them.
+
+    Args:
+        packed: Packed Morse
+        counts: Duration of each element and gap, keyed like
+            UNIT_COUNTS (e.g. sample counts); defaults to dit units
+
+    Returns:
+        int32 array of shape (n, 2) holding (key_down, duration) runs,
+        alternating between key down (1) and key up (0)
+    """
+    counts = counts or UNIT_COUNTS
+    codes = unpack_codes(packed)
+    on = np.array([counts['dit'], counts['dah'], 0, 0], dtype=np.int64).take(codes)
+    off = np.array([counts['element_gap'], counts['element_gap'],
+                    counts['letter_gap'], counts['word_gap']], dtype=np.int64).take(codes)
+
+    durations = np.column_stack((on, off)).ravel()
+    states = np.tile(np.array([1, 0], dtype=np.int64), len(codes))
+    keep = durations > 0
+    durations, states = durations[keep], states[keep]
+    if not len(durations):
+        return np.zeros((0, 2), dtype=np.int32)
+
+    # Merge neighbouring periods with the same key state
+    starts = np.flatnonzero(np.diff(states, prepend=-1))
+    return np.column_stack((states[starts], np.add.reduceat(durations, starts))).astype(np.int32)
+
+
+def from_timing(timing, counts: dict = None) -> bytes:
+    """
+    Pack key-down and key-up periods as Morse.
+
+    Marks are classified as dits or dahs and gaps as element, letter or
+    word gaps by whichever duration they are nearest to (on a log
+    scale). Leading silence and the silence after the last mark are
+    dropped, so to_timing output of Morse for single-spaced text
+    converts back exactly.
+
+    Args:
+        timing: (key_down, duration) runs as returned by to_timing
+        counts: Durations the runs were made with; defaults to dit units
+
+    Returns:
+        Packed bytes
+    """
+    counts = counts or UNIT_COUNTS
+    timing = np.asarray(timing, dtype=np.int64).reshape(-1, 2)
+
+    # Merge repeated states, so each mark is followed by exactly one gap
+    states = timing[:, 0] != 0
+    starts = np.flatnonzero(np.diff(states.astype(np.int8), prepend=-1))
+    states = states[starts]
+    durations = np.add.reduceat(timing[:, 1], starts) if len(starts) else timing[:0, 1]
+
+    marks = np.flatnonzero(states)
+    if not len(marks):
+        return pack_codes(np.zeros(0, dtype=np.uint8))
+    # Silence after each mark; none after the last
+    gaps = np.zeros(len(marks), dtype=np.int64)
+    gaps[:-1] = durations[marks[:-1] + 1]
+
+    element = counts['element_gap']
+    letter = element + counts['letter_gap']
+    word = letter + counts['letter_gap'] + counts['word_gap']
+    is_dah = durations[marks] >= np.sqrt(counts['dit'] * counts['dah'])
+    gap_class = ((gaps >= np.sqrt(element * letter)).astype(np.int64)
+                 + (gaps >= np.sqrt(letter * word)))
+
+    tokens = _MARK_SLOTS.take(2 * gap_class + is_dah).tobytes()
+    return pack(tokens.translate(None, b'\0'))
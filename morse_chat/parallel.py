@@ -0,0 +1,278 @@
+"""
+Multi-process skimmer splitting the passband across CPU cores.
+"""
+
+import multiprocessing as mp
+import queue
+from multiprocessing import shared_memory
+
+import numpy as np
+
+try:
+    from .skimmer import Skimmer
+    from .detector import to_float32
+except ImportError:  # Running as a script from the morse_chat directory
+    from skimmer import Skimmer
+    from detector import to_float32
+
+# Seconds between checks that the workers are still running while
+# waiting for results
+_LIVENESS_INTERVAL = 1.0
+
+
+def _split_bins(n_bins: int, n_shards: int) -> list:
+    """Contiguous (start, stop) bin ranges covering n_bins."""
+    edges = np.linspace(0, n_bins, n_shards + 1).round().astype(int)
+    return [(int(start), int(stop)) for start, stop in zip(edges[:-1], edges[1:]) if stop > start]
+
+
+def _dft_basis(skimmer: Skimmer) -> np.ndarray:
+    """
+    Windowed DFT matrix for a skimmer's bins.
+
+    Multiplying frames by it gives the real parts of the bins in the
+    first n_bins columns and the imaginary parts in the rest, scaled as
+    Skimmer.spectra() scales them. For the few bins of one shard this is
+    cheaper than an FFT of the whole spectrum.
+    """
+    bins = np.arange(skimmer.low_bin, skimmer.high_bin + 1)
+    angles = 2 * np.pi * np.outer(np.arange(skimmer.fft_size), bins) / skimmer.fft_size
+    basis = np.concatenate([np.cos(angles), -np.sin(angles)], axis=1)
+    return (basis * (skimmer._window * skimmer._scale)[:, None]).astype(np.float32)
+
+
+def _shard_worker(worker_id, shm_name, slot_shape, context, skimmer_kwargs, tasks, results):
+    """
+    Worker process transforming and decoding one contiguous range of bins.
+
+    Reads audio from the shared slot named in each task and reports the
+    finished slot, with the channels closed and the text that changed
+    while decoding it, as one message on the results queue. An exception
+    is reported as an 'error' message before the worker exits.
+    """
+    shm = slots = None
+    try:
+        shm = shared_memory.SharedMemory(name=shm_name)
+        slots = np.ndarray(slot_shape, dtype=np.float32, buffer=shm.buf)
+
+        updates = []
+
+        def on_close(freq, text):
+            updates.append(('closed', freq, text))
+
+        skimmer = Skimmer(on_close=on_close, context_bins=context, **skimmer_kwargs)
+        basis = _dft_basis(skimmer)
+        sent = {}
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, n_samples = task
+            frames = np.lib.stride_tricks.sliding_window_view(
+                slots[slot, :n_samples], skimmer.fft_size)[::skimmer.hop]
+            spectrum = np.ascontiguousarray(frames) @ basis
+            skimmer.process_levels(np.hypot(spectrum[:, :skimmer.n_bins], spectrum[:, skimmer.n_bins:]))
+
+            for freq, text in skimmer.decoded().items():
+                if sent.get(freq) != text:
+                    sent[freq] = text
+                    updates.append(('text', freq, text))
+            # One message per slot; per-update messages cost more than
+            # decoding a short slot
+            results.put(('done', worker_id, slot, updates))
+            updates = []
+    except Exception as e:
+        results.put(('error', worker_id, f"{type(e).__name__}: {e}"))
+    finally:
+        # The array must go before the segment it maps can be closed
+        del slots
+        if shm is not None:
+            shm.close()
+
+
+class ParallelSkimmer:
+    """
+    Skimmer whose channels are decoded by a pool of worker processes.
+
+    The parent process only buffers audio: it writes whole frames of
+    samples into a ring of shared memory slots. Each long-lived worker
+    owns a contiguous range of bins, transforms just those bins with a
+    windowed DFT and runs a Skimmer over them, so both the transform and
+    the per-channel decoding are split across processes and no audio is
+    pickled. Decoded text comes back on a queue drained with poll(),
+    which is cheap enough to call from a Qt timer.
+    """
+
+    def __init__(self, workers: int = None, sample_rate: int = 44100,
+                 chunk_frames: int = 400, slots: int = 4, **skimmer_kwargs):
+        """
+        Initialize and start the worker processes.
+
+        Args:
+            workers: Number of worker processes (default: CPU count)
+            sample_rate: Input sample rate in Hz
+            chunk_frames: Frames of audio per shared memory slot
+            slots: Number of slots in flight between parent and workers
+            **skimmer_kwargs: Settings passed on to every Skimmer
+        """
+        # Band layout of the whole passband; it does no decoding itself
+        self.front = Skimmer(sample_rate=sample_rate, **skimmer_kwargs)
+        self.chunk_frames = chunk_frames
+        self.n_slots = slots
+        self._pending = np.zeros(0, dtype=np.float32)
+
+        shards = _split_bins(self.front.n_bins, workers or mp.cpu_count())
+        self.workers = len(shards)
+
+        front = self.front
+        slot_shape = (slots, (chunk_frames - 1) * front.hop + front.fft_size)
+        nbytes = int(np.prod(slot_shape)) * np.dtype(np.float32).itemsize
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._slots = np.ndarray(slot_shape, dtype=np.float32, buffer=self._shm.buf)
+
+        # Outstanding workers per slot; a slot is reused only when all are done
+        self._busy = [0] * slots
+        self._next_slot = 0
+        self._updates = []
+        self.texts = {}
+
+        self._results = mp.Queue()
+        self._tasks = []
+        self._processes = []
+        span = Skimmer.PEAK_SPAN
+        for worker_id, (start, stop) in enumerate(shards):
+            # Neighbouring bins are tracked for context so carriers on a
+            # shard edge are found by exactly one worker
+            context = (min(span, start), min(span, self.front.n_bins - stop))
+            kwargs = dict(skimmer_kwargs, sample_rate=sample_rate,
+                          low_hz=(self.front.low_bin + start - context[0] - 0.5) * self.front.bin_hz,
+                          high_hz=(self.front.low_bin + stop - 1 + context[1] + 0.5) * self.front.bin_hz)
+            tasks = mp.Queue()
+            process = mp.Process(target=_shard_worker, daemon=True,
+                                 args=(worker_id, self._shm.name, slot_shape, context, kwargs,
+                                       tasks, self._results))
+            process.start()
+            self._tasks.append(tasks)
+            self._processes.append(process)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def feed(self, pcm):
+        """
+        Hand the frames a chunk of audio completes to the workers.
+
+        Blocks only when every slot is still being decoded.
+
+        Args:
+            pcm: int16/float32 samples or raw int16 bytes of any length
+
+        Raises:
+            RuntimeError: If a worker has failed
+        """
+        hop, fft_size = self.front.hop, self.front.fft_size
+        samples = to_float32(pcm)
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+
+        n_frames = max((len(samples) - fft_size) // hop + 1, 0)
+        for first in range(0, n_frames, self.chunk_frames):
+            count = min(self.chunk_frames, n_frames - first)
+            # Frames overlap, so each slot repeats the tail of the last one
+            block = samples[first * hop:(first + count - 1) * hop + fft_size]
+            slot = self._next_slot
+            while self._busy[slot]:
+                self._handle(self._get())
+            self._next_slot = (slot + 1) % self.n_slots
+
+            self._slots[slot, :len(block)] = block
+            self._busy[slot] = self.workers
+            for tasks in self._tasks:
+                tasks.put((slot, len(block)))
+        self._pending = samples[n_frames * hop:].copy()
+
+    def _get(self):
+        """
+        Wait for the next message from the workers.
+
+        Raises:
+            RuntimeError: If a worker has exited
+        """
+        while True:
+            try:
+                return self._results.get(timeout=_LIVENESS_INTERVAL)
+            except queue.Empty:
+                for worker_id, process in enumerate(self._processes):
+                    if not process.is_alive():
+                        raise RuntimeError(f"Skimmer worker {worker_id} exited "
+                                           f"with code {process.exitcode}")
+
+    def poll(self) -> list:
+        """
+        Collect decoded text without blocking.
+
+        Returns:
+            List of (kind, freq, text) updates, where kind is 'text' for
+            a channel whose text changed and 'closed' for a closed one
+
+        Raises:
+            RuntimeError: If a worker has failed
+        """
+        while True:
+            try:
+                self._handle(self._results.get_nowait())
+            except queue.Empty:
+                break
+        updates, self._updates = self._updates, []
+        return updates
+
+    def flush(self) -> list:
+        """
+        Wait for all fed audio to be decoded and return pending updates.
+
+        Raises:
+            RuntimeError: If a worker has failed
+        """
+        while any(self._busy):
+            self._handle(self._get())
+        return self.poll()
+
+    def _handle(self, message):
+        """
+        Book-keep one message from a worker.
+
+        Raises:
+            RuntimeError: If the message reports a failed worker
+        """
+        if message[0] == 'error':
+            raise RuntimeError(f"Skimmer worker {message[1]} failed: {message[2]}")
+        _, worker_id, slot, updates = message
+        self._busy[slot] -= 1
+        for kind, freq, text in updates:
+            if kind == 'closed':
+                self.texts.pop(freq, None)
+            else:
+                self.texts[freq] = text
+        self._updates.extend(updates)
+
+    def decoded(self) -> dict:
+        """Text decoded so far on each open channel, keyed by frequency in Hz."""
+        return dict(self.texts)
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        if self._shm is None:
+            return
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        del self._slots
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
@@ -0,0 +1,85 @@
+"""
+Compiled timing plans shared by audio rendering, keying and display.
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from .morse import text_to_morse, sample_counts
+    from .packed import pack, to_timing
+except ImportError:  # Running as a script from the morse_chat directory
+    from morse import text_to_morse, sample_counts
+    from packed import pack, to_timing
+
+
+class TimingPlan:
+    """
+    A message compiled to key-down and key-up periods in samples.
+
+    Plans are immutable and shared between callers through
+    compile_plan's cache, so the same message can go to several sinks
+    (audio, a hardware keyer, a dit-dah display) without re-parsing.
+    """
+
+    def __init__(self, text: str, wpm: int, sample_rate: int, events: np.ndarray):
+        """
+        Initialize plan.
+
+        Args:
+            text: Message the plan was compiled from
+            wpm: Words per minute
+            sample_rate: Sample rate the durations are counted in
+            events: int32 array of (key_down, sample_count) runs
+        """
+        self.text = text
+        self.wpm = wpm
+        self.sample_rate = sample_rate
+        self.events = events
+        # Sample offset of each event, and of the end of the last one
+        self.offsets = np.concatenate(([0], np.cumsum(events[:, 1], dtype=np.int64)))
+        self.total_samples = int(self.offsets[-1])
+
+        events.flags.writeable = False
+        self.offsets.flags.writeable = False
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def duration_s(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    def key_times(self) -> list:
+        """
+        Key transitions for driving a keyer.
+
+        Returns:
+            List of (time_s, key_down) tuples, one per event
+        """
+        times = self.offsets[:-1] / self.sample_rate
+        return list(zip(times.tolist(), (self.events[:, 0] != 0).tolist()))
+
+    def key_down_at(self, sample: int) -> bool:
+        """Whether the key is down at a sample offset (e.g. the playback position)."""
+        if not 0 <= sample < self.total_samples:
+            return False
+        return bool(self.events[np.searchsorted(self.offsets, sample, side='right') - 1, 0])
+
+
+@lru_cache(maxsize=256)
+def compile_plan(text: str, wpm: int = 20, sample_rate: int = 44100) -> TimingPlan:
+    """
+    Compile text to a timing plan, once per (text, wpm, sample_rate).
+
+    Args:
+        text: Text to encode; unknown characters are dropped
+        wpm: Words per minute
+        sample_rate: Sample rate to count durations in
+
+    Returns:
+        Shared, read-only TimingPlan
+    """
+    counts = sample_counts(wpm, sample_rate)
+    return TimingPlan(text, wpm, sample_rate, to_timing(pack(text_to_morse(text)), counts))
@@ -0,0 +1,193 @@
+"""
+Memory-mapped access to long PCM recordings.
+"""
+
+import mmap
+import os
+import struct
+
+import numpy as np
+
+# WAVE_FORMAT codes in the fmt chunk
+_WAVE_PCM = 1
+_WAVE_FLOAT = 3
+_WAVE_EXTENSIBLE = 0xFFFE
+
+
+def _wav_layout(mm) -> tuple:
+    """
+    Locate the sample data of a RIFF/WAVE file.
+
+    Returns:
+        (data_offset, data_bytes, sample_rate, channels, dtype)
+
+    Raises:
+        ValueError: If the file is not a WAV file, is truncated or
+            malformed, or holds a sample format that is not supported
+    """
+    if len(mm) < 12 or mm[:4] != b'RIFF' or mm[8:12] != b'WAVE':
+        raise ValueError("not a RIFF/WAVE file")
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= len(mm):
+        chunk_id = mm[pos:pos + 4]
+        size, = struct.unpack('<I', mm[pos + 4:pos + 8])
+        body = pos + 8
+        if chunk_id == b'fmt ':
+            if size < 16 or body + 16 > len(mm):
+                raise ValueError("truncated WAV fmt chunk")
+            fmt = struct.unpack('<HHIIHH', mm[body:body + 16])
+            if fmt[0] == _WAVE_EXTENSIBLE:
+                if size < 26 or body + 26 > len(mm):
+                    raise ValueError("truncated WAV fmt chunk")
+                # The real format code leads the SubFormat GUID
+                fmt = struct.unpack('<H', mm[body + 24:body + 26]) + fmt[1:]
+            if fmt[1] == 0 or fmt[2] == 0:
+                raise ValueError(f"invalid WAV fmt chunk: {fmt[1]} channels at {fmt[2]} Hz")
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            format_code, channels, sample_rate, _, _, bits = fmt
+            if format_code == _WAVE_PCM and bits in (8, 16, 32):
+                dtype = np.dtype({8: 'u1', 16: '<i2', 32: '<i4'}[bits])
+            elif format_code == _WAVE_FLOAT and bits == 32:
+                dtype = np.dtype('<f4')
+            else:
+                raise ValueError(f"unsupported WAV format {format_code} with {bits} bits")
+            # Writers that were interrupted leave the size unset or too large
+            size = min(size, len(mm) - body)
+            return body, size, sample_rate, channels, dtype
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file has no data chunk")
+
+
+class PCMFile:
+    """
+    Read-only memory map of a WAV or raw PCM file.
+
+    Samples are exposed as a NumPy view of the mapping, so nothing is
+    read until it is touched and windows cost no copies. Pages behind
+    the reader are handed back to the OS with release(), keeping
+    resident memory to a few windows however long the recording is.
+    """
+
+    def __init__(self, path: str, sample_rate: int = None, channels: int = 1, dtype='<i2'):
+        """
+        Open and map a recording.
+
+        Args:
+            path: WAV file, or raw interleaved PCM if sample_rate is given
+            sample_rate: Sample rate of a raw file (read from WAV headers)
+            channels: Channel count of a raw file
+            dtype: Sample type of a raw file (default little-endian int16)
+
+        Raises:
+            ValueError: If the file is empty or not a supported WAV file,
+                or the raw sample rate or channel count is not positive
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            self._file.close()
+            raise ValueError(f"empty recording: {path}")
+
+        try:
+            if sample_rate is None:
+                offset, size, sample_rate, channels, dtype = _wav_layout(self._mmap)
+            elif sample_rate <= 0 or channels <= 0:
+                raise ValueError(f"invalid raw PCM layout: {channels} channels at {sample_rate} Hz")
+            else:
+                offset, size, dtype = 0, len(self._mmap), np.dtype(dtype)
+        except Exception:
+            self._mmap.close()
+            self._file.close()
+            raise
+
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.frame_bytes = self.dtype.itemsize * channels
+        self.data_offset = offset
+
+        frames = size // self.frame_bytes
+        self.samples = np.frombuffer(self._mmap, dtype=self.dtype, count=frames * channels,
+                                     offset=offset).reshape(frames, channels)
+        self._released = 0
+        self._advise(getattr(mmap, 'MADV_SEQUENTIAL', None), 0, len(self._mmap))
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def duration_s(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    def windows(self, frames: int, start: int = 0, hop: int = None):
+        """
+        Iterate over the recording in zero-copy windows.
+
+        Pages before each window are released as it is produced, so
+        earlier windows must not be kept.
+
+        Args:
+            frames: Frames per window
+            start: Frame to start from (e.g. a checkpoint offset)
+            hop: Frames between window starts (default: frames)
+
+        Yields:
+            (frame_offset, view) with views of shape (n, channels)
+        """
+        hop = hop or frames
+        for offset in range(start, len(self.samples), hop):
+            self.release(offset)
+            yield offset, self.samples[offset:offset + frames]
+
+    def mono(self, view: np.ndarray) -> np.ndarray:
+        """Downmix a window to float32 in [-1, 1)."""
+        if self.dtype.kind == 'f':
+            samples = view.astype(np.float32, copy=False)
+        else:
+            samples = view.astype(np.float32)
+            if self.dtype.kind == 'u':
+                samples -= 1 << (8 * self.dtype.itemsize - 1)
+            samples *= 1 / (1 << (8 * self.dtype.itemsize - 1))
+        if self.channels == 1:
+            return samples[:, 0]
+        return samples.mean(axis=1)
+
+    def release(self, frame: int):
+        """Drop resident pages holding frames before the given one."""
+        end = self.data_offset + frame * self.frame_bytes
+        end -= end % mmap.PAGESIZE
+        if end > self._released:
+            self._advise(getattr(mmap, 'MADV_DONTNEED', None), self._released, end - self._released)
+            self._released = end
+
+    def _advise(self, option, start: int, length: int):
+        """madvise where the platform supports it; purely an optimization."""
+        if option is not None and length > 0 and hasattr(self._mmap, 'madvise'):
+            self._mmap.madvise(option, start, length)
+
+    def close(self):
+        """Unmap the file; views obtained from it must be released first."""
+        if self._mmap is None:
+            return
+        self.samples = None
+        self._mmap.close()
+        self._mmap = None
+        self._file.close()
+
+
+def file_identity(path: str) -> tuple:
+    """(size, mtime_ns) used to check a checkpoint belongs to a file."""
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,199 @@
+"""
+Single-producer, multi-reader ring buffer for audio.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Bytes before the samples: the int64 write position and the end of
+# the write in progress
+_HEADER_BYTES = 64
+
+
+class RingBuffer:
+    """
+    Preallocated ring of samples written by one producer and read by
+    any number of readers, each with its own cursor.
+
+    The producer never waits: it copies samples in and then publishes
+    the new write position, a single int64 that only grows. Readers
+    take zero-copy views of what they have not read yet and check
+    afterwards that the producer did not lap them while they were
+    reading, so no lock is shared. A reader that falls a whole ring
+    behind loses the oldest audio and counts an overrun.
+
+    With shared=True the ring lives in multiprocessing.shared_memory,
+    and readers in other processes use RingBuffer.attach().
+    """
+
+    def __init__(self, capacity: int, dtype='<i2', shared: bool = False, name: str = None):
+        """
+        Create a ring buffer, or attach to a shared one by name.
+
+        Args:
+            capacity: Samples the ring holds
+            dtype: Sample type
+            shared: Back the ring with shared memory
+            name: Shared memory block of an existing ring to attach to
+        """
+        self.capacity = capacity
+        self.dtype = np.dtype(dtype)
+        nbytes = _HEADER_BYTES + capacity * self.dtype.itemsize
+
+        self._shm = None
+        if shared or name:
+            self._shm = shared_memory.SharedMemory(name=name, create=name is None, size=nbytes)
+            buffer = self._shm.buf
+        else:
+            buffer = bytearray(nbytes)
+        self._header = np.ndarray(2, dtype=np.int64, buffer=buffer)
+        self.samples = np.ndarray(capacity, dtype=self.dtype, buffer=buffer, offset=_HEADER_BYTES)
+        if name is None:
+            self._header[:] = 0
+
+    @classmethod
+    def attach(cls, name: str, capacity: int, dtype='<i2') -> 'RingBuffer':
+        """Open a shared ring created in another process."""
+        return cls(capacity, dtype=dtype, name=name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def name(self) -> str:
+        """Shared memory name to attach() with, or None if not shared."""
+        return self._shm.name if self._shm else None
+
+    @property
+    def written(self) -> int:
+        """Total samples written since the ring was created."""
+        return int(self._header[0])
+
+    @property
+    def reserved(self) -> int:
+        """End of the write in progress; equal to written between writes."""
+        return int(self._header[1])
+
+    def write(self, samples):
+        """
+        Append samples, overwriting the oldest ones.
+
+        Args:
+            samples: Array of samples, or raw bytes in the ring's dtype
+        """
+        if isinstance(samples, (bytes, bytearray, memoryview)):
+            samples = np.frombuffer(samples, dtype=self.dtype)
+        count = len(samples)
+        written = self.written
+        if count > self.capacity:
+            # Only the newest samples survive anyway
+            samples = samples[-self.capacity:]
+            written += count - self.capacity
+            count = self.capacity
+
+        # Readers check against the reserved end, so they also notice
+        # a write that is still in progress
+        self._header[1] = written + count
+        start = written % self.capacity
+        first = min(count, self.capacity - start)
+        self.samples[start:start + first] = samples[:first]
+        self.samples[:count - first] = samples[first:]
+        # Published only once the samples are in place
+        self._header[0] = written + count
+
+    def reader(self, start: int = None) -> 'RingReader':
+        """
+        Create a reader.
+
+        Args:
+            start: Write position to start reading from (default: now)
+        """
+        return RingReader(self, self.written if start is None else start)
+
+    def close(self):
+        """Detach from shared memory; views must be released first."""
+        if self._shm is not None:
+            self._header = None
+            self.samples = None
+            self._shm.close()
+
+    def unlink(self):
+        """Free the shared memory block (by its creator, once all are done)."""
+        if self._shm is not None:
+            self._shm.unlink()
+
+
+class RingReader:
+    """One reader's cursor into a RingBuffer."""
+
+    def __init__(self, ring: RingBuffer, cursor: int):
+        self.ring = ring
+        self.cursor = cursor
+        self.overruns = 0
+        self.lost = 0  # Samples overwritten before they were read
+
+    @property
+    def available(self) -> int:
+        """Samples written and not read yet (capped at the ring size)."""
+        return min(self.ring.written - self.cursor, self.ring.capacity)
+
+    def views(self, max_samples: int = None) -> list:
+        """
+        Zero-copy views of unread samples, oldest first.
+
+        The cursor is not moved; call consume() when done with the
+        views, which also tells whether they were overwritten meanwhile.
+
+        Args:
+            max_samples: Most samples to return
+
+        Returns:
+            Up to two arrays (two when the unread span wraps around)
+        """
+        self._skip_lost()
+        ring = self.ring
+        count = ring.written - self.cursor
+        if max_samples is not None:
+            count = min(count, max_samples)
+        start = self.cursor % ring.capacity
+        first = min(count, ring.capacity - start)
+        views = [ring.samples[start:start + first]]
+        if count > first:
+            views.append(ring.samples[:count - first])
+        return [view for view in views if len(view)]
+
+    def consume(self, count: int) -> bool:
+        """
+        Move the cursor past samples read through views().
+
+        Returns:
+            False if the producer overwrote any of them while they were
+            being read (counted as an overrun)
+        """
+        start = self.cursor
+        self.cursor += count
+        # The views were intact unless the producer has reserved space
+        # a whole ring past their start
+        intact = self.ring.reserved - start <= self.ring.capacity
+        if not intact:
+            self.overruns += 1
+        return intact
+
+    def read(self, max_samples: int = None) -> np.ndarray:
+        """Copy out unread samples and move the cursor past them."""
+        views = self.views(max_samples)
+        samples = np.concatenate(views) if views else np.zeros(0, dtype=self.ring.dtype)
+        self.consume(len(samples))
+        return samples
+
+    def _skip_lost(self):
+        """Jump over samples the producer has already overwritten."""
+        behind = self.ring.written - self.cursor
+        if behind > self.ring.capacity:
+            self.overruns += 1
+            self.lost += behind - self.ring.capacity
+            self.cursor += behind - self.ring.capacity
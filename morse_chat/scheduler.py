@@ -0,0 +1,392 @@
+"""
+Transmit scheduler: a priority queue of messages played back to back.
+"""
+
+import heapq
+import itertools
+import threading
+from collections import deque
+
+import numpy as np
+
+try:
+    from .plan import TimingPlan
+except ImportError:  # Running as a script from the morse_chat directory
+    from plan import TimingPlan
+
+
+class Transmission:
+    """
+    A message queued for, or sent by, a TransmitScheduler.
+
+    Times are sample positions on the scheduler's clock, which counts
+    the samples read from it, so they are exact whatever the buffer
+    size of the device reading it.
+    """
+
+    def __init__(self, item_id: int, priority: int, label: str, submitted_at: int):
+        self.id = item_id
+        self.priority = priority
+        self.label = label
+        self.state = 'queued'  # Then 'sending', 'sent', 'cancelled' or 'preempted'
+        self.submitted_at = submitted_at
+        self.started_at = None
+        self.finished_at = None
+        self.plan = None  # TimingPlan, when submitted as one
+        self.total_samples = 0
+        self._render = None
+
+    def __repr__(self):
+        return f"Transmission({self.id}, {self.label!r}, {self.state})"
+
+    @property
+    def wait_samples(self) -> int:
+        """Samples between submitting and starting, or None until started."""
+        return None if self.started_at is None else self.started_at - self.submitted_at
+
+
+class TransmitScheduler:
+    """
+    Queue of messages for one audio output, sent in priority order.
+
+    The scheduler is read like AudioOutput.read(), normally from the
+    output's callback (see AudioOutput.source). Each message starts
+    exactly `spacing` samples after the previous one ended, or as soon
+    as it is submitted when nothing is on the air. Messages given as
+    timing plans are rendered a buffer at a time as they are read, so
+    queueing a long message costs nothing up front.
+
+    Listeners added with add_listener() are called as listener(event,
+    transmission) with event 'start', 'finish', 'cancel' or 'preempt';
+    'start' and 'finish' come from the thread calling read().
+    """
+
+    def __init__(self, sample_rate: int = 44100, spacing: int = 0, max_history: int = 1000):
+        """
+        Initialize scheduler.
+
+        Args:
+            sample_rate: Sample rate of all submitted audio
+            spacing: Silent samples between consecutive messages
+            max_history: Wait times kept for wait_stats()
+        """
+        self.sample_rate = sample_rate
+        self.spacing = spacing
+        self.clock = 0  # Samples read so far
+        self.current = None  # Transmission on the air
+
+        self._heap = []  # (-priority, sequence, transmission)
+        self._queued = {}  # id -> queued Transmission
+        self._ids = itertools.count(1)
+        self._position = 0  # Samples of the current transmission read
+        self._next_start = 0  # Earliest sample the next message may start at
+        self._waits = deque(maxlen=max_history)
+        self._listeners = []
+        self._lock = threading.RLock()
+
+    @property
+    def depth(self) -> int:
+        """Messages waiting, not counting the one on the air."""
+        return len(self._queued)
+
+    @property
+    def idle(self) -> bool:
+        """Nothing on the air or queued."""
+        return self.current is None and not self._queued
+
+    def add_listener(self, listener):
+        """Call listener(event, transmission) on each scheduling event."""
+        self._listeners.append(listener)
+
+    def _notify(self, events):
+        for event, transmission in events:
+            for listener in self._listeners:
+                listener(event, transmission)
+
+    def _set_audio(self, transmission: Transmission, audio, encoder):
+        """Point a transmission at a timing plan or at PCM."""
+        if isinstance(audio, TimingPlan):
+            if encoder is None:
+                raise ValueError("An encoder is needed to send a timing plan")
+            if audio.sample_rate != self.sample_rate:
+                raise ValueError(f"Plan is at {audio.sample_rate} Hz, "
+                                 f"scheduler at {self.sample_rate} Hz")
+            transmission.plan = audio
+            transmission.total_samples = audio.total_samples
+            transmission._render = lambda start, stop: encoder.render_plan(audio, start, stop)
+        else:
+            pcm = np.asarray(audio, dtype=np.int16)
+            transmission.plan = None
+            transmission.total_samples = len(pcm)
+            transmission._render = lambda start, stop: pcm[start:stop]
+
+    def submit(self, audio, encoder=None, priority: int = 0, label: str = '') -> Transmission:
+        """
+        Queue a message.
+
+        Args:
+            audio: TimingPlan (e.g. from MorseEncoder.compile()) or int16
+                samples
+            encoder: MorseEncoder to render a plan with
+            priority: Higher priorities are sent first; equal ones in
+                the order submitted
+            label: Description, e.g. the message text
+
+        Returns:
+            The queued Transmission; its id is used to cancel or replace it
+
+        Raises:
+            ValueError: If a plan has no encoder or a different sample rate
+        """
+        with self._lock:
+            transmission = Transmission(next(self._ids), priority, label, self.clock)
+            self._set_audio(transmission, audio, encoder)
+            self._queued[transmission.id] = transmission
+            heapq.heappush(self._heap, (-priority, transmission.id, transmission))
+        return transmission
+
+    def send_now(self, audio, encoder=None, label: str = '') -> Transmission:
+        """
+        Cut off the message on the air and send this one at once.
+
+        Queued messages are kept and follow it as usual.
+
+        Args:
+            audio: TimingPlan or int16 samples, as for submit()
+            encoder: MorseEncoder to render a plan with
+            label: Description, e.g. the message text
+
+        Returns:
+            The Transmission, already on the air
+
+        Raises:
+            ValueError: If a plan has no encoder or a different sample rate
+        """
+        events = []
+        with self._lock:
+            transmission = Transmission(next(self._ids), None, label, self.clock)
+            self._set_audio(transmission, audio, encoder)
+            if self.current is not None:
+                events.append(('preempt', self._end_current('preempted')))
+            # The next read starts at self.clock
+            transmission.state = 'sending'
+            transmission.started_at = self.clock
+            self._waits.append(0)
+            self.current = transmission
+            self._position = 0
+            events.append(('start', transmission))
+        self._notify(events)
+        return transmission
+
+    def cancel(self, item_id: int) -> bool:
+        """
+        Drop a queued message, or stop it if it is on the air.
+
+        Returns:
+            False if the message was already sent or cancelled
+        """
+        with self._lock:
+            transmission = self._queued.pop(item_id, None)
+            if transmission is not None:
+                transmission.state = 'cancelled'
+            elif self.current is not None and self.current.id == item_id:
+                transmission = self._end_current('cancelled')
+                self._next_start = self.clock + self.spacing
+            else:
+                return False
+        self._notify([('cancel', transmission)])
+        return True
+
+    def replace(self, item_id: int, audio, encoder=None, label: str = None) -> bool:
+        """
+        Change the audio of a queued message, keeping its place in the queue.
+
+        Args:
+            item_id: Id of a queued Transmission
+            audio: TimingPlan or int16 samples, as for submit()
+            encoder: MorseEncoder to render a plan with
+            label: New description (default: unchanged)
+
+        Returns:
+            False if the message is no longer queued
+
+        Raises:
+            ValueError: If a plan has no encoder or a different sample rate
+        """
+        with self._lock:
+            transmission = self._queued.get(item_id)
+            if transmission is None:
+                return False
+            self._set_audio(transmission, audio, encoder)
+            if label is not None:
+                transmission.label = label
+        return True
+
+    def clear(self):
+        """Cancel everything queued and on the air."""
+        with self._lock:
+            ids = list(self._queued)
+            if self.current is not None:
+                ids.append(self.current.id)
+        for item_id in ids:
+            self.cancel(item_id)
+
+    def queued(self) -> list:
+        """Queued Transmissions in the order they will be sent."""
+        with self._lock:
+            return [entry[2] for entry in sorted(self._heap) if entry[2].id in self._queued]
+
+    def wait_stats(self) -> dict:
+        """
+        Queueing delays in seconds.
+
+        Returns:
+            Dictionary with depth, mean_wait_s and max_wait_s over the
+            last max_history messages started, and oldest_wait_s, how
+            long the longest-waiting queued message has waited so far
+        """
+        with self._lock:
+            waits = list(self._waits)
+            oldest = min((t.submitted_at for t in self._queued.values()), default=self.clock)
+            depth = len(self._queued)
+        return {
+            'depth': depth,
+            'mean_wait_s': sum(waits) / len(waits) / self.sample_rate if waits else 0.0,
+            'max_wait_s': max(waits, default=0) / self.sample_rate,
+            'oldest_wait_s': (self.clock - oldest) / self.sample_rate,
+        }
+
+    def _end_current(self, state: str) -> Transmission:
+        """Take the message on the air off at the current clock."""
+        transmission = self.current
+        transmission.state = state
+        transmission.finished_at = self.clock
+        self.current = None
+        return transmission
+
+    def _next_queued(self) -> Transmission:
+        """Highest-priority queued message, dropping cancelled entries."""
+        while self._heap and self._heap[0][2].id not in self._queued:
+            heapq.heappop(self._heap)
+        return self._heap[0][2] if self._heap else None
+
+    def read(self, frames: int) -> np.ndarray:
+        """
+        Take the next samples to play, padded with silence.
+
+        Args:
+            frames: Samples wanted
+
+        Returns:
+            NumPy int16 array of exactly `frames` samples
+        """
+        out = np.zeros(frames, dtype=np.int16)
+        events = []
+        with self._lock:
+            start = self.clock
+            filled = 0
+            while filled < frames:
+                transmission = self.current
+                if transmission is None:
+                    transmission = self._next_queued()
+                    if transmission is None:
+                        break
+                    # Left queued if it cannot start in this buffer, so
+                    # it can still be cancelled or overtaken
+                    begin = max(self._next_start, start + filled)
+                    if begin >= start + frames:
+                        break
+                    heapq.heappop(self._heap)
+                    del self._queued[transmission.id]
+                    transmission.state = 'sending'
+                    transmission.started_at = begin
+                    self._waits.append(transmission.wait_samples)
+                    self.current = transmission
+                    self._position = 0
+                    filled = begin - start
+                    events.append(('start', transmission))
+
+                count = min(frames - filled, transmission.total_samples - self._position)
+                if count:
+                    out[filled:filled + count] = transmission._render(self._position,
+                                                                     self._position + count)
+                    filled += count
+                    self._position += count
+                if self._position == transmission.total_samples:
+                    transmission.state = 'sent'
+                    transmission.finished_at = start + filled
+                    self.current = None
+                    self._next_start = transmission.finished_at + self.spacing
+                    events.append(('finish', transmission))
+            self.clock += frames
+        self._notify(events)
+        return out
+
+
+class NullSink:
+    """
+    Stand-in for an audio device, for running a scheduler headless.
+
+    Reads the scheduler in fixed buffers as a PortAudio callback would,
+    but as fast as asked, and records the sample at which each
+    transmission started and finished, and optionally the audio.
+    """
+
+    def __init__(self, scheduler: TransmitScheduler, frames_per_buffer: int = 256,
+                 record: bool = True):
+        """
+        Attach to a scheduler.
+
+        Args:
+            scheduler: TransmitScheduler to read
+            frames_per_buffer: Samples per read
+            record: Keep the audio read, for audio()
+        """
+        self.scheduler = scheduler
+        self.frames_per_buffer = frames_per_buffer
+        self.record = record
+        self.frames_played = 0
+        self.starts = []  # (transmission id, start sample)
+        self.finishes = []  # (transmission id, end sample, state)
+        self._chunks = []
+        scheduler.add_listener(self._on_event)
+
+    def _on_event(self, event, transmission):
+        if event == 'start':
+            self.starts.append((transmission.id, transmission.started_at))
+        elif transmission.finished_at is not None:
+            self.finishes.append((transmission.id, transmission.finished_at, transmission.state))
+
+    def pump(self, buffers: int = 1):
+        """Read a number of buffers."""
+        for _ in range(buffers):
+            pcm = self.scheduler.read(self.frames_per_buffer)
+            self.frames_played += len(pcm)
+            if self.record:
+                self._chunks.append(pcm)
+
+    def run(self, seconds: float):
+        """Read at least `seconds` of audio."""
+        samples = int(seconds * self.scheduler.sample_rate)
+        self.pump(-(-samples // self.frames_per_buffer))
+
+    def run_until_idle(self, max_seconds: float = 600.0) -> bool:
+        """
+        Read until nothing is on the air or queued.
+
+        Returns:
+            False if the scheduler was still busy after max_seconds
+        """
+        limit = self.frames_played + int(max_seconds * self.scheduler.sample_rate)
+        while not self.scheduler.idle:
+            if self.frames_played >= limit:
+                return False
+            self.pump()
+        return True
+
+    def audio(self) -> np.ndarray:
+        """Everything read so far, when recording."""
+        if not self._chunks:
+            return np.zeros(0, dtype=np.int16)
+        self._chunks = [np.concatenate(self._chunks)]
+        return self._chunks[0]
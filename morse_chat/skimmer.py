@@ -0,0 +1,333 @@
+"""
+Multi-signal CW skimmer decoding every carrier in the passband at once.
+"""
+
+import numpy as np
+
+try:
+    from .morse import MorseDecoder
+    from .detector import to_float32, decaying_peak, hysteresis
+except ImportError:  # Running as a script from the morse_chat directory
+    from morse import MorseDecoder
+    from detector import to_float32, decaying_peak, hysteresis
+
+
+class SkimmerChannel:
+    """
+    Decoder state for one carrier found by the skimmer.
+    """
+
+    def __init__(self, bin_index: int, freq: float, wpm: int):
+        """
+        Initialize channel.
+
+        Args:
+            bin_index: FFT bin of the carrier
+            freq: Carrier frequency in Hz
+            wpm: Starting speed for the channel's adaptive decoder
+        """
+        self.bin_index = bin_index
+        self.freq = freq
+        self.decoder = MorseDecoder(wpm=wpm, tone_freq=int(round(freq)))
+        self.idle_frames = 0
+
+    @property
+    def text(self) -> str:
+        """Text decoded on this channel so far."""
+        return self.decoder.get_decoded_text()
+
+
+class Skimmer:
+    """
+    FFT filterbank decoder for many CW signals in one audio stream.
+
+    Audio is cut into overlapping Hann-windowed frames and transformed
+    in batches. Level tracking and hysteresis keying are evaluated as
+    array operations over all frames and bins of a chunk at once, so the
+    per-signal Python work is limited to the handful of key transitions
+    fed to each channel's MorseDecoder.
+    """
+
+    # Bins either side a carrier must be strongest over
+    PEAK_SPAN = 1
+
+    def __init__(self, sample_rate: int = 44100, low_hz: float = 300, high_hz: float = 3300,
+                 window_ms: float = 40.0, hop_ms: float = 5.0, wpm: int = 20,
+                 min_snr: float = 8.0, on_ratio: float = 0.5, off_ratio: float = 0.3,
+                 peak_decay_s: float = 2.0, noise_time_s: float = 1.0,
+                 idle_timeout_s: float = 30.0, on_close=None, context_bins: tuple = (0, 0)):
+        """
+        Initialize skimmer.
+
+        Args:
+            sample_rate: Input sample rate in Hz
+            low_hz: Lower edge of the searched passband
+            high_hz: Upper edge of the searched passband
+            window_ms: FFT window length; longer windows separate closer
+                signals but blur the keying of fast ones
+            hop_ms: Time between frames (keying resolution)
+            wpm: Starting speed for each channel's adaptive decoder
+            min_snr: Peak to noise ratio for a bin to count as a carrier
+            on_ratio: Key-down threshold between noise (0) and peak (1)
+            off_ratio: Key-up threshold between noise (0) and peak (1)
+            peak_decay_s: Time for a bin's peak tracker to decay by e
+            noise_time_s: Time constant of each bin's noise estimate
+            idle_timeout_s: Silence after which a channel is closed
+            on_close: Optional callback(freq, text) for closed channels
+            context_bins: Bins at the (low, high) edge of the band that
+                are tracked for context but never opened as channels,
+                used when the band is one shard of a wider one
+        """
+        self.sample_rate = sample_rate
+        self.fft_size = max(8, int(sample_rate * window_ms / 1000))
+        self.hop = max(1, int(sample_rate * hop_ms / 1000))
+        self.hop_ms = self.hop * 1000 / sample_rate
+        self.bin_hz = sample_rate / self.fft_size
+
+        self.low_bin = max(1, int(np.ceil(low_hz / self.bin_hz)))
+        self.high_bin = min(self.fft_size // 2, int(high_hz / self.bin_hz))
+        self.n_bins = self.high_bin - self.low_bin + 1
+
+        self.wpm = wpm
+        self.min_snr = min_snr
+        self.on_ratio = on_ratio
+        self.off_ratio = off_ratio
+        self.idle_frames = int(idle_timeout_s * 1000 / self.hop_ms)
+        self.on_close = on_close
+        self.context_bins = context_bins
+
+        self._window = np.hanning(self.fft_size).astype(np.float32)
+        self._scale = 2 / self._window.sum()
+        self._log_decay = self.hop_ms / (peak_decay_s * 1000)
+        self._noise_frames = noise_time_s * 1000 / self.hop_ms
+
+        self.channels = {}  # bin index -> SkimmerChannel
+        self.reset()
+
+    def reset(self):
+        """Forget buffered audio, levels and all channels."""
+        self._pending = np.zeros(0, dtype=np.float32)
+        self.peak = np.full(self.n_bins, 1e-6)
+        self.noise = None
+        self.key_down = np.zeros(self.n_bins, dtype=bool)
+        self.run_frames = np.zeros(self.n_bins, dtype=np.int64)
+        self.flushed = np.zeros(self.n_bins, dtype=bool)
+        self.channels = {}
+
+    def spectra(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Band-limited magnitude spectra for all complete frames.
+
+        Args:
+            samples: float32 audio; consumed frames are not retained
+
+        Returns:
+            Array of shape (n_frames, n_bins) of tone amplitudes
+        """
+        n_frames = (len(samples) - self.fft_size) // self.hop + 1
+        if n_frames <= 0:
+            return np.zeros((0, self.n_bins))
+
+        frames = np.lib.stride_tricks.sliding_window_view(samples, self.fft_size)[::self.hop][:n_frames]
+        spectrum = np.fft.rfft(frames * self._window, axis=1)
+        band = spectrum[:, self.low_bin:self.high_bin + 1]
+        return np.abs(band) * self._scale
+
+    def analyze(self, pcm) -> np.ndarray:
+        """
+        Buffer a chunk of audio and transform the frames it completes.
+
+        Args:
+            pcm: int16/float32 samples or raw int16 bytes of any length
+
+        Returns:
+            Array of shape (n_frames, n_bins) of tone amplitudes
+        """
+        samples = to_float32(pcm)
+        if len(self._pending):
+            samples = np.concatenate([self._pending, samples])
+
+        levels = self.spectra(samples)
+        self._pending = samples[len(levels) * self.hop:].copy()
+        return levels
+
+    def process(self, pcm) -> dict:
+        """
+        Feed a chunk of audio to the skimmer.
+
+        Args:
+            pcm: int16/float32 samples or raw int16 bytes of any length
+
+        Returns:
+            Dict of channel frequency (Hz) -> list of (is_tone, duration_ms)
+            events decoded from this chunk
+        """
+        return self.process_levels(self.analyze(pcm))
+
+    def process_levels(self, levels: np.ndarray) -> dict:
+        """
+        Decode already transformed frames.
+
+        Args:
+            levels: Tone amplitudes of shape (n_frames, n_bins), as
+                returned by analyze()
+
+        Returns:
+            Dict of channel frequency (Hz) -> list of (is_tone, duration_ms)
+            events decoded from these frames
+        """
+        if len(levels) == 0:
+            return {}
+
+        if self.noise is None:
+            self.noise = np.full(self.n_bins, max(np.percentile(levels, 10), 1e-9))
+        noise = self.noise
+        peak = decaying_peak(levels, self.peak, self._log_decay)
+        self.peak = peak[-1]
+
+        span = peak - noise
+        valid = peak >= noise * self.min_snr
+        on_level = np.where(valid, noise + self.on_ratio * span, np.inf)
+        off_level = np.where(valid, noise + self.off_ratio * span, np.inf)
+        state = hysteresis(levels, on_level, off_level, self.key_down)
+        self._update_noise(levels, state)
+
+        self._find_carriers(peak, noise, valid)
+        events = self._emit_events(state)
+        self._close_idle_channels(valid)
+        return events
+
+    def _update_noise(self, levels: np.ndarray, state: np.ndarray):
+        """
+        Move each bin's noise estimate towards its mean key-up level.
+
+        Key-up frames include crosstalk from neighbouring signals, so in
+        a crowded band the estimate rises to the interference a carrier
+        has to stand out from. Frames whose window overlaps one of the
+        bin's own key-down frames are skipped, as they still carry the
+        tail of its signal.
+        """
+        reach = max(1, self.fft_size // self.hop)
+        keyed = np.cumsum(state, axis=0, dtype=np.int32)
+        keyed = np.concatenate([np.zeros((reach + 1, self.n_bins), dtype=np.int32), keyed,
+                                np.repeat(keyed[-1:], reach, axis=0)])
+        n_frames = len(state)
+        # Key-down frames within `reach` frames either side of each frame
+        nearby = keyed[2 * reach + 1:2 * reach + 1 + n_frames] - keyed[:n_frames]
+        key_up = nearby == 0
+        count = key_up.sum(axis=0)
+        total = np.einsum('ij,ij->j', levels, key_up)
+        mean = np.where(count > 0, total / np.maximum(count, 1), self.noise)
+        weight = 1 - np.exp(-count / self._noise_frames)
+        self.noise = np.maximum(self.noise + weight * (mean - self.noise), 1e-9)
+
+    def _find_carriers(self, peak: np.ndarray, noise: np.ndarray, valid: np.ndarray):
+        """Open channels on bins that peak above the noise in this chunk."""
+        strength = (peak / noise).max(axis=0)
+        strength[~valid.any(axis=0)] = 0
+
+        # A carrier is a local maximum across nearby bins; the Hann
+        # window spreads each one over its neighbours
+        span = self.PEAK_SPAN
+        padded = np.concatenate([np.zeros(span), strength, np.zeros(span)])
+        neighbours = np.lib.stride_tricks.sliding_window_view(padded, 2 * span + 1)
+        candidates = np.flatnonzero((strength > 0) & (strength >= neighbours.max(axis=1)))
+
+        claimed = np.zeros(self.n_bins + 2 * span, dtype=bool)
+        for other in self.channels:
+            claimed[other:other + 2 * span + 1] = True
+        claimed = claimed[span:span + self.n_bins]
+        low, high = self.context_bins
+        claimed[:low] = True
+        claimed[self.n_bins - high:] = True
+        candidates = candidates[~claimed[candidates]]
+
+        for index in candidates[np.argsort(-strength[candidates])]:
+            if claimed[index]:
+                continue
+            claimed[max(0, index - span):index + span + 1] = True
+            bin_index = index + self.low_bin
+            self.channels[index] = SkimmerChannel(bin_index, bin_index * self.bin_hz, self.wpm)
+            # Start the new channel from key-up with no earlier history
+            self.run_frames[index] = 0
+            self.flushed[index] = True
+
+    def _emit_events(self, state: np.ndarray) -> dict:
+        """Update run lengths for all bins and feed transitions to channels."""
+        n_frames = len(state)
+        changes = np.diff(state.astype(np.int8), axis=0,
+                          prepend=self.key_down[None].astype(np.int8))
+
+        events = {}
+        if self.channels:
+            frames, bins = np.nonzero(changes)
+            order = np.lexsort((frames, bins))
+            frames, bins = frames[order], bins[order]
+
+            for index, channel in self.channels.items():
+                lo, hi = np.searchsorted(bins, [index, index + 1])
+                channel_events = []
+                start = 0
+                for frame in frames[lo:hi]:
+                    self.run_frames[index] += frame - start
+                    channel_events.extend(self._end_run(channel, index))
+                    start = frame
+                self.run_frames[index] += n_frames - start
+                channel_events.extend(self._check_long_silence(channel, index))
+                if channel_events:
+                    events[channel.freq] = channel_events
+
+        # Bins without a channel only need their run lengths kept
+        unowned = np.ones(self.n_bins, dtype=bool)
+        unowned[list(self.channels)] = False
+        changed = changes.any(axis=0)
+        last_change = n_frames - 1 - np.argmax(changes[::-1] != 0, axis=0)
+        moved = unowned & changed
+        self.run_frames[unowned & ~changed] += n_frames
+        self.run_frames[moved] = n_frames - last_change[moved]
+        self.flushed[moved] = False
+
+        self.key_down = state[-1].copy()
+        return events
+
+    def _end_run(self, channel: SkimmerChannel, index: int) -> list:
+        """Report a finished run on a channel and flip its key state."""
+        duration = self.run_frames[index] * self.hop_ms
+        events = []
+        if self.key_down[index]:
+            channel.decoder.process_tone(duration)
+            events.append((True, duration))
+        elif not self.flushed[index] and self.run_frames[index]:
+            channel.decoder.process_silence(duration)
+            events.append((False, duration))
+
+        self.key_down[index] = not self.key_down[index]
+        self.run_frames[index] = 0
+        self.flushed[index] = False
+        return events
+
+    def _check_long_silence(self, channel: SkimmerChannel, index: int) -> list:
+        """Flush a channel's decoder once a silence passes its word gap."""
+        if self.key_down[index] or self.flushed[index]:
+            return []
+        duration = self.run_frames[index] * self.hop_ms
+        if duration < channel.decoder.timing['word_gap_ms']:
+            return []
+        channel.decoder.process_silence(duration)
+        self.flushed[index] = True
+        return [(False, duration)]
+
+    def _close_idle_channels(self, valid: np.ndarray):
+        """Close channels whose carrier has been gone for the idle timeout."""
+        active = valid.any(axis=0)
+        for index in list(self.channels):
+            channel = self.channels[index]
+            channel.idle_frames = 0 if active[index] else channel.idle_frames + len(valid)
+            if channel.idle_frames >= self.idle_frames:
+                del self.channels[index]
+                if self.on_close is not None:
+                    self.on_close(channel.freq, channel.text)
+
+    def decoded(self) -> dict:
+        """Text decoded so far on each open channel, keyed by frequency in Hz."""
+        return {channel.freq: channel.text for channel in self.channels.values()}
@@ -3,8 +3,27 @@
 Simple tests for Morse Chat functionality.
 """
 
-from morse_chat.morse import text_to_morse, morse_to_text, get_timing
-from morse_chat.abbreviations import expand_abbreviations, decode_rst
+import io
+import struct
+import wave
+
+from morse_chat.morse import text_to_morse, encode_many, IncrementalEncoder, morse_to_text, get_timing, MorseEncoder, MorseDecoder
+from morse_chat.abbreviations import expand_abbreviations, decode_rst, AbbreviationExpander, AbbreviationIndex
+from morse_chat.audio_cache import GlyphCache
+from morse_chat.detector import ToneDetector
+from morse_chat.skimmer import Skimmer
+from morse_chat.parallel import ParallelSkimmer
+from morse_chat.batch import decode_file, decode_files, Transcriber, save_checkpoint
+from morse_chat.recording import PCMFile
+from morse_chat import packed
+from morse_chat.plan import compile_plan
+from morse_chat.macros import MacroEngine, DEFAULT_MACROS
+from morse_chat.output import AudioOutput
+from morse_chat.scheduler import TransmitScheduler, NullSink
+from morse_chat.capture import AudioCapture
+from morse_chat.ring import RingBuffer
+from morse_chat.history import ChatHistory
+from morse_chat.complete import Completer
 
 def test_encoding():
     """Test text to Morse conversion."""
@@ -24,6 +43,53 @@ def test_encoding():
             print(f"     Expected: {expected}")
     print()
 
+def test_encode_many():
+    """Test batch encoding matches encoding one text at a time."""
+    texts = ["cq de w1abc", "", "5nn tu", "héllo #1 ß", "tab\there", "nul\0byte", "end "]
+    
+    print("Testing Batch Encoding:")
+    for batch in (texts, texts[:4], iter(texts)):
+        result = encode_many(batch)
+        ok = result == [text_to_morse(text) for text in texts[:len(result)]]
+        status = "✅" if ok else "❌"
+        print(f"  {status} {len(result)} texts → {result[3]}")
+        assert ok and len(result) >= 4
+    assert text_to_morse("héllo #1") == ".... .-.. .-.. --- / .----"
+    assert encode_many([]) == []
+    print()
+
+def test_incremental_encoding():
+    """Test the preview encoder follows edits anywhere in the text."""
+    encoder = IncrementalEncoder()
+    edits = ["C", "CQ", "CQ DE", "CQ DE W1ABC", "CQ W1ABC", "CQ ß# W1ABC", "QRZ? W1ABC",
+             "QRZ? W1ABC K", "", "73"]
+    
+    print("Testing Incremental Encoding:")
+    for text in edits:
+        result = encoder.update(text)
+        ok = result == text_to_morse(text)
+        status = "✅" if ok else "❌"
+        print(f"  {status} {text!r} → {result}")
+        assert ok
+    
+    # Edits reported as (position, removed, added), several per update,
+    # across chunks of a few characters
+    encoder = IncrementalEncoder(chunk_size=4)
+    text = "CQ CQ DE W1ABC K"
+    encoder.update(text)
+    reported = [[(2, 0, 3)], [(0, 2, 3), (9, 1, 0)], [(19, 0, 4), (4, 6, 0), (0, 0, 1)], [(0, 5, 0)]]
+    for changes in reported:
+        for position, removed, added in changes:
+            inserted = "#TEST 73 DE"[:added]
+            text = text[:position] + inserted + text[position + removed:]
+            encoder.edited(position, removed, added)
+        result = encoder.update(text)
+        ok = result == text_to_morse(text)
+        status = "✅" if ok else "❌"
+        print(f"  {status} {changes} → {text!r}")
+        assert ok
+    print()
+
 def test_decoding():
     """Test Morse to text conversion."""
     tests = [
@@ -41,6 +107,62 @@ def test_decoding():
             print(f"     Expected: {expected}")
     print()
 
+def test_bulk_decoding():
+    """Test long inputs decode the same as word-by-word splitting."""
+    from morse_chat import morse as morse_module
+    text = "CQ CQ DE W1ABC/P K UR 599 5NN TNX 73 " * 400
+    print("Testing Bulk Morse Decoding:")
+    # Irregular spacing, unknown codes, stray bytes, separators sharing
+    # a space and a '/' at either end
+    odd = "  .-   -... ........ .-x. / / / -.-.--/ .-/.  /  . / /  / -.-.--  ."
+    morse = "/ " + odd + " / " + text_to_morse(text) + odd + " /"
+    expected = ' '.join(morse_to_text(word) for word in morse.split(' / '))
+    for block in [morse_module._BULK_BLOCK, 64]:
+        saved, morse_module._BULK_BLOCK = morse_module._BULK_BLOCK, block
+        try:
+            results = [(name, morse_to_text(data)) for name, data in [
+                ("str", morse), ("bytes", morse.encode()), ("memoryview", memoryview(morse.encode()))]]
+        finally:
+            morse_module._BULK_BLOCK = saved
+        for name, result in results:
+            ok = result == expected
+            status = "✅" if ok else "❌"
+            print(f"  {status} {name}, {block}-byte blocks: {len(morse)} chars → ...{result[-24:]}")
+            assert ok
+    print()
+
+def test_packed_morse():
+    """Test bit-packed Morse against the string form and timings."""
+    import array
+    
+    text = "CQ CQ DE W1ABC/P K UR 599 TNX 73"
+    morse = text_to_morse(text)
+    data = packed.pack(morse)
+    encoder = MorseEncoder(wpm=25, sample_rate=8000)
+    counts = encoder._sample_counts()
+    timing = packed.to_timing(data, counts)
+    
+    print("Testing Packed Morse:")
+    checks = [
+        ("quarter size", len(data) == 1 + (len(morse) + 3) // 4),
+        ("bytes", packed.unpack(data) == morse),
+        ("array('B')", packed.unpack(array.array('B', data)) == morse),
+        ("empty", packed.unpack(packed.pack("")) == ""),
+        ("samples", timing[:, 1].sum() == len(encoder.render_morse(morse))),
+        ("from samples", packed.unpack(packed.from_timing(timing, counts)) == morse),
+        ("from units", packed.unpack(packed.from_timing(packed.to_timing(data))) == morse),
+    ]
+    for name, ok in checks:
+        status = "✅" if ok else "❌"
+        print(f"  {status} {name}")
+        assert ok
+    try:
+        packed.pack(".-x")
+        assert False, "invalid symbol accepted"
+    except ValueError:
+        pass
+    print()
+
 def test_abbreviations():
     """Test CW abbreviation expansion."""
     tests = [
@@ -60,6 +182,70 @@ def test_abbreviations():
             print(f"     Expected: {expected}")
     print()
 
+def test_abbreviation_stream():
+    """Test streamed expansion matches expanding the whole text."""
+    text = "CQ CQ DE W1ABC\nGM OM  TNX FER CALL UR RST 579 600\tHW? K"
+    
+    print("Testing Streamed Abbreviation Expansion:")
+    expander = AbbreviationExpander(show_original=False)
+    for size in (1, 3, 7, len(text)):
+        pieces = [expander.feed(text[i:i + size]) for i in range(0, len(text), size)]
+        pieces.append(expander.flush())
+        streamed = ''.join(pieces)
+        ok = streamed == expand_abbreviations(text, show_original=False)
+        status = "✅" if ok else "❌"
+        print(f"  {status} {size}-character pieces → {streamed}")
+        assert ok
+    print()
+
+def test_abbreviation_index():
+    """Test user dictionaries merge into an index rebuilt only on change."""
+    import os
+    import json
+    import tempfile
+    
+    print("Testing Abbreviation Index:")
+    with tempfile.TemporaryDirectory() as tmp:
+        calls = os.path.join(tmp, "calls.csv")
+        with open(calls, 'w') as f:
+            f.write("abbreviation,meaning\n# club members\nw1abc,Alice\nK2XYZ,\"Bob, Boston\"\n")
+        club = os.path.join(tmp, "club.json")
+        with open(club, 'w') as f:
+            json.dump({"TU": "thanks a lot"}, f)
+        path = os.path.join(tmp, "abbreviations.idx")
+        
+        with AbbreviationIndex.open([calls, club], path) as index:
+            built = os.stat(path).st_mtime_ns
+            expanded = AbbreviationExpander(index).expand("tu w1abc k2xyz qth 599 nil")
+        with AbbreviationIndex.open([calls, club], path) as index:
+            reused = os.stat(path).st_mtime_ns == built
+        
+        with open(club, 'w') as f:
+            json.dump({"TU": "thank you kindly"}, f)
+        os.utime(club, ns=(built + 10**9, built + 10**9))
+        with AbbreviationIndex.open([calls, club], path) as index:
+            rebuilt = index["TU"] == "thank you kindly"
+        
+        # A damaged index is rebuilt rather than read
+        with open(path, 'rb') as f:
+            data = f.read()
+        recovered = True
+        for damaged in (data[:60], data[:len(data) // 2], data[:-3], data + b'x'):
+            with open(path, 'wb') as f:
+                f.write(damaged)
+            with AbbreviationIndex.open([calls, club], path) as index:
+                recovered &= index["TU"] == "thank you kindly"
+    
+    expected = ("TU [thanks a lot] W1ABC [Alice] K2XYZ [Bob, Boston] QTH [location] "
+                "599 [599 (R5=perfectly readable, S9=extremely strong, T9=perfect DC tone)] NIL")
+    ok = expanded == expected and reused and rebuilt and recovered
+    status = "✅" if ok else "❌"
+    print(f"  {status} {expanded}")
+    print(f"     reused unchanged index: {reused}, rebuilt after edit: {rebuilt}, "
+          f"after damage: {recovered}")
+    assert ok
+    print()
+
 def test_rst():
     """Test RST signal report decoding."""
     tests = [
@@ -101,6 +287,587 @@ def test_roundtrip():
             print(f"     Got: {decoded}")
     print()
 
+def test_audio_generation():
+    """Test WAV rendering matches the Morse timing."""
+    encoder = MorseEncoder(wpm=20, tone_freq=700, sample_rate=8000)
+    
+    print("Testing Audio Generation:")
+    for text in ["E", "SOS", "CQ DE W1ABC"]:
+        pcm = encoder.render_pcm(text)
+        with wave.open(io.BytesIO(encoder.generate_audio(text)), 'rb') as wf:
+            frames = wf.getnframes()
+            rate = wf.getframerate()
+        
+        # Every dit unit at 20 WPM is 60ms = 480 samples at 8kHz
+        morse = text_to_morse(text)
+        units = (morse.count('.') * 2 + morse.count('-') * 4
+                 + morse.count(' ') * 2 + morse.count('/') * 4)
+        ok = frames == len(pcm) == units * 480 and rate == 8000
+        status = "✅" if ok else "❌"
+        print(f"  {status} {text} → {frames} frames")
+        assert ok
+    print()
+
+def test_timing_plan():
+    """Test compiled plans render the same audio in any frame size."""
+    import numpy as np
+    
+    encoder = MorseEncoder(wpm=25, tone_freq=700, sample_rate=8000)
+    
+    print("Testing Timing Plans:")
+    for text in ["E", "CQ DE W1ABC", "TNX 73  "]:
+        plan = encoder.compile(text)
+        full = encoder.render_morse(text_to_morse(text))
+        frames = [encoder.render_plan(plan, start, start + 1000)
+                  for start in range(0, plan.total_samples, 1000)]
+        ok = (plan is compile_plan(text, 25, 8000)
+              and plan.total_samples == len(full)
+              and plan.duration_s == len(full) / 8000
+              and np.array_equal(np.concatenate(frames), full)
+              and plan.key_down_at(0) and not plan.key_down_at(plan.total_samples - 1))
+        status = "✅" if ok else "❌"
+        print(f"  {status} {text!r} → {len(plan)} events, {plan.duration_s:.2f} s")
+        assert ok
+    print()
+
+def test_macros():
+    """Test spliced contest macros match rendering the text from scratch."""
+    import numpy as np
+    
+    print("Testing Contest Macros:")
+    glyphs = GlyphCache()
+    encoder = MorseEncoder(wpm=30, sample_rate=8000, glyph_cache=glyphs)
+    macros = MacroEngine(glyphs, {'mycall': 'W1ABC'})
+    
+    for serial, call in [(1, "K2XYZ"), (2, "9A1AA/P"), (123, "")]:
+        for template in DEFAULT_MACROS.values():
+            text = macros.text(template, call=call, serial=serial)
+            pcm = macros.render(encoder, template, call=call, serial=serial)
+            expected = encoder.render_morse(text_to_morse(text))
+            assert np.array_equal(pcm, expected), text
+        print(f"  ✅ {macros.text(DEFAULT_MACROS['F2'], call=call, serial=serial)!r} and the other macros")
+    
+    # Only the fixed text is cached, however many serials are sent
+    ok = len(macros.segments) == 6
+    status = "✅" if ok else "❌"
+    print(f"  {status} {len(macros.segments)} fixed segments cached")
+    assert ok
+    print()
+
+def test_glyph_cache():
+    """Test messages assembled from cached glyphs match direct rendering."""
+    cache = GlyphCache()
+    
+    print("Testing Glyph Cache:")
+    for text in ["HELLO WORLD", "CQ CQ DE W1ABC K", "UR 599 TNX 73"]:
+        direct = MorseEncoder(wpm=25, sample_rate=8000).render_pcm(text)
+        cached = MorseEncoder(wpm=25, sample_rate=8000, glyph_cache=cache).render_pcm(text)
+        ok = len(direct) == len(cached) and (direct == cached).all()
+        status = "✅" if ok else "❌"
+        print(f"  {status} {text}")
+        assert ok
+    
+    misses = cache.misses
+    MorseEncoder(wpm=25, sample_rate=8000, glyph_cache=cache).render_pcm("HELLO")
+    print(f"  hits={cache.hits} misses={cache.misses} bytes={cache.nbytes}")
+    assert cache.misses == misses
+    print()
+
+def test_audio_streaming():
+    """Test streamed frames reassemble to the full rendering."""
+    import numpy as np
+    
+    encoder = MorseEncoder(wpm=20, sample_rate=8000)
+    
+    print("Testing Audio Streaming:")
+    for text in ["E", "HELLO WORLD", "CQ DE W1ABC K"]:
+        frames = list(encoder.stream_pcm(text, frames=1024))
+        joined = np.concatenate(frames)
+        full = encoder.render_pcm(text)
+        ok = (len(joined) == len(full) and (joined == full).all()
+              and all(len(f) == 1024 for f in frames[:-1]))
+        status = "✅" if ok else "❌"
+        print(f"  {status} {text} → {len(frames)} frames")
+        assert ok
+    print()
+
+def test_audio_output():
+    """Test queueing, interrupting and stopping the output engine."""
+    import numpy as np
+    
+    output = AudioOutput(sample_rate=8000)
+    first = np.arange(1, 301, dtype=np.int16)
+    second = np.full(200, 7, dtype=np.int16)
+    
+    print("Testing Audio Output:")
+    output.queue(first)
+    output.queue(second)
+    pulled = np.concatenate([output.read(128) for _ in range(4)])
+    checks = [
+        ("queued back to back", np.array_equal(pulled[:500], np.concatenate((first, second)))),
+        ("silence when idle", not pulled[500:].any()),
+    ]
+    output.queue(first)
+    output.read(100)
+    output.interrupt(second)
+    checks.append(("interrupt", np.array_equal(output.read(200), second)))
+    output.queue(first)
+    output.stop()
+    checks.append(("stop", output.pending_samples == 0 and not output.read(64).any()))
+    checks.append(("position", output.frames_played == 4 * 128 + 100 + 200 + 64))
+    for name, ok in checks:
+        status = "✅" if ok else "❌"
+        print(f"  {status} {name}")
+        assert ok
+    print()
+
+def test_transmit_scheduler():
+    """Test queued messages are sent in priority order with exact spacing."""
+    import numpy as np
+    
+    print("Testing Transmit Scheduler:")
+    encoder = MorseEncoder(wpm=30, sample_rate=8000)
+    scheduler = TransmitScheduler(sample_rate=8000, spacing=700)
+    sink = NullSink(scheduler, frames_per_buffer=100)
+    output = AudioOutput(sample_rate=8000)
+    output.source = scheduler
+    
+    first = scheduler.submit(encoder.compile("CQ"), encoder, label="CQ")
+    head = output.read(50)  # CQ goes on the air; the sink takes over from here
+    low = scheduler.submit(np.full(333, 5, dtype=np.int16), label="low", priority=-1)
+    dropped = scheduler.submit(encoder.compile("QRZ"), encoder)
+    high = scheduler.submit(encoder.compile("TEST"), encoder, priority=1)
+    replaced = scheduler.submit(encoder.compile("K"), encoder)
+    depth = scheduler.depth
+    cancelled = scheduler.cancel(dropped.id)
+    scheduler.replace(replaced.id, encoder.compile("KN"), encoder, label="KN")
+    sink.run_until_idle()
+    
+    audio = np.concatenate((head, sink.audio()))
+    order = [first, high, replaced, low]
+    starts = [t.started_at for t in order]
+    expected = [0]
+    for t in order[:-1]:
+        expected.append(expected[-1] + t.total_samples + 700)
+    full = np.concatenate([encoder.render_plan(t.plan) if t.plan else np.full(333, 5, dtype=np.int16)
+                           for t in order])
+    sent = np.concatenate([audio[s:s + t.total_samples] for s, t in zip(starts, order)])
+    checks = [
+        ("queue depth", depth == 4 and scheduler.depth == 0),
+        ("cancel and replace", cancelled and dropped.state == 'cancelled'
+         and replaced.total_samples == encoder.compile("KN").total_samples),
+        ("priority order", [s[0] for s in sink.starts] == [t.id for t in order]),
+        ("sample-accurate spacing", starts == expected),
+        ("audio", np.array_equal(sent, full) and sum(audio != 0) == sum(full != 0)),
+        ("wait times", high.wait_samples == expected[1] - 50
+         and scheduler.wait_stats()['max_wait_s'] == (expected[3] - 50) / 8000),
+    ]
+    
+    # Send now cuts off the message on the air; the queue follows it
+    scheduler.submit(encoder.compile("TU"), encoder)
+    queued = scheduler.submit(encoder.compile("73"), encoder)
+    sink.pump(10)  # Past the spacing after the last message
+    cut = scheduler.current
+    urgent = scheduler.send_now(np.full(250, 9, dtype=np.int16))
+    sink.run_until_idle()
+    checks.append(("send now", cut.state == 'preempted' and urgent.started_at == cut.finished_at
+                   and queued.started_at == urgent.started_at + 250 + 700))
+    for name, ok in checks:
+        status = "✅" if ok else "❌"
+        print(f"  {status} {name}")
+        assert ok
+    print()
+
+def test_ring_buffer():
+    """Test ring readers see every sample once and detect being lapped."""
+    import numpy as np
+    
+    print("Testing Ring Buffer:")
+    for shared in (False, True):
+        ring = RingBuffer(1000, shared=shared)
+        fast = ring.reader()
+        slow = ring.reader()
+        remote = RingBuffer.attach(ring.name, 1000).reader() if shared else ring.reader()
+        
+        received = []
+        for start in range(0, 3000, 300):
+            ring.write(np.arange(start, start + 300, dtype=np.int16))
+            views = fast.views()
+            received.extend(np.concatenate(views).tolist())
+            assert fast.consume(sum(len(view) for view in views))
+        tail = slow.read()
+        remote_tail = remote.read()
+        
+        ok = (received == list(range(3000)) and fast.overruns == 0
+              and tail.tolist() == list(range(2000, 3000)) and slow.overruns == 1 and slow.lost == 2000
+              and np.array_equal(remote_tail, tail))
+        status = "✅" if ok else "❌"
+        print(f"  {status} {'shared' if shared else 'local'}: fast reader got all, slow reader lost {slow.lost}")
+        assert ok
+        
+        # Views overwritten before they are consumed are reported
+        ring.write(np.zeros(100, dtype=np.int16))
+        views = fast.views()
+        ring.write(np.zeros(1000, dtype=np.int16))
+        assert not fast.consume(100) and fast.overruns == 1
+        
+        if shared:
+            del views, remote
+            ring.close()
+            ring.unlink()
+    print()
+
+def test_tone_detection():
+    """Test decoding rendered audio through the tone detector."""
+    import numpy as np
+    
+    print("Testing Tone Detection (Audio → Text):")
+    for wpm in [10, 25, 40]:
+        text = "CQ DE W1ABC 5NN"
+        pcm = MorseEncoder(wpm=wpm, sample_rate=8000).render_pcm(text)
+        decoder = MorseDecoder(wpm=wpm)
+        detector = ToneDetector(decoder, sample_rate=8000)
+        for start in range(0, len(pcm), 1024):
+            detector.process(pcm[start:start + 1024])
+        detector.process(np.zeros(8000 * 2, dtype=np.int16))
+        
+        decoded = decoder.get_decoded_text()
+        status = "✅" if decoded == text else "❌"
+        print(f"  {status} {wpm} WPM → {decoded}")
+        assert decoded == text
+    print()
+
+def test_speed_tracking():
+    """Test the decoder follows stations faster or slower than expected."""
+    text = "CQ CQ DE W1ABC K"
+    
+    print("Testing Adaptive Speed Tracking (decoder set to 20 WPM):")
+    for wpm in [10, 30, 45]:
+        decoder = MorseDecoder(wpm=20)
+        unit = 1200 / wpm
+        for word in text.split():
+            for char in word:
+                code = text_to_morse(char)
+                for i, element in enumerate(code):
+                    decoder.process_tone(unit if element == '.' else unit * 3)
+                    if i < len(code) - 1:
+                        decoder.process_silence(unit)
+                decoder.process_silence(unit * 3)
+            decoder.process_silence(unit * 7)
+        
+        decoded = decoder.get_decoded_text()
+        ok = decoded.endswith("DE W1ABC K") and abs(decoder.estimated_wpm - wpm) < wpm * 0.1
+        status = "✅" if ok else "❌"
+        print(f"  {status} {wpm} WPM → {decoded} (estimated {decoder.estimated_wpm:.1f} WPM)")
+        assert ok
+    print()
+
+def _skimmer_band(sample_rate):
+    """Three stations and some noise in one passband."""
+    import numpy as np
+    signals = {600: "CQ DE W1ABC K", 900: "TEST K3XYZ", 1300: "QRZ DE G4AAA"}
+    
+    mix = np.zeros(sample_rate * 15, dtype=np.float32)
+    for i, (freq, text) in enumerate(signals.items()):
+        pcm = MorseEncoder(wpm=18 + 4 * i, tone_freq=freq, sample_rate=sample_rate).render_pcm(text)
+        start = 1000 * i
+        mix[start:start + len(pcm)] += pcm.astype(np.float32) / 32768 * 0.2
+    mix += np.random.default_rng(0).normal(0, 0.01, len(mix)).astype(np.float32)
+    return signals, mix
+
+def _check_skimmed(signals, decoded, bin_hz):
+    for freq, text in signals.items():
+        matches = [t for f, t in decoded.items() if abs(f - freq) < 2 * bin_hz]
+        ok = any(t.strip().endswith(text.split()[-1]) for t in matches)
+        status = "✅" if ok else "❌"
+        print(f"  {status} {freq} Hz → {matches}")
+        assert ok
+    print()
+
+def test_skimmer():
+    """Test several signals in one passband are decoded separately."""
+    signals, mix = _skimmer_band(8000)
+    skimmer = Skimmer(sample_rate=8000)
+    for i in range(0, len(mix), 1024):
+        skimmer.process(mix[i:i + 1024])
+    
+    print("Testing Multi-Signal Skimmer:")
+    _check_skimmed(signals, skimmer.decoded(), skimmer.bin_hz)
+
+def test_parallel_skimmer():
+    """Test the passband split across worker processes decodes the same signals."""
+    signals, mix = _skimmer_band(8000)
+    with ParallelSkimmer(workers=2, sample_rate=8000) as skimmer:
+        for i in range(0, len(mix), 1024):
+            skimmer.feed(mix[i:i + 1024])
+            skimmer.poll()
+        skimmer.flush()
+        decoded = skimmer.decoded()
+    
+    print("Testing Parallel Skimmer (2 workers):")
+    _check_skimmed(signals, decoded, skimmer.front.bin_hz)
+    
+    # A dead worker is reported instead of waited on forever
+    with ParallelSkimmer(workers=2, sample_rate=8000) as skimmer:
+        skimmer._processes[1].terminate()
+        skimmer._processes[1].join()
+        try:
+            skimmer.feed(mix[:8000])
+            skimmer.flush()
+            ok = False
+        except RuntimeError:
+            ok = True
+    status = "✅" if ok else "❌"
+    print(f"  {status} worker exit raises")
+    assert ok
+    
+    # A worker that cannot map its slots reports why
+    import queue
+    from multiprocessing import shared_memory
+    from morse_chat import parallel
+    shm = shared_memory.SharedMemory(create=True, size=64)
+    results = queue.Queue()
+    try:
+        parallel._shard_worker(0, shm.name, (4, 4096), 0, {}, queue.Queue(), results)
+    finally:
+        shm.close()
+        shm.unlink()
+    message = results.get_nowait()
+    ok = message[0] == 'error' and 'TypeError' in message[2]
+    status = "✅" if ok else "❌"
+    print(f"  {status} setup failure reported: {message[2]}")
+    assert ok
+    print()
+
+def test_batch_decode():
+    """Test recordings are transcribed with a timestamp per transmission."""
+    import os
+    import tempfile
+    import numpy as np
+    encoder = MorseEncoder(wpm=25, tone_freq=750, sample_rate=8000)
+    silence = np.zeros(8000 * 3, dtype=np.int16)
+    pcm = np.concatenate([encoder.render_pcm("CQ DE W1ABC K"), silence,
+                          encoder.render_pcm("TEST K3XYZ"), silence])
+    
+    print("Testing Batch Decoding:")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rec.wav")
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(8000)
+            wf.writeframes(pcm.tobytes())
+        
+        result, = decode_files([path], jobs=1)
+        with open(result['output']) as f:
+            transcript = f.read().splitlines()
+        
+        # Malformed headers fail their own file, not the batch
+        with open(path, 'rb') as f:
+            header = f.read(44)
+        bad = {
+            "truncated fmt": header[:28],
+            "no channels": header[:22] + struct.pack('<H', 0) + header[24:] + pcm[:800].tobytes(),
+            "zero rate": header[:24] + struct.pack('<I', 0) + header[28:] + pcm[:800].tobytes(),
+        }
+        for name, data in bad.items():
+            with open(os.path.join(tmp, name + ".wav"), 'wb') as f:
+                f.write(data)
+        bad_paths = [os.path.join(tmp, name + ".wav") for name in bad]
+        errors = [r.get('error') for r in decode_files(bad_paths + [path], jobs=1)]
+        
+        # So do non-positive raw layouts and tones
+        raw_path = os.path.join(tmp, "rec.raw")
+        pcm.tofile(raw_path)
+        for kwargs in ({'sample_rate': 8000, 'channels': 0}, {'sample_rate': 0},
+                       {'sample_rate': 8000, 'tone_freq': 0}):
+            result_bad, = decode_files([raw_path], jobs=1, **kwargs)
+            errors.insert(-1, result_bad.get('error'))
+        
+        # Files that fail to parse are closed again, even while the
+        # errors (and the frames they reference) are kept
+        fds = '/proc/self/fd'
+        open_before = len(os.listdir(fds)) if os.path.isdir(fds) else 0
+        failures = []
+        for bad_path in bad_paths * 10:
+            try:
+                PCMFile(bad_path)
+            except ValueError as e:
+                failures.append(e)
+        leaked = (len(os.listdir(fds)) if os.path.isdir(fds) else 0) - open_before
+    
+    ok = (result['tone_freq'] == 750 and len(transcript) == 2 and
+          transcript[0] == "[00:00:00.0] CQ DE W1ABC K" and transcript[1].endswith("] TEST K3XYZ"))
+    status = "✅" if ok else "❌"
+    print(f"  {status} {transcript}")
+    assert ok
+    ok = all(errors[:-1]) and errors[-1] is None
+    status = "✅" if ok else "❌"
+    print(f"  {status} malformed files: {errors[:-1]}")
+    assert ok
+    ok = leaked <= 0
+    status = "✅" if ok else "❌"
+    print(f"  {status} {leaked} files left open")
+    assert ok
+    print()
+
+def test_resume_decode():
+    """Test a checkpointed decode resumes to the same transcript."""
+    import os
+    import tempfile
+    import numpy as np
+    encoder = MorseEncoder(wpm=25, tone_freq=750, sample_rate=8000)
+    silence = np.zeros(8000 * 3, dtype=np.int16)
+    pcm = np.concatenate([np.concatenate([encoder.render_pcm(f"QSO {i} DE W1ABC"), silence]) for i in range(4)])
+    
+    print("Testing Checkpoint Resume:")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rec.raw")
+        pcm.tofile(path)
+        full = decode_file(path, tone_freq=750, sample_rate=8000)
+        
+        # Decode half the file as a crashed job would have
+        checkpoint = os.path.join(tmp, "rec.ckpt")
+        transcriber = Transcriber(8000, 750)
+        with PCMFile(path, sample_rate=8000) as recording:
+            for offset, view in recording.windows(2000):
+                if offset >= len(recording) // 2:
+                    break
+                transcriber.feed(recording.mono(view))
+            del view
+        save_checkpoint(checkpoint, path, (20, 750, 2.0), transcriber)
+        
+        resumed = decode_file(path, tone_freq=750, sample_rate=8000, checkpoint=checkpoint)
+        removed = not os.path.exists(checkpoint)
+    
+    ok = resumed['resumed_s'] > 0 and resumed['lines'] == full['lines'] and len(full['lines']) == 4 and removed
+    status = "✅" if ok else "❌"
+    print(f"  {status} resumed at {resumed['resumed_s']:.2f} s → {[text for _, text in resumed['lines']]}")
+    assert ok
+    print()
+
+class FakeInputDevice:
+    """Stands in for an input device by replaying a WAV file into a callback."""
+    
+    def __init__(self, path, frames=256, speed=8.0):
+        self.path = path
+        self.frames = frames
+        self.speed = speed
+    
+    def play(self, callback):
+        """Call callback(in_data, frame_count, time_info, status) like PortAudio."""
+        import time
+        with wave.open(self.path, 'rb') as wf:
+            interval = self.frames / wf.getframerate() / self.speed
+            data = wf.readframes(self.frames)
+            while data:
+                callback(data, len(data) // 2, {}, 0)
+                time.sleep(interval)
+                data = wf.readframes(self.frames)
+
+def test_capture():
+    """Test live capture decodes a replayed recording into text lines."""
+    import os
+    import tempfile
+    import threading
+    import time
+    import numpy as np
+    
+    encoder = MorseEncoder(wpm=25, tone_freq=700, sample_rate=8000)
+    silence = np.zeros(8000 * 3, dtype=np.int16)
+    pcm = np.concatenate([encoder.render_pcm("CQ DE W1ABC"), silence]) // 3
+    
+    print("Testing Audio Capture:")
+    received = []
+    capture = AudioCapture(MorseDecoder(wpm=25), sample_rate=8000, on_text=received.append)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rx.wav")
+        with wave.open(path, 'wb') as wf:
+            wf.setnchannels(1)
+            wf.setsampwidth(2)
+            wf.setframerate(8000)
+            wf.writeframes(pcm.tobytes())
+        
+        capture.start()
+        device = threading.Thread(target=FakeInputDevice(path).play,
+                                  args=(lambda data, *_: capture.write(data),))
+        device.start()
+        device.join()
+        deadline = time.time() + 5
+        while '\n' not in ''.join(received) and time.time() < deadline:
+            time.sleep(0.01)
+        capture.stop()
+    text = ''.join(received)
+    ok = text.strip() == "CQ DE W1ABC" and text.endswith('\n') and capture.overruns == 0
+    status = "✅" if ok else "❌"
+    print(f"  {status} replayed WAV → {text!r} in {len(received)} updates")
+    assert ok
+    
+    # With no decode thread the ring is lapped and the oldest audio skipped
+    overruns = []
+    stalled = AudioCapture(MorseDecoder(), sample_rate=8000, ring_s=0.1, on_overrun=overruns.append)
+    for start in range(0, 8000, 256):
+        stalled.write(pcm[start:start + 256])
+    stalled.process_available()
+    ok = stalled.overruns > 0 and overruns == [stalled.overruns] and stalled.dropped == stalled.ring.written - 800
+    status = "✅" if ok else "❌"
+    print(f"  {status} stalled decoder → {stalled.overruns} overruns reported")
+    assert ok
+    print()
+
+def test_chat_history():
+    """Test chat scrollback pages old entries to disk and back."""
+    print("Testing Chat History:")
+    history = ChatHistory(max_rows=100, page_rows=40)
+    for i in range(250):
+        history.append_message("You", f"MSG {i}", i)
+    history.append_message("RX", "CQ")
+    history.extend_last(" DE W1ABC")
+    kept = history.rowCount()
+    newest = history.rows[-1].text
+    
+    while history.page_in():
+        pass
+    paged = [entry.text for entry in history.rows[:-1]]
+    history.close()
+    
+    ok = kept <= 100 and newest == "CQ DE W1ABC" and paged == [f"MSG {i}" for i in range(250)]
+    status = "✅" if ok else "❌"
+    print(f"  {status} {kept} rows in memory, {len(paged)} paged back in")
+    assert ok
+    print()
+
+def test_autocomplete():
+    """Test suggestions from recent calls, abbreviations and a callsign table."""
+    import os
+    import tempfile
+    
+    print("Testing Autocomplete:")
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, "calls.csv")
+        with open(database, 'w') as f:
+            f.write("K1AB,Ann\nK1ABC,Al\nK1ZZ,Zed\nW1AW,ARRL\n")
+        completer = Completer(database=database, index_path=os.path.join(tmp, "calls.idx"))
+        completer.add_recent_from("CQ DE K1XYZ K")
+        completer.feed("TU K1A")
+        completer.feed("BD 5NN\n")
+        completer.wait()
+        
+        tests = [
+            ("k1", 3, ["K1ABD", "K1XYZ", "K1AB"]),
+            ("K1AB", 5, ["K1ABD", "K1ABC"]),
+            ("qr", 2, ["QRL", "QRM"]),
+            ("K", 3, ["K1ABD", "K1XYZ", "KN"]),
+            ("ZZ", 5, []),
+        ]
+        for prefix, k, expected in tests:
+            result = completer.complete(prefix, k)
+            status = "✅" if result == expected else "❌"
+            print(f"  {status} {prefix} → {result}")
+            assert result == expected
+        completer.close()
+    print()
+
 if __name__ == '__main__':
     print("=" * 60)
     print("Morse Chat Test Suite")
@@ -108,11 +875,34 @@ if __name__ == '__main__':
     print()
     
     test_encoding()
+    test_encode_many()
+    test_incremental_encoding()
     test_decoding()
+    test_bulk_decoding()
+    test_packed_morse()
     test_abbreviations()
+    test_abbreviation_stream()
+    test_abbreviation_index()
     test_rst()
     test_timing()
     test_roundtrip()
+    test_audio_generation()
+    test_timing_plan()
+    test_glyph_cache()
+    test_macros()
+    test_audio_streaming()
+    test_audio_output()
+    test_transmit_scheduler()
+    test_ring_buffer()
+    test_tone_detection()
+    test_speed_tracking()
+    test_capture()
+    test_skimmer()
+    test_parallel_skimmer()
+    test_batch_decode()
+    test_resume_decode()
+    test_chat_history()
+    test_autocomplete()
     
     print("=" * 60)
     print("Tests Complete!")